@@ -0,0 +1,163 @@
+"""Cold-start cost of every page: what it imports and how long its first run takes.
+
+Each page runs in a fresh interpreter under ``python -X importtime``,
+the way a new server process meets its first visitor after a deploy or
+an autoscale event. Streamlit's own runtime is warmed with a near-empty
+script first, so the numbers are the page's: the modules its first run
+imported (from the importtime log), the first run's wall time, and a
+second, warm run for comparison.
+
+    python benchmarks/cold_start.py                      # every page, table
+    python benchmarks/cold_start.py pages/3_Dashboard.py --top 10
+    python benchmarks/cold_start.py --json > cold_start.json
+
+Pages run as a guest with the stub model backend and a throwaway data
+directory, so no API key, network or database is needed.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = "cold_start:"
+
+# Dependencies worth a line in the report when a page's first run loads them
+HEAVY = ("google.generativeai", "transformers", "pdfplumber", "PIL", "pandas", "numpy", "httpx", "postgrest", "gtts")
+
+
+def pages() -> list:
+    return ["main_app.py"] + sorted(glob.glob("pages/*.py", root_dir=ROOT))
+
+
+# ---------------- Child: one page in a fresh interpreter ----------------
+def _run_child(page: str):
+    sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest
+
+    def run(at) -> float:
+        start = time.perf_counter()
+        at.run()
+        return (time.perf_counter() - start) * 1000
+
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        # page_icon loads Streamlit's emoji table, a once-per-process cost of its own
+        f.write("import streamlit as st\nst.set_page_config(page_icon='🧠')\nst.write('')\n")
+    try:
+        run(AppTest.from_file(f.name))
+    finally:
+        os.remove(f.name)
+
+    def mark(phase):
+        sys.stderr.flush()
+        print(f"{MARKER} {phase}", file=sys.stderr, flush=True)
+
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+    at.session_state["user"] = None
+    at.session_state["profile"] = None
+    mark("first")
+    first_ms = run(at)
+    mark("rerun")
+    rerun_ms = run(at)
+    mark("done")
+    print(json.dumps({
+        "first_run_ms": round(first_ms, 1),
+        "rerun_ms": round(rerun_ms, 1),
+        "exceptions": [str(e.value)[:200] for e in at.exception],
+        "heavy_loaded": [name for name in HEAVY if name in sys.modules],
+    }))
+
+
+# ---------------- Parent: spawn and parse ----------------
+def parse_importtime(stderr: str) -> dict:
+    """Top-level imports (cumulative microseconds) per phase between the child's markers."""
+    phases, phase = {}, "harness"
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            phase = line[len(MARKER):].strip()
+            continue
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        name = name[1:]
+        if name.startswith(" "):  # nested under another import
+            continue
+        phases.setdefault(phase, []).append((name, int(cumulative)))
+    return phases
+
+
+def measure(page: str, env: dict) -> dict:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", page],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    process_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{page}: child failed\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    imports = parse_importtime(proc.stderr)
+    first = sorted(imports.get("first", []), key=lambda item: -item[1])
+    result.update({
+        "page": page,
+        "process_ms": round(process_ms, 1),
+        "import_ms": round(sum(us for _, us in first) / 1000, 1),
+        "rerun_import_ms": round(sum(us for _, us in imports.get("rerun", [])) / 1000, 1),
+        "top_imports": [{"module": name, "ms": round(us / 1000, 1)} for name, us in first],
+    })
+    return result
+
+
+def summarize(samples: list) -> dict:
+    """Median of each timing over repeated cold starts; the rest from the first sample."""
+    result = dict(samples[0])
+    for key in ("process_ms", "import_ms", "first_run_ms", "rerun_ms", "rerun_import_ms"):
+        result[key] = round(statistics.median(s[key] for s in samples), 1)
+    return result
+
+
+def format_report(results: list, top: int) -> str:
+    lines = [f"{'page':<32} {'imports ms':>10} {'first run ms':>12} {'rerun ms':>9} {'process ms':>10}  heavy modules"]
+    for r in results:
+        lines.append(
+            f"{r['page']:<32} {r['import_ms']:>10.1f} {r['first_run_ms']:>12.1f} {r['rerun_ms']:>9.1f}"
+            f" {r['process_ms']:>10.1f}  {', '.join(r['heavy_loaded']) or '-'}"
+        )
+        for imp in r["top_imports"][:top]:
+            lines.append(f"    {imp['ms']:>8.1f} ms  {imp['module']}")
+        for error in r["exceptions"]:
+            lines.append(f"    ! {error}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("pages", nargs="*", help="page scripts relative to the repo root (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="cold starts per page; timings are medians")
+    parser.add_argument("--top", type=int, default=5, help="slowest first-run imports to list per page")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return _run_child(args.child)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ)
+        env.setdefault("NEXSTUDY_LLM_BACKEND", "stub")
+        env.setdefault("NEXSTUDY_DATA_DIR", data_dir)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+        results = [summarize([measure(page, env) for _ in range(max(args.repeat, 1))]) for page in args.pages or pages()]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_report(results, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""End-to-end page benchmarks: scripted student interactions on every page, offline.
+
+Each flow drives one page through Streamlit's AppTest the way a student
+would (send a chat turn, generate and answer a quiz, generate and save a
+plan, tick off todos, ...) as a signed-in user with a seeded history.
+The model is the stub backend and the database the SQLite stand-in, each
+with a fixed per-call latency, so runs are deterministic and need no
+network, keys or project. Every interaction reports:
+
+- ``ms``           wall time of the script run the student waits for
+- ``flush_ms``     time for the write-behind saves it queued to land
+- ``round_trips``  database requests, the saves included (per table in JSON)
+- ``model_calls``  model calls, as metered
+- ``peak_kib``     peak Python heap above the level before the interaction
+                   (measured in a separate tracemalloc pass)
+
+    python benchmarks/e2e.py                                 # table
+    python benchmarks/e2e.py --json > e2e-$(git rev-parse --short HEAD).json
+    python benchmarks/e2e.py --compare e2e-abc123.json       # deltas against a saved run
+    python benchmarks/e2e.py --flows tutor,planner --llm-latency 800 --db-latency 40
+
+Times are medians over --repeat passes, each with a freshly seeded user.
+The first pass also pays one-time imports and cache fills, so with three
+or more passes the median is a warm run (benchmarks/cold_start.py covers
+cold starts). Keep the latencies and repeat count the same when
+comparing commits.
+
+AppTest cannot drive ``st.file_uploader``, so the PDF flow extracts a
+generated PDF through ``nexstudy.pdf`` (the code behind every upload
+widget) and pastes the text into the Quiz page.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEED_MESSAGES = 200
+SEED_ITEMS = {"paper": 8, "code": 8, "audio": 6, "plan": 4}
+SEED_TODOS = 8
+SEED_META = {
+    "paper": {"date": "2026-10-01", "instructions": ""},
+    "code": {"type": "generated", "language": "Python", "date": "2026-10-01"},
+    "audio": {"style": "Friendly Tutor", "date": "2026-10-01"},
+    "plan": {"date": "2026-10-01", "exam_date": "2026-12-01", "daily_hours": 4},
+}
+PDF_PAGES = 10
+STUDY_TEXT = (
+    "Photosynthesis converts light energy into chemical energy in chloroplasts. "
+    "The light reactions split water and release oxygen; the Calvin cycle fixes carbon dioxide into sugars. "
+    "Cellular respiration reverses the process in mitochondria, producing ATP from glucose."
+)
+
+
+# ---------------- Sample data ----------------
+def sample_pdf(pages: int = PDF_PAGES, lines: int = 45) -> bytes:
+    """A plain-text PDF (Helvetica, `lines` lines a page), written by hand so no PDF library is needed."""
+    words = STUDY_TEXT.replace(";", ",").split()
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        text = "".join(
+            f"(Page {page + 1} line {line + 1}: {' '.join(words[line % 12:line % 12 + 12])}) Tj T* "
+            for line in range(lines)
+        )
+        stream = f"BT /F1 10 Tf 14 TL 40 760 Td {text}ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def seed_user(repo) -> dict:
+    """A new user with chat history, library items and todos; written without simulated latency."""
+    import datetime
+
+    from nexstudy import library
+
+    user_id = str(uuid.uuid4())
+    latency, repo.client.latency = repo.client.latency, 0
+    try:
+        repo.create_profile(user_id, f"bench-{user_id[:8]}")
+        start = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=3)
+        repo.append_messages(user_id, [
+            {
+                "id": str(uuid.uuid4()),
+                "role": "user" if n % 2 == 0 else "assistant",
+                "text": f"{'Question' if n % 2 == 0 else 'Answer'} {n}: {STUDY_TEXT}",
+                "created_at": (start + datetime.timedelta(minutes=n)).isoformat(),
+            }
+            for n in range(SEED_MESSAGES)
+        ])
+        for kind, count in SEED_ITEMS.items():
+            for n in range(count):
+                # Every other item is large enough to be stored as a compressed blob
+                content = STUDY_TEXT * (30 if n % 2 else 3)
+                repo.add_item(user_id, library.new_item(kind, f"{kind} {n}", content, SEED_META[kind]))
+        repo.save_todos(user_id, [{"task": f"Revise chapter {n + 1}", "done": n < 2} for n in range(SEED_TODOS)])
+    finally:
+        repo.client.latency = latency
+    return {"id": user_id, "email": f"{user_id[:8]}@bench.local"}
+
+
+# ---------------- Flows ----------------
+def _button(at, label):
+    return next(b for b in at.button if label in b.label)
+
+
+def _input_labeled(widgets, label, value):
+    next(w for w in widgets if w.label.startswith(label)).input(value)
+
+
+def _choose(widgets, label, value):
+    next(w for w in widgets if w.label.startswith(label)).set_value(value)
+
+
+def _answer_quiz(at):
+    for n, radio in enumerate(r for r in at.radio if r.key and r.key.startswith("answer_")):
+        radio.set_value(radio.options[n % len(radio.options)])
+    _button(at, "Submit Quiz").click()
+
+
+def _fill_plan_form(at):
+    import datetime
+
+    _input_labeled(at.text_area, "Paste chapters", "Cells\nGenetics\nEcology\nEvolution")
+    _choose(at.date_input, "Exam date", datetime.date.today() + datetime.timedelta(days=60))
+    _button(at, "Generate Pro Plan").click()
+
+
+def _paste_pdf_text(at, extracted):
+    at.text_area(key="text_input").input(extracted["text"])
+
+
+# flow name -> (page, [(interaction, action)]); action(at) sets widgets before the run, None just reruns
+FLOWS = {
+    "home": ("main_app.py", [("load", None), ("rerun", None)]),
+    "tutor": ("pages/1_AI_Tutor.py", [
+        ("load", None),
+        ("send chat turn", lambda at, _: (at.text_area(key="u_in").input("Explain the Calvin cycle"),
+                                          _button(at, "Send").click())),
+        ("show earlier messages", lambda at, _: at.toggle(key="chat_show_earlier").set_value(True)),
+    ]),
+    "quiz": ("pages/1_Quiz_Generator.py", [
+        ("load", None),
+        ("paste text", lambda at, _: _choose(at.radio, "Choose Input Type", "Paste Text")),
+        ("enter material", lambda at, _: at.text_area(key="text_input").input(STUDY_TEXT)),
+        ("generate quiz", lambda at, _: _button(at, "Generate Quiz").click()),
+        ("answer and submit", lambda at, _: _answer_quiz(at)),
+    ]),
+    "pdf_quiz": ("pages/1_Quiz_Generator.py", [
+        ("load", None),
+        ("extract PDF", "pdf"),
+        ("paste text", lambda at, _: _choose(at.radio, "Choose Input Type", "Paste Text")),
+        ("enter extracted text", _paste_pdf_text),
+        ("generate quiz", lambda at, _: _button(at, "Generate Quiz").click()),
+    ]),
+    "paper": ("pages/2_Paper_Solver.py", [("load", None)]),
+    "dashboard": ("pages/3_Dashboard.py", [
+        ("load", None),
+        ("prepare export", lambda at, _: _button(at, "Prepare Export").click()),
+    ]),
+    "coding": ("pages/4_AI_Coding_Studio.py", [
+        ("load", None),
+        ("generate code", lambda at, _: (_input_labeled(at.text_area, "Describe what you need", "A binary search"),
+                                         _button(at, "Generate Code").click())),
+        ("save to library", lambda at, _: (_input_labeled(at.text_input, "Snippet Name", "Binary search"),
+                                           _button(at, "Save to Library").click())),
+    ]),
+    "audio": ("pages/5_Audio_Notes.py", [("load", None)]),
+    "planner": ("pages/6_Study_Planner.py", [
+        ("load", None),
+        ("generate plan", lambda at, _: _fill_plan_form(at)),
+        ("save plan", lambda at, _: _button(at, "Save this Plan to Cloud").click()),
+        ("add todo", lambda at, _: at.text_input(key="new_todo").input("Past paper 2023")),
+        ("toggle todo", lambda at, _: at.checkbox(key="todo_2").check()),
+    ]),
+    "tips": ("pages/7_Smart_Tips.py", [("load", None), ("get a tip", lambda at, _: _button(at, "Study Tip").click())]),
+    "about": ("pages/8_About.py", [("load", None)]),
+    "help": ("pages/9_Help_and_Support.py", [("load", None)]),
+}
+
+
+# ---------------- Measurement ----------------
+def _round_trips() -> dict:
+    from nexstudy import repository
+
+    return {table: entry["calls"] for table, entry in repository.transfer_stats().items()}
+
+
+def _model_calls(user_id: str) -> int:
+    from nexstudy import metering
+
+    rows = metering.usage_summary(group_by=(), user_id=user_id)
+    return int((rows[0]["calls"] or 0) if rows else 0)
+
+
+def run_flow(name: str, user: dict, memory: bool = False) -> list:
+    from streamlit.testing.v1 import AppTest
+
+    from nexstudy import pdf, writebehind
+
+    page, steps = FLOWS[name]
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+    at.session_state["user"] = user
+    at.session_state["profile"] = {"id": user["id"], "username": f"bench-{user['id'][:8]}"}
+    extracted, results = {}, []
+    for step, action in steps:
+        trips, calls = _round_trips(), _model_calls(user["id"])
+        if memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        errors = []
+        start = time.perf_counter()
+        if action == "pdf":
+            extracted["text"] = pdf.extract_text(io.BytesIO(sample_pdf()))
+        else:
+            if action:
+                action(at, extracted)
+            at.run()
+            errors = [str(e.value)[:200] for e in at.exception]
+        ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        writebehind.get_queue().flush(user["id"], timeout=30)
+        flush_ms = (time.perf_counter() - start) * 1000
+        after = _round_trips()
+        tables = {t: n - trips.get(t, 0) for t, n in after.items() if n != trips.get(t, 0)}
+        results.append({
+            "flow": name,
+            "step": step,
+            "ms": round(ms, 1),
+            "flush_ms": round(flush_ms, 1),
+            "round_trips": sum(tables.values()),
+            "tables": tables,
+            "model_calls": _model_calls(user["id"]) - calls,
+            "peak_kib": round((tracemalloc.get_traced_memory()[1] - base) / 1024) if memory else None,
+            "errors": errors,
+        })
+    return results
+
+
+def run_suite(repo, flows: list, repeat: int, memory: bool) -> list:
+    passes = [[step for name in flows for step in run_flow(name, seed_user(repo))] for _ in range(max(repeat, 1))]
+    results = passes[0]
+    for n, step in enumerate(results):
+        step["ms"] = round(statistics.median(p[n]["ms"] for p in passes), 1)
+        step["flush_ms"] = round(statistics.median(p[n]["flush_ms"] for p in passes), 1)
+    if memory:
+        tracemalloc.start()
+        try:
+            measured = [step for name in flows for step in run_flow(name, seed_user(repo), memory=True)]
+        finally:
+            tracemalloc.stop()
+        for step, mem in zip(results, measured):
+            step["peak_kib"] = mem["peak_kib"]
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ---------------- Reporting ----------------
+def format_report(report: dict, base: dict = None) -> str:
+    meta = report["meta"]
+    lines = [
+        f"commit {meta['commit']}  model latency {meta['llm_latency_ms']:g} ms  "
+        f"db latency {meta['db_latency_ms']:g} ms  repeat {meta['repeat']}",
+        "",
+        f"{'flow / interaction':<36} {'ms':>8} {'flush ms':>9} {'trips':>6} {'model':>6} {'peak KiB':>9}",
+    ]
+    before = {(s["flow"], s["step"]): s for s in (base or {}).get("steps", [])}
+    for s in report["steps"]:
+        peak = "-" if s["peak_kib"] is None else f"{s['peak_kib']:,}"
+        line = (
+            f"{s['flow'] + ' / ' + s['step']:<36} {s['ms']:>8.1f} {s['flush_ms']:>9.1f}"
+            f" {s['round_trips']:>6} {s['model_calls']:>6} {peak:>9}"
+        )
+        old = before.get((s["flow"], s["step"]))
+        if old:
+            line += f"   {s['ms'] - old['ms']:+8.1f} ms {s['round_trips'] - old['round_trips']:+4d} trips"
+        lines.append(line)
+        for error in s["errors"]:
+            lines.append(f"    ! {error}")
+    total = sum(s["ms"] for s in report["steps"])
+    lines += ["", f"total {total:,.1f} ms over {len(report['steps'])} interactions; max RSS {report['max_rss_kib']:,} KiB"]
+    if base:
+        old_total = sum(s["ms"] for s in base["steps"])
+        lines.append(f"vs {base['meta']['commit']}: {total - old_total:+,.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--flows", help=f"comma-separated subset of: {', '.join(FLOWS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes; times are medians")
+    parser.add_argument("--llm-latency", type=float, default=250, help="stub model latency per call (ms)")
+    parser.add_argument("--db-latency", type=float, default=10, help="database latency per round trip (ms)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--compare", metavar="JSON", help="a saved --json report to show deltas against")
+    args = parser.parse_args(argv)
+    flows = args.flows.split(",") if args.flows else list(FLOWS)
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="nexstudy-e2e-")
+    # Set before nexstudy is imported: the backends read these once.
+    os.environ.update({
+        "NEXSTUDY_LLM_BACKEND": "stub",
+        "NEXSTUDY_STUB_LATENCY_MS": str(args.llm_latency),
+        "NEXSTUDY_DB": os.path.join(workdir, "bench.db"),
+        "NEXSTUDY_DB_LATENCY_MS": str(args.db_latency),
+        "NEXSTUDY_DATA_DIR": workdir,
+    })
+    logging.disable(logging.WARNING)  # pages' own warnings are not what is measured
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import streamlit
+
+    from nexstudy import repository
+
+    try:
+        steps = run_suite(repository.get_repository(), flows, args.repeat, not args.no_memory)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    report = {
+        "meta": {
+            "commit": _git_revision(),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "llm_latency_ms": args.llm_latency,
+            "db_latency_ms": args.db_latency,
+            "repeat": args.repeat,
+            "seed": {"messages": SEED_MESSAGES, "items": SEED_ITEMS, "todos": SEED_TODOS, "pdf_pages": PDF_PAGES},
+        },
+        "steps": steps,
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        base = None
+        if args.compare:
+            with open(args.compare) as f:
+                base = json.load(f)
+        print(format_report(report, base))
+
+
+if __name__ == "__main__":
+    main()
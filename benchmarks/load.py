@@ -0,0 +1,362 @@
+"""Concurrent-session load test for one Streamlit process.
+
+N simulated students share one process, the way they share one replica.
+Each is a signed-in session of its own (seeded user, session state,
+script-runner thread per run) that loops through the page flows from
+``benchmarks/e2e.py``: it runs an interaction, thinks for a while, and
+runs the next. The model is the stub backend and the database the SQLite
+stand-in, each with a fixed latency. The harness sweeps N upward and
+reports, per level:
+
+- throughput (interactions per second) and p50/p95/p99/max latency
+- threads, RSS and CPU (cores busy) at their peak or average
+- the deepest the write-behind queue got
+
+The saturation point is the first level where p95 rises past
+--p95-factor times its value at lower load or throughput falls below
+90% of the level before; the level before it is what one process can
+serve.
+
+    python benchmarks/load.py                                  # 1..32 sessions
+    python benchmarks/load.py --levels 4,8,16,24 --duration 30 --think 2
+    python benchmarks/load.py --flows tutor,planner --llm-latency 1500 --json
+
+Runs use AppTest's script runner without its per-run global setup (see
+``SessionAppTest``), so many sessions can run at once. Each script run is
+parsed into an element tree, which a real server does not do; absolute
+numbers are therefore pessimistic, and comparisons between levels and
+commits are what to read.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FLOWS = "home,tutor,quiz,dashboard,coding,planner,tips"
+SAMPLE_INTERVAL = 0.5  # seconds between resource samples
+
+
+# ---------------- Concurrent script runs ----------------
+_runtime_lock = threading.Lock()
+_script_cache = None
+
+
+def _set_up_runtime():
+    """The process-wide pieces AppTest sets up and tears down around every run, set up once."""
+    global _script_cache
+    with _runtime_lock:
+        if _script_cache is not None:
+            return
+        from unittest.mock import MagicMock
+
+        from streamlit import config
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+        from streamlit.runtime.media_file_manager import MediaFileManager
+        from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+        from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+        runtime = MagicMock(spec=Runtime)
+        runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+        runtime.cache_storage_manager = MemoryCacheStorageManager()
+        Runtime._instance = runtime
+        config.set_option("global.appTest", True)
+        _script_cache = ScriptCache()  # compiled pages, shared like a server's
+
+
+def session_app(page: str, timeout: float):
+    from urllib import parse
+
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.runtime.scriptrunner import RerunData
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1.element_tree import parse_tree_from_messages
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    class SessionAppTest(AppTest):
+        """AppTest for one of many concurrent sessions.
+
+        Plain AppTest swaps the process-wide runtime in and out around
+        every run and polls its script thread every millisecond; here the
+        runtime is set up once and the run is joined.
+        """
+
+        def _run(self, widget_state=None, timeout=None):
+            runner = LocalScriptRunner(
+                self._script_path,
+                self.session_state,
+                PagesManager(self._script_path, setup_watcher=False),
+                args=self.args,
+                kwargs=self.kwargs,
+            )
+            runner._script_cache = _script_cache
+            runner.request_rerun(RerunData(
+                widget_states=widget_state,
+                query_string=parse.urlencode(self.query_params, doseq=True),
+                page_script_hash=self._page_hash,
+            ))
+            runner.start()
+            runner._script_thread.join(self.default_timeout if timeout is None else timeout)
+            if runner._script_thread.is_alive():
+                runner.request_stop()
+                raise TimeoutError(f"{os.path.basename(self._script_path)} ran longer than the timeout")
+            self._tree = parse_tree_from_messages(runner.forward_msgs())
+            self._tree._runner = self
+            self.query_params = parse.parse_qs(runner.event_data[-1]["client_state"].query_string)
+            return self
+
+    _set_up_runtime()
+    # Like a server, every session runs main_app.py's app and picks its page
+    # by hash; Streamlit keeps one page list per process.
+    at = SessionAppTest(os.path.join(ROOT, "main_app.py"), default_timeout=timeout)
+    return at if page == "main_app.py" else at.switch_page(page)
+
+
+# ---------------- Sessions ----------------
+class Level:
+    """Latencies and resource samples collected while N sessions run."""
+
+    def __init__(self, sessions: int):
+        self.sessions = sessions
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = []
+        self.samples = []
+        self.measuring = False
+
+    def record(self, flow, step, ms, errors):
+        with self.lock:
+            if self.measuring:
+                self.latencies.append(ms)
+                self.errors.extend(f"{flow} / {step}: {e}" for e in errors)
+
+
+def _session(flows: list, user: dict, level: Level, stop: threading.Event, think: float, seed: int):
+    import e2e
+
+    rng = random.Random(seed)
+    stop.wait(rng.uniform(0, think))  # staggered arrivals
+    while not stop.is_set():
+        name = rng.choice(flows)
+        page, steps = e2e.FLOWS[name]
+        at = session_app(page, timeout=120)
+        at.session_state["user"] = user
+        at.session_state["profile"] = {"id": user["id"], "username": f"bench-{user['id'][:8]}"}
+        extracted = {}
+        for step, action in steps:
+            if stop.is_set():
+                return
+            start = time.perf_counter()
+            errors, broken = [], False
+            try:
+                if action == "pdf":
+                    from nexstudy import pdf
+
+                    extracted["text"] = pdf.extract_text(e2e.io.BytesIO(e2e.sample_pdf()))
+                else:
+                    if action:
+                        action(at, extracted)
+                    at.run()
+                    errors = [str(e.value)[:200] for e in at.exception]
+            except Exception as e:  # a step that cannot run (widget missing, timeout) ends the flow
+                errors, broken = [f"{type(e).__name__}: {e}"[:200]], True
+            level.record(name, step, (time.perf_counter() - start) * 1000, errors)
+            if broken:
+                break
+            stop.wait(think * rng.uniform(0.5, 1.5))
+
+
+def _rss_kib() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _monitor(level: Level, stop: threading.Event):
+    from nexstudy import writebehind
+
+    queue = writebehind.get_queue()
+    wall, cpu = time.perf_counter(), time.process_time()
+    while not stop.wait(SAMPLE_INTERVAL):
+        now_wall, now_cpu = time.perf_counter(), time.process_time()
+        sample = {
+            "threads": threading.active_count(),
+            "rss_kib": _rss_kib(),
+            "cpu": (now_cpu - cpu) / (now_wall - wall),
+            "queue": queue.pending(),
+        }
+        wall, cpu = now_wall, now_cpu
+        with level.lock:
+            if level.measuring:
+                level.samples.append(sample)
+
+
+def _percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+
+def run_level(sessions: int, users: list, flows: list, args) -> dict:
+    from nexstudy import writebehind
+
+    level = Level(sessions)
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_session, args=(flows, users[n], level, stop, args.think, n), daemon=True)
+        for n in range(sessions)
+    ] + [threading.Thread(target=_monitor, args=(level, stop), daemon=True)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+    with level.lock:
+        level.measuring = True
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    with level.lock:
+        level.measuring = False
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=130)
+    writebehind.get_queue().flush(None, timeout=60)
+
+    lat, samples = level.latencies, level.samples or [{"threads": 0, "rss_kib": 0, "cpu": 0, "queue": 0}]
+    return {
+        "sessions": sessions,
+        "interactions": len(lat),
+        "throughput": round(len(lat) / elapsed, 2),
+        "p50_ms": round(_percentile(lat, 50), 1),
+        "p95_ms": round(_percentile(lat, 95), 1),
+        "p99_ms": round(_percentile(lat, 99), 1),
+        "max_ms": round(max(lat, default=0), 1),
+        "errors": len(level.errors),
+        "error_samples": level.errors[:5],
+        "threads": max(s["threads"] for s in samples),
+        "rss_mib": round(max(s["rss_kib"] for s in samples) / 1024, 1),
+        "cpu_cores": round(statistics.mean(s["cpu"] for s in samples), 2),
+        "queue_max": max(s["queue"] for s in samples),
+    }
+
+
+def saturation(levels: list, p95_factor: float) -> dict:
+    """The first level past the knee, and the last one before it.
+
+    p95 is compared with the best p95 of the levels below, so one slow
+    cold start at a small level does not hide the knee.
+    """
+    if not levels:
+        return {"saturated_at": None, "max_sessions": None}
+    for n, (previous, level) in enumerate(zip(levels, levels[1:]), 1):
+        base_p95 = min(r["p95_ms"] for r in levels[:n]) or 1
+        if level["p95_ms"] > p95_factor * base_p95 or level["throughput"] < 0.9 * previous["throughput"]:
+            return {"saturated_at": level["sessions"], "max_sessions": previous["sessions"]}
+    return {"saturated_at": None, "max_sessions": levels[-1]["sessions"]}
+
+
+def format_report(report: dict) -> str:
+    meta = report["meta"]
+    lines = [
+        f"model latency {meta['llm_latency_ms']:g} ms  db latency {meta['db_latency_ms']:g} ms  "
+        f"think {meta['think_s']:g} s  {meta['duration_s']:g} s per level  flows {meta['flows']}",
+        "",
+        f"{'sessions':>8} {'ops/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'errors':>6}"
+        f" {'threads':>7} {'RSS MiB':>8} {'CPU':>5} {'queue':>5}",
+    ]
+    for r in report["levels"]:
+        lines.append(
+            f"{r['sessions']:>8} {r['throughput']:>7.2f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}"
+            f" {r['max_ms']:>8.1f} {r['errors']:>6} {r['threads']:>7} {r['rss_mib']:>8.1f} {r['cpu_cores']:>5.2f}"
+            f" {r['queue_max']:>5}"
+        )
+        for error in r["error_samples"]:
+            lines.append(f"    ! {error}")
+    sat = report["saturation"]
+    lines.append("")
+    if sat["saturated_at"] is None:
+        lines.append(f"no saturation up to {sat['max_sessions']} sessions")
+    else:
+        lines.append(f"saturates at {sat['saturated_at']} sessions; one process serves {sat['max_sessions']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="session counts to sweep")
+    parser.add_argument("--flows", default=DEFAULT_FLOWS, help="flows from benchmarks/e2e.py the sessions pick from")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before each level")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds a student waits between interactions")
+    parser.add_argument("--llm-latency", type=float, default=250, help="stub model latency per call (ms)")
+    parser.add_argument("--db-latency", type=float, default=10, help="database latency per round trip (ms)")
+    parser.add_argument("--p95-factor", type=float, default=3.0, help="p95 growth over lower levels that counts as saturated")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    levels = sorted({int(n) for n in args.levels.split(",")})
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import e2e
+
+    flows = args.flows.split(",")
+    unknown = set(flows) - set(e2e.FLOWS)
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="nexstudy-load-")
+    os.environ.update({
+        "NEXSTUDY_LLM_BACKEND": "stub",
+        "NEXSTUDY_STUB_LATENCY_MS": str(args.llm_latency),
+        "NEXSTUDY_DB": os.path.join(workdir, "load.db"),
+        "NEXSTUDY_DB_LATENCY_MS": str(args.db_latency),
+        "NEXSTUDY_DATA_DIR": workdir,
+    })
+    e2e.logging.disable(e2e.logging.WARNING)
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    from nexstudy import repository
+
+    try:
+        repo = repository.get_repository()
+        users = [e2e.seed_user(repo) for _ in range(max(levels))]
+        results = []
+        for sessions in levels:
+            results.append(run_level(sessions, users, flows, args))
+            if not args.json:
+                print(f"  {sessions} sessions: {results[-1]['throughput']} ops/s, p95 {results[-1]['p95_ms']} ms",
+                      file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "llm_latency_ms": args.llm_latency,
+            "db_latency_ms": args.db_latency,
+            "think_s": args.think,
+            "duration_s": args.duration,
+            "flows": args.flows,
+            "cpus": os.cpu_count(),
+        },
+        "levels": results,
+        "saturation": saturation(results, args.p95_factor),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
 import streamlit as st
-import os
-import base64
 import datetime
 import streamlit.components.v1 as components
-from supabase import create_client, Client
+from nexstudy import assets, clients, export, profiling, repository, snapshot
+
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
 
 # =========================================================
 # PAGE CONFIG (SEO OPTIMIZED)
@@ -18,17 +18,15 @@ st.set_page_config(
 # =========================================================
 # SUPABASE CLIENT
 # =========================================================
-@st.cache_resource
-def get_supabase() -> Client:
-    try:
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_ANON_KEY"]  # publishable (anon) key
-        return create_client(url, key)
-    except Exception as e:
-        st.error("Supabase secrets missing. Please check .streamlit/secrets.toml")
-        return None
-
-supabase = get_supabase()
+# Table reads and writes go through the repository, which gives each
+# signed-in session its own client carrying that user's token; auth calls
+# go through nexstudy.clients. With NEXSTUDY_DB set (local SQLite) there
+# is no auth and the app runs in guest mode.
+repo = repository.get_repository()
+auth_ready = clients.is_configured() and not (repo and repo.backend == "sqlite")
+if not repo:
+    st.error("Supabase secrets missing. Please check .streamlit/secrets.toml")
+export.start_cleanup()  # expired library exports are deleted on a timer, leftovers at startup
 
 # =========================================================
 # SESSION STATE
@@ -50,21 +48,16 @@ if "auth_mode" not in st.session_state:
 # HELPER: LOAD PROFILE
 # =========================================================
 def load_profile(user_id: str):
-    if not supabase: return
+    repo = repository.get_repository()  # the signed-in user's client
+    if not repo: return
     try:
-        res = (
-            supabase
-            .table("profiles")
-            .select("*")
-            .eq("id", user_id)
-            .single()
-            .execute()
-        )
-        if res.data:
-            # we don't store email in profiles table by default; can add later
-            st.session_state.profile = res.data
-        else:
-            st.session_state.profile = None
+        # One request for every profile column the pages use; they read it
+        # from the session snapshot instead of fetching again.
+        # we don't store email in profiles table by default; can add later
+        profile = repo.get_profile(user_id, "session")
+        if profile:
+            snapshot.get_snapshot({"id": user_id}).seed(profile)
+        st.session_state.profile = profile
     except Exception:
         st.session_state.profile = None
 
@@ -84,22 +77,35 @@ if not st.session_state.user and not st.session_state.is_guest:
 # =========================================================
 # AUTH HELPERS (SUPABASE)
 # =========================================================
+def create_profile(user_id: str, username: str):
+    """Create the signed-in user's profile (as that user) and seed the session snapshot."""
+    # .execute() raises exception on failure
+    repository.get_repository().create_profile(user_id, username)
+    snapshot.get_snapshot({"id": user_id}).seed({
+        "id": user_id, "username": username, "todos": [],
+        **{name: 0 for name in repository.COUNTER_COLUMNS},
+    })
+
+
 def signup(email: str, password: str, username: str):
-    if not supabase: return False, "Supabase not initialized"
+    """(True, None) when signed in, (True, note) when email confirmation is pending."""
+    if not auth_ready: return False, "Supabase not initialized"
     try:
         # 1) create auth user
         # Supabase raises an exception if this fails, so no need to check .error
-        res = supabase.auth.sign_up({"email": email, "password": password})
+        user, tokens = clients.sign_up(email, password, username)
 
-        user = res.user
         if not user:
             return False, "Signup failed: No user returned."
-            
+        if not tokens:
+            # No session until the email is confirmed; the profile is created at first login
+            return True, "Account created. Confirm your email, then log in."
+
         user_id = user.id
+        st.session_state[repository.SESSION_TOKENS] = tokens
 
-        # 2) create profile with username
-        # .execute() raises exception on failure
-        supabase.table("profiles").insert({"id": user_id, "username": username}).execute()
+        # 2) create profile with username, as the new user
+        create_profile(user_id, username)
 
         # 3) store simplified user/profile in session
         st.session_state.user = {
@@ -118,18 +124,17 @@ def signup(email: str, password: str, username: str):
 
 
 def login(email: str, password: str):
-    if not supabase: return None, "Supabase not initialized"
+    if not auth_ready: return None, "Supabase not initialized"
     try:
         # Supabase raises an exception if login fails
-        res = supabase.auth.sign_in_with_password(
-            {"email": email, "password": password}
-        )
+        user, tokens = clients.sign_in(email, password)
 
-        user = res.user
         if not user:
             return None, "Login failed: No user returned."
 
         user_id = user.id
+        # Only this session's requests carry the token; auth state is not shared
+        st.session_state[repository.SESSION_TOKENS] = tokens
 
         st.session_state.user = {
             "id": user_id,
@@ -139,6 +144,11 @@ def login(email: str, password: str):
 
         # load profile
         load_profile(user_id)
+        if st.session_state.profile is None:
+            # First login after confirming the email: create the profile now, as the user
+            username = (user.user_metadata or {}).get("username") or email.split("@")[0]
+            create_profile(user_id, username)
+            load_profile(user_id)
         return st.session_state.user, None
     except Exception as e:
         return None, str(e)
@@ -192,12 +202,14 @@ def login_dialog():
 
         if st.button("Create Account", type="primary", use_container_width=True, key="signup_btn"):
             if username_signup and email_signup and password_signup:
-                ok, err = signup(email_signup, password_signup, username_signup)
-                if ok:
+                ok, message = signup(email_signup, password_signup, username_signup)
+                if ok and message:
+                    st.info(message)
+                elif ok:
                     st.success("Account created and logged in!")
                     st.rerun()
                 else:
-                    st.error(f"Signup failed: {err}")
+                    st.error(f"Signup failed: {message}")
             else:
                 st.warning("Please fill all fields.")
 
@@ -236,23 +248,9 @@ st.markdown(
 )
 
 # =========================================================
-# HELPER – IMAGE TO BASE64
+# LOGO VARIANTS (built once per process, served from static/)
 # =========================================================
-def get_img_as_base64(path):
-    with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode()
-
-# =========================================================
-# LOGO DETECTION
-# =========================================================
-if os.path.exists("assets/image.png"):
-    logo_path = "assets/image.png"
-elif os.path.exists("logo.png"):
-    logo_path = "logo.png"
-elif os.path.exists("logo.jpg"):
-    logo_path = "logo.jpg"
-else:
-    logo_path = None
+assets.build()
 
 # =========================================================
 # HERO SECTION
@@ -260,26 +258,23 @@ else:
 col_logo, col_title = st.columns([1.5, 4.5])
 
 with col_logo:
-    if logo_path:
-        img_b64 = get_img_as_base64(logo_path)
-        st.markdown(
-            f"""
-            <style>
-            .logo {{
-                border-radius: 50%;
-                width: 200px;
-                height: 200px;
-                object-fit: cover;
-                display: block;
-                margin: auto;
-                border: 3px solid #f0f2f6;
-            }}
-            </style>
-            <img src="data:image/png;base64,{img_b64}" class="logo">
-            """,
-            unsafe_allow_html=True,
-        )
-    else:
+    st.markdown(
+        """
+        <style>
+        .logo {
+            border-radius: 50%;
+            width: 200px;
+            height: 200px;
+            object-fit: cover;
+            display: block;
+            margin: auto;
+            border: 3px solid #f0f2f6;
+        }
+        </style>
+        """,
+        unsafe_allow_html=True,
+    )
+    if not assets.logo(200, css_class="logo"):
         st.markdown("<h1 style='text-align:center'>🧠</h1>", unsafe_allow_html=True)
 
 with col_title:
@@ -376,11 +371,10 @@ with st.sidebar:
     if st.session_state.user:
         if st.button("Log Out"):
             try:
-                supabase.auth.sign_out()
+                clients.sign_out(st.session_state.get(repository.SESSION_TOKENS))
             except Exception:
                 pass
-            st.session_state.user = None
-            st.session_state.profile = None
+            repository.end_session()
             st.session_state.is_guest = False
             st.session_state.auth_dialog_shown = False
             st.rerun()
@@ -0,0 +1,50 @@
+"""Activity events and the daily rollups behind the Dashboard's trends and streaks.
+
+Each doubt asked, quiz taken, plan created, audio note generated and todo
+completed is appended to ``activity_events``; the database folds it into
+``activity_daily`` (one row per user per UTC day, carrying the streak).
+Doubts, plans and audio notes are recorded by database triggers; pages
+record the rest:
+
+    event_id = activity.new_event_id()   # once per event, outside the retried write
+    writebehind.submit(user["id"], lambda: repo.record_activity(user["id"], "quiz", event_id))
+
+The Dashboard reads the last week of rollups and the streak through
+``dashboard_stats`` and turns them into a chart series with ``week``.
+"""
+import datetime
+import uuid
+
+EVENTS = ("doubt", "quiz", "plan", "audio", "todo_done")
+ROLLUP_COLUMNS = ("doubts", "quizzes", "plans", "audio", "todos_done")
+
+
+def new_event_id() -> str:
+    return str(uuid.uuid4())
+
+
+def record(client, user_id: str, kind: str, event_id: str):
+    """Append one event; a retry with the same `event_id` is ignored, not counted again."""
+    if kind not in EVENTS:
+        raise ValueError(f"unknown activity event {kind!r}")
+    client.table("activity_events").upsert(
+        {"event_id": event_id, "user_id": user_id, "kind": kind},
+        on_conflict="event_id", ignore_duplicates=True,
+    ).execute()
+
+
+def today() -> datetime.date:
+    """Rollup days are UTC dates."""
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def week(rows: list, end: datetime.date = None, days: int = 7) -> list:
+    """One rollup per day for the `days` days ending at `end`, zeros where nothing happened."""
+    end = end or today()
+    by_day = {str(row["day"])[:10]: row for row in rows or []}
+    series = []
+    for offset in range(days - 1, -1, -1):
+        day = end - datetime.timedelta(days=offset)
+        row = by_day.get(day.isoformat(), {})
+        series.append({"day": day, **{col: row.get(col, 0) for col in ROLLUP_COLUMNS}})
+    return series
@@ -0,0 +1,111 @@
+"""Logo variants built once and served by reference.
+
+The source logo (assets/image.png, about 690 KB) never goes to the
+browser. ``build()`` resizes it once per process to every display width
+the pages use, at 2x for high-DPI screens, and writes WebP plus a
+palette-PNG fallback to ``static/logo/``. Streamlit serves those files
+from disk, so a page run sends only an <img> tag pointing at them:
+
+    if not assets.logo(150):
+        st.write("🧠")
+
+File names carry a hash of the source, so browsers can cache them for as
+long as they like and a new logo gets new URLs.
+"""
+import hashlib
+import os
+import threading
+
+from nexstudy.config import STATIC_DIR
+
+SOURCES = ("assets/image.png", "logo.png", "logo.jpg")
+SIZES = (100, 150, 200)  # display widths (CSS px) used by the pages
+DENSITY = 2
+WEBP_QUALITY = 85
+LOGO_DIR = os.path.join(STATIC_DIR, "logo")
+
+_variants = None  # width -> {"webp": url, "png": url, "png_path": path}
+_lock = threading.Lock()
+
+
+def source():
+    return next((path for path in SOURCES if os.path.exists(path)), None)
+
+
+def _write(path, save):
+    """Write via a temp file so concurrent builds never serve a partial image."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        save(f)
+    os.replace(tmp, path)
+
+
+def _build() -> dict:
+    path = source()
+    if not path:
+        return {}
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:10]
+    os.makedirs(LOGO_DIR, exist_ok=True)
+
+    image, variants = None, {}
+    for width in SIZES:
+        names = {fmt: f"logo-{width}-{digest}.{fmt}" for fmt in ("webp", "png")}
+        paths = {fmt: os.path.join(LOGO_DIR, name) for fmt, name in names.items()}
+        if not all(os.path.exists(p) for p in paths.values()):
+            from PIL import Image
+
+            if image is None:
+                image = Image.open(path).convert("RGBA")
+            pixels = width * DENSITY
+            resized = image.resize((pixels, round(image.height * pixels / image.width)), Image.LANCZOS)
+            _write(paths["webp"], lambda f: resized.save(f, "WEBP", quality=WEBP_QUALITY, method=6))
+            _write(paths["png"], lambda f: resized.quantize(256, method=Image.Quantize.FASTOCTREE).save(
+                f, "PNG", optimize=True
+            ))
+        variants[width] = {
+            "webp": f"app/static/logo/{names['webp']}",
+            "png": f"app/static/logo/{names['png']}",
+            "png_path": paths["png"],
+        }
+
+    # Variants of an earlier logo
+    for name in os.listdir(LOGO_DIR):
+        if digest not in name:
+            try:
+                os.remove(os.path.join(LOGO_DIR, name))
+            except OSError:
+                pass
+    return variants
+
+
+def build() -> dict:
+    """Every logo variant by display width ({} without a logo file); built on first call."""
+    global _variants
+    with _lock:
+        if _variants is None:
+            try:
+                _variants = _build()
+            except Exception:
+                _variants = {}
+        return _variants
+
+
+def logo(width: int, css_class: str = None) -> bool:
+    """Draw the logo `width` CSS px wide; returns False when there is no logo to draw."""
+    variants = build()
+    if not variants:
+        return False
+    variant = variants.get(width) or variants[min((w for w in SIZES if w >= width), default=max(SIZES))]
+    import streamlit as st
+
+    if not st.get_option("server.enableStaticServing"):
+        st.image(variant["png_path"], width=width)
+        return True
+    class_attr = f' class="{css_class}"' if css_class else ""
+    st.markdown(
+        f'<picture><source srcset="{variant["webp"]}" type="image/webp">'
+        f'<img src="{variant["png"]}" width="{width}" alt="NexStudy"{class_attr}></picture>',
+        unsafe_allow_html=True,
+    )
+    return True
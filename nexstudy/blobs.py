@@ -0,0 +1,87 @@
+"""Compressed, content-addressed storage for large library contents.
+
+A saved item whose text is at least ``THRESHOLD`` bytes is not stored in
+``library_items.content``. It goes to ``content_blobs`` instead, compressed
+and keyed by the SHA-256 of the uncompressed text, and the item keeps
+only ``blob_hash`` (plus a short plain-text ``excerpt`` for search
+snippets). Saving the same solution twice stores one blob:
+
+    blob = blobs.pack(text)            # None when the text stays inline
+    text = blobs.unpack(blob["codec"], blob["data"])
+
+Blobs are per user, so a hash never reveals whether someone else saved
+the same text. Compression runs client-side, which shrinks what reads
+transfer as well as what the database stores.
+
+``python -m nexstudy.blobs [user_id]`` prints the compression and
+dedup ratios actually achieved (``library_storage_stats`` in SQL).
+"""
+import base64
+import hashlib
+import zlib
+
+THRESHOLD = 2048  # bytes of UTF-8; smaller contents stay inline
+CODEC = "zlib"
+LEVEL = 9
+EXCERPT_CHARS = 1000  # plain text kept on the item for search snippets
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pack(text: str):
+    """The blob for `text` (``{hash, codec, size, data}``, data base64), or None to keep it inline."""
+    raw = (text or "").encode("utf-8")
+    if len(raw) < THRESHOLD:
+        return None
+    data = zlib.compress(raw, LEVEL)
+    if len(data) >= len(raw):
+        return None
+    return {
+        "hash": hashlib.sha256(raw).hexdigest(),
+        "codec": CODEC,
+        "size": len(raw),
+        "data": base64.b64encode(data).decode("ascii"),
+    }
+
+
+def unpack(codec: str, data: str) -> str:
+    """Text of a blob read back as base64 (Postgres ``encode(data, 'base64')`` wraps lines; they are ignored)."""
+    if codec != CODEC:
+        raise ValueError(f"unsupported blob codec {codec!r}")
+    return zlib.decompress(base64.b64decode(data)).decode("utf-8")
+
+
+# ---------------- Report ----------------
+def format_report(stats: dict) -> str:
+    """Human-readable summary of a ``library_storage_stats`` row."""
+    def ratio(a, b):
+        return f"{a / b:.2f}x" if b else "n/a"
+
+    referenced, distinct, stored = stats["referenced_bytes"], stats["distinct_bytes"], stats["stored_bytes"]
+    return "\n".join([
+        f"items:              {stats['items']} ({stats['blob_items']} in blobs, {stats['blobs']} distinct blobs)",
+        f"inline content:     {stats['inline_bytes']:,} bytes",
+        f"blob text:          {referenced:,} bytes referenced, {distinct:,} distinct",
+        f"blob storage:       {stored:,} bytes compressed",
+        f"compression ratio:  {ratio(distinct, stored)}",
+        f"dedup factor:       {ratio(referenced, distinct)}",
+        f"overall saving:     {ratio(referenced, stored)} on blob-stored items",
+    ])
+
+
+def main(argv=None):
+    import sys
+
+    from nexstudy import repository
+
+    args = sys.argv[1:] if argv is None else argv
+    repo = repository.get_repository()
+    if repo is None:
+        raise SystemExit("No backend configured (set NEXSTUDY_DB or SUPABASE_URL/SUPABASE_ANON_KEY).")
+    print(format_report(repo.storage_stats(args[0] if args else None)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Pre-flight prompt size guard.
+
+Tokens are estimated locally (no round trip): about 4 characters per token
+for text, 258 tokens per image (what Gemini bills), and roughly 32 tokens
+per second of audio. Each feature has an input budget and a reduction
+strategy used when a prompt goes over it:
+
+- ``truncate``   cut the largest text part down to size
+- ``retrieve``   keep only the chunks of the largest text part that best
+                 match the rest of the prompt (the question)
+- ``summarize``  summarize the largest text part chunk by chunk
+
+Budgets can be overridden per feature in secrets::
+
+    [PROMPT_BUDGETS]
+    "tutor.chat" = 20000
+"""
+import logging
+import math
+import re
+import threading
+from collections import defaultdict, deque
+
+from nexstudy.config import secret
+
+log = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 258
+AUDIO_BYTES_PER_TOKEN = 500  # 128 kbps audio at 32 tokens/s
+CHUNK_CHARS = 2000
+MAX_SUMMARY_CALLS = 8
+
+BUDGETS = {
+    "*": {"max_tokens": 100_000, "strategy": "truncate"},
+    "tutor.chat": {"max_tokens": 32_000, "strategy": "retrieve"},
+    "tutor.simplify": {"max_tokens": 8_000, "strategy": "truncate"},
+    "tutor.steps": {"max_tokens": 8_000, "strategy": "truncate"},
+    "solver.solve": {"max_tokens": 120_000, "strategy": "truncate"},
+    "planner.plan": {"max_tokens": 16_000, "strategy": "truncate"},
+    "quiz.generate": {"max_tokens": 24_000, "strategy": "summarize"},
+    "audio.script": {"max_tokens": 4_000, "strategy": "truncate"},
+    "budget.summarize": {"max_tokens": 8_000, "strategy": "truncate"},
+}
+
+
+class PromptTooLarge(Exception):
+    """Raised when a prompt cannot be reduced below its feature budget."""
+
+
+# ---------------- Counting ----------------
+def part_tokens(part) -> int:
+    if isinstance(part, str):
+        return math.ceil(len(part) / CHARS_PER_TOKEN)
+    if isinstance(part, dict) and "data" in part:
+        return math.ceil(len(part["data"]) / AUDIO_BYTES_PER_TOKEN)
+    return IMAGE_TOKENS
+
+
+def count_tokens(contents) -> int:
+    if isinstance(contents, str):
+        return part_tokens(contents)
+    return sum(part_tokens(p) for p in contents)
+
+
+# ---------------- Prompt size log ----------------
+_sizes = defaultdict(lambda: deque(maxlen=1000))
+_sizes_lock = threading.Lock()
+
+
+def record_prompt_size(feature: str, tokens: int):
+    with _sizes_lock:
+        _sizes[feature].append(tokens)
+    log.info("prompt feature=%s tokens=%d", feature, tokens)
+
+
+def prompt_size_stats() -> dict:
+    """Per-feature distribution of recent prompt sizes (in estimated tokens)."""
+    with _sizes_lock:
+        snapshot = {f: sorted(v) for f, v in _sizes.items()}
+    stats = {}
+    for feature, sizes in snapshot.items():
+        if not sizes:
+            continue
+        stats[feature] = {
+            "count": len(sizes),
+            "p50": sizes[len(sizes) // 2],
+            "p95": sizes[min(len(sizes) - 1, int(len(sizes) * 0.95))],
+            "max": sizes[-1],
+        }
+    return stats
+
+
+# ---------------- Budgets ----------------
+def get_budget(feature: str) -> dict:
+    parts = feature.split(".")
+    budget = BUDGETS["*"]
+    for i in range(len(parts), 0, -1):
+        if ".".join(parts[:i]) in BUDGETS:
+            budget = BUDGETS[".".join(parts[:i])]
+            break
+    budget = dict(budget)
+    overrides = secret("PROMPT_BUDGETS")
+    if hasattr(overrides, "get") and overrides.get(feature):
+        budget["max_tokens"] = int(overrides[feature])
+    return budget
+
+
+def _largest_text(contents):
+    """Index of the largest text part, skipping the leading instruction."""
+    candidates = [i for i, p in enumerate(contents) if isinstance(p, str) and (i > 0 or len(contents) == 1)]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda i: len(contents[i]))
+
+
+def _chunks(text):
+    chunks, current = [], ""
+    for para in re.split(r"\n\s*\n", text):
+        if current and len(current) + len(para) > CHUNK_CHARS:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+        while len(current) > CHUNK_CHARS:
+            chunks.append(current[:CHUNK_CHARS])
+            current = current[CHUNK_CHARS:]
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ---------------- Strategies ----------------
+def _truncate(contents, max_tokens, summarize=None):
+    while count_tokens(contents) > max_tokens:
+        i = _largest_text(contents)
+        if i is None or not contents[i]:
+            break
+        excess = (count_tokens(contents) - max_tokens) * CHARS_PER_TOKEN
+        keep = max(0, len(contents[i]) - excess - 100)
+        contents[i] = contents[i][:keep] + "\n[...truncated]" if keep else ""
+    return contents
+
+
+def _retrieve(contents, max_tokens, summarize=None):
+    i = _largest_text(contents)
+    if i is None:
+        return contents
+    query = " ".join(p for j, p in enumerate(contents) if j != i and isinstance(p, str))
+    terms = set(re.findall(r"[a-z0-9]{3,}", query.lower()))
+    chunks = _chunks(contents[i])
+    ranked = sorted(
+        range(len(chunks)),
+        key=lambda c: -len(terms & set(re.findall(r"[a-z0-9]{3,}", chunks[c].lower()))),
+    )
+    room = max_tokens - (count_tokens(contents) - part_tokens(contents[i]))
+    picked, used = [], 0
+    for c in ranked:
+        cost = part_tokens(chunks[c])
+        if used + cost > room:
+            continue
+        picked.append(c)
+        used += cost
+    contents[i] = "\n\n[...]\n\n".join(chunks[c] for c in sorted(picked))
+    return contents
+
+
+def _summarize(contents, max_tokens, summarize=None):
+    i = _largest_text(contents)
+    if i is None or summarize is None:
+        return contents
+    text = contents[i]
+    # Bounded fan-out: at most MAX_SUMMARY_CALLS sections, each truncated by
+    # the summarizer's own budget if it is still too long.
+    size = max(CHUNK_CHARS, math.ceil(len(text) / MAX_SUMMARY_CALLS))
+    summaries = []
+    for start in range(0, len(text), size):
+        section = text[start:start + size]
+        res = summarize(section)
+        summaries.append(res.get("text") or section[: CHUNK_CHARS // 4])
+    contents[i] = "\n\n".join(summaries)
+    return contents
+
+
+STRATEGIES = {"truncate": _truncate, "retrieve": _retrieve, "summarize": _summarize}
+
+
+def fit_to_budget(contents, feature: str, summarize=None) -> list:
+    """Return contents that fit the feature budget, reducing them if needed.
+
+    ``summarize`` is a callable text -> {'text': ...} used by the summarize
+    strategy. Raises PromptTooLarge if the non-text parts alone exceed it.
+    """
+    contents = [contents] if isinstance(contents, str) else list(contents)
+    budget = get_budget(feature)
+    tokens = count_tokens(contents)
+    record_prompt_size(feature, tokens)
+    if tokens <= budget["max_tokens"]:
+        return contents
+
+    log.warning("prompt over budget feature=%s tokens=%d budget=%d strategy=%s",
+                feature, tokens, budget["max_tokens"], budget["strategy"])
+    contents = STRATEGIES[budget["strategy"]](contents, budget["max_tokens"], summarize)
+    contents = _truncate(contents, budget["max_tokens"])
+    if count_tokens(contents) > budget["max_tokens"]:
+        raise PromptTooLarge(
+            f"Input too large for {feature} (~{tokens} tokens, limit {budget['max_tokens']}). "
+            "Try a smaller file or fewer pages."
+        )
+    return contents
@@ -0,0 +1,188 @@
+"""Append-only storage for AI Tutor chat messages.
+
+Messages live one per row in ``chat_messages`` (see supabase/migrations).
+A turn is written with one batched insert; ``profiles.doubts_solved`` is
+kept up to date by a database trigger, so saving never re-sends history.
+
+Only the most recent ``HOT_WINDOW`` messages are loaded when the Tutor
+opens. Older ones are fetched a page at a time on request, ordered by
+``(created_at, id)`` so messages saved in the same instant page cleanly.
+Once a user has more than ``COMPACT_THRESHOLD`` live rows the oldest are
+summarized and archived into ``chat_segments``, in whole segments of
+``SEGMENT_SIZE``. Callers check for that after saving messages, once every
+``COMPACT_CHECK_EVERY`` of them, rather than on every page load.
+"""
+import datetime
+import functools
+import uuid
+
+COLUMNS = "id, role, text, created_at"
+HOT_WINDOW = 30
+PAGE_SIZE = 30
+COMPACT_THRESHOLD = 200
+COMPACT_KEEP = 100
+SEGMENT_SIZE = 100
+COMPACT_CHECK_EVERY = 50
+
+
+def new_message(role: str, text: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "role": role,
+        "text": text,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+# ---------------- Reads ----------------
+def load_recent(client, user_id: str, limit: int = HOT_WINDOW) -> list:
+    """Newest `limit` messages, oldest first."""
+    res = (
+        client.table("chat_messages")
+        .select(COLUMNS)
+        .eq("user_id", user_id)
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(limit)
+        .execute()
+    )
+    return list(reversed(res.data or []))
+
+
+def load_before(client, user_id: str, before: dict, limit: int = PAGE_SIZE) -> list:
+    """The page of messages just older than the message `before`, oldest first.
+
+    Falls back to the newest archived segment once the live rows run out;
+    a segment comes back as a summary marker followed by its messages.
+    """
+    created_at, before_id = before["created_at"], before["id"]
+    if before.get("role") != "summary":  # past a marker, the live rows are used up
+        res = (
+            client.table("chat_messages")
+            .select(COLUMNS)
+            .eq("user_id", user_id)
+            .or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{before_id}")')
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        if res.data:
+            return list(reversed(res.data))
+
+    # Segments never overlap and all predate the live rows; a marker's own
+    # segment starts exactly at the marker.
+    query = client.table("chat_segments").select("id, summary, messages, ended_at").eq("user_id", user_id)
+    if before.get("role") == "summary":
+        query = query.lt("started_at", created_at)
+    else:
+        query = query.lte("started_at", created_at)
+    res = query.order("ended_at", desc=True).limit(1).execute()
+    if not res.data:
+        return []
+    segment = res.data[0]
+    marker = {
+        "id": segment["id"],
+        "role": "summary",
+        "text": segment["summary"],
+        "created_at": segment["messages"][0]["created_at"] if segment["messages"] else segment["ended_at"],
+    }
+    return [marker] + segment["messages"]
+
+
+# ---------------- Writes ----------------
+def append_messages(client, user_id: str, messages: list):
+    """Insert new messages in a single round trip.
+
+    Ids are generated client-side, so a retried batch is ignored rather than
+    stored (and counted) twice.
+    """
+    if not messages:
+        return
+    rows = [{**m, "user_id": user_id} for m in messages]
+    client.table("chat_messages").upsert(rows, ignore_duplicates=True).execute()
+
+
+def clear_messages(client, user_id: str):
+    client.table("chat_messages").delete().eq("user_id", user_id).execute()
+    client.table("chat_segments").delete().eq("user_id", user_id).execute()
+
+
+def _segment_id(block: list) -> str:
+    # Derived from the block's first message, so archiving a block twice stores it once.
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "nexstudy-chat-segment:" + block[0]["id"]))
+
+
+def compaction_blocks(client, user_id: str) -> list:
+    """Whole SEGMENT_SIZE blocks of the oldest messages, oldest first; [] below the threshold."""
+    res = (
+        client.table("chat_messages")
+        .select("id", count="exact")
+        .eq("user_id", user_id)
+        .limit(1)
+        .execute()
+    )
+    total = res.count or 0
+    if total <= COMPACT_THRESHOLD:
+        return []
+    to_archive = (total - COMPACT_KEEP) // SEGMENT_SIZE * SEGMENT_SIZE
+    if not to_archive:
+        return []
+
+    res = (
+        client.table("chat_messages")
+        .select(COLUMNS)
+        .eq("user_id", user_id)
+        .order("created_at")
+        .order("id")
+        .limit(to_archive)
+        .execute()
+    )
+    old = res.data or []
+    return [old[start:start + SEGMENT_SIZE] for start in range(0, len(old) - SEGMENT_SIZE + 1, SEGMENT_SIZE)]
+
+
+def archive_segment(client, user_id: str, block: list, summary: str):
+    """Store one block as a segment, then delete its live rows; safe to retry."""
+    client.table("chat_segments").upsert({
+        "id": _segment_id(block),
+        "user_id": user_id,
+        "summary": summary,
+        "messages": block,
+        "message_count": len(block),
+        "started_at": block[0]["created_at"],
+        "ended_at": block[-1]["created_at"],
+    }, ignore_duplicates=True).execute()
+    # Only delete once the segment is stored; a failure leaves duplicates, not gaps.
+    client.table("chat_messages").delete().in_("id", [m["id"] for m in block]).execute()
+
+
+def compact_history(client, user_id: str, summarize, submit=None) -> int:
+    """Archive the oldest messages once the live table grows past the threshold.
+
+    `summarize` turns a transcript into a short summary (text -> str). Only
+    full segments are archived; a segment whose summary is empty or fails
+    stays live, and so does everything after it, so segments stay older
+    than the live rows. Reading and summarizing run in the caller; each
+    segment's writes are handed to `submit` (a callable taking a no-argument
+    function, e.g. a write queue) or run at once. Returns the number of
+    messages archived.
+    """
+    archived = 0
+    for block in compaction_blocks(client, user_id):
+        transcript = "\n".join(
+            f"{'Student' if m['role'] == 'user' else 'Tutor'}: {m['text']}" for m in block
+        )
+        try:
+            summary = (summarize(transcript) or "").strip()
+        except Exception:
+            summary = ""
+        if not summary:
+            break  # retried on the next check
+        write = functools.partial(archive_segment, client, user_id, block, summary)
+        if submit:
+            submit(write)
+        else:
+            write()
+        archived += len(block)
+    return archived
@@ -0,0 +1,168 @@
+"""Supabase clients over one pooled HTTP transport.
+
+Every client in the process sends its requests through a single
+keep-alive connection pool with explicit timeouts, so concurrent users
+reuse warm TLS connections instead of opening their own. What is *not*
+shared is auth state: each signed-in session gets a lightweight client
+carrying that user's access token, and sign-in/refresh/sign-out use a
+throwaway auth client, so one user's login never changes another's
+requests.
+
+    client = clients.user_client(tokens["access_token"])   # PostgREST, as that user
+    user, tokens = clients.sign_in(email, password)        # tokens: {"access_token", ...}
+
+Pool size and timeouts can be tuned with the SUPABASE_POOL_SIZE and
+SUPABASE_TIMEOUT secrets.
+"""
+import functools
+import threading
+import time
+
+from nexstudy.config import secret
+
+POOL_SIZE = 20  # connections per process
+KEEPALIVE_EXPIRY = 30.0  # seconds an idle connection is kept open
+TIMEOUT = 10.0  # seconds per request
+CONNECT_TIMEOUT = 3.0
+REFRESH_MARGIN = 60  # refresh tokens this many seconds before they expire
+
+
+# httpx is imported on first use: guests and the local database never need it.
+@functools.lru_cache(maxsize=None)
+def _shared_transport_class():
+    import httpx
+
+    class SharedTransport(httpx.BaseTransport):
+        """Hands requests to the process pool; closing a client leaves the pool open."""
+
+        def __init__(self, transport):
+            self._transport = transport
+
+        def handle_request(self, request):
+            return self._transport.handle_request(request)
+
+        def close(self):
+            pass
+
+    return SharedTransport
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def _shared_transport():
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            import httpx
+
+            size = int(secret("SUPABASE_POOL_SIZE", POOL_SIZE))
+            limits = httpx.Limits(
+                max_connections=size,
+                max_keepalive_connections=size,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            )
+            # retries only covers failed connection attempts, never a sent request
+            _transport = _shared_transport_class()(httpx.HTTPTransport(limits=limits, retries=1))
+        return _transport
+
+
+def _timeout():
+    import httpx
+
+    return httpx.Timeout(float(secret("SUPABASE_TIMEOUT", TIMEOUT)), connect=CONNECT_TIMEOUT)
+
+
+def _settings():
+    url, key = secret("SUPABASE_URL"), secret("SUPABASE_ANON_KEY")
+    if not (url and key):
+        raise RuntimeError("SUPABASE_URL and SUPABASE_ANON_KEY must be set")
+    return url.rstrip("/"), key
+
+
+def is_configured() -> bool:
+    return bool(secret("SUPABASE_URL") and secret("SUPABASE_ANON_KEY"))
+
+
+# ---------------- Data API (PostgREST) ----------------
+@functools.lru_cache(maxsize=None)
+def _pooled_postgrest_class():
+    from postgrest import SyncPostgrestClient
+    from postgrest.utils import SyncClient
+
+    class PooledPostgrestClient(SyncPostgrestClient):
+        def create_session(self, base_url, headers, timeout):
+            return SyncClient(base_url=base_url, headers=headers, timeout=timeout, transport=_shared_transport())
+
+    return PooledPostgrestClient
+
+
+def user_client(access_token=None):
+    """A PostgREST client acting as the user who owns `access_token` (anon without one).
+
+    Cheap to create: it holds headers only and borrows connections from the pool.
+    """
+    url, key = _settings()
+    return _pooled_postgrest_class()(
+        f"{url}/rest/v1",
+        headers={"apiKey": key, "Authorization": f"Bearer {access_token or key}"},
+        timeout=_timeout(),
+    )
+
+
+# ---------------- Auth (GoTrue) ----------------
+def _auth_client():
+    """A throwaway auth client: it keeps no session beyond the call that uses it."""
+    from gotrue import SyncGoTrueClient
+    from gotrue.http_clients import SyncClient
+
+    url, key = _settings()
+    return SyncGoTrueClient(
+        url=f"{url}/auth/v1",
+        headers={"apiKey": key, "Authorization": f"Bearer {key}"},
+        auto_refresh_token=False,
+        persist_session=False,
+        http_client=SyncClient(transport=_shared_transport(), timeout=_timeout()),
+    )
+
+
+def _tokens(session) -> dict:
+    if session is None:
+        return None
+    return {
+        "access_token": session.access_token,
+        "refresh_token": session.refresh_token,
+        "expires_at": session.expires_at or int(time.time()) + (session.expires_in or 3600),
+    }
+
+
+def sign_up(email: str, password: str, username: str = None):
+    """Returns (user, tokens); tokens is None when email confirmation is pending.
+
+    `username` is kept in the user's metadata until the profile can be created.
+    """
+    credentials = {"email": email, "password": password}
+    if username:
+        credentials["options"] = {"data": {"username": username}}
+    res = _auth_client().sign_up(credentials)
+    return res.user, _tokens(res.session)
+
+
+def sign_in(email: str, password: str):
+    """Returns (user, tokens)."""
+    res = _auth_client().sign_in_with_password({"email": email, "password": password})
+    return res.user, _tokens(res.session)
+
+
+def sign_out(tokens):
+    """Revoke the session's refresh tokens server-side."""
+    if tokens:
+        _auth_client().admin.sign_out(tokens["access_token"])
+
+
+def fresh_tokens(tokens):
+    """`tokens`, refreshed first if the access token is about to expire."""
+    if not tokens or tokens["expires_at"] - REFRESH_MARGIN > time.time():
+        return tokens
+    return _tokens(_auth_client().refresh_session(tokens["refresh_token"]).session)
@@ -0,0 +1,25 @@
+"""Settings lookup shared by the nexstudy helpers."""
+import os
+
+# The app's static/ folder, served by Streamlit at app/static/ when
+# server.enableStaticServing is on. It holds generated, public files only
+# (logo variants) and is not checked in.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+
+def secret(name, default=None):
+    """Read a value from Streamlit secrets, then the environment."""
+    try:
+        import streamlit as st
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        pass
+    return os.environ.get(name, default)
+
+
+def data_dir() -> str:
+    """Directory for local stores (metering, caches); created on first use."""
+    path = os.environ.get("NEXSTUDY_DATA_DIR", ".nexstudy")
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,55 @@
+"""Dashboard statistics: one aggregate query, cached per user for a few seconds.
+
+``dashboard_stats`` (see supabase/migrations) returns the persisted
+counters, todo totals, the next pending tasks and the last week of
+activity rollups with the current streak in one projected row.
+The result is cached per user for TTL seconds across all of that user's
+sessions; every Repository write that changes one of the numbers calls
+``invalidate(user_id)`` once the write has gone through:
+
+    data = dashboard_stats.get(repo, user["id"])   # {"doubts_solved": 3, "pending_todos": 2, ...}
+"""
+import threading
+import time
+
+TTL = 30.0  # seconds
+DEFAULTS = {
+    "doubts_solved": 0,
+    "plans_created": 0,
+    "audio_generated": 0,
+    "pending_todos": 0,
+    "completed_todos": 0,
+    "papers_saved": 0,
+    "next_todos": [],
+    "activity": [],
+    "streak": 0,
+}
+
+_lock = threading.Lock()
+_cache = {}  # user_id -> (expires_at, stats)
+_counts = {"hits": 0, "misses": 0}
+
+
+def get(repo, user_id: str) -> dict:
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry and entry[0] > now:
+            _counts["hits"] += 1
+            return dict(entry[1])
+        _counts["misses"] += 1
+    data = dict(DEFAULTS)
+    data.update({k: v for k, v in (repo.dashboard_stats(user_id) or {}).items() if v is not None})
+    with _lock:
+        _cache[user_id] = (now + TTL, data)
+    return dict(data)
+
+
+def invalidate(user_id: str):
+    with _lock:
+        _cache.pop(user_id, None)
+
+
+def cache_stats() -> dict:
+    with _lock:
+        return dict(_counts, users=len(_cache))
@@ -0,0 +1,197 @@
+"""Bulk export of a user's whole library as a zip.
+
+``iter_zip`` is a generator: it reads items a page at a time and yields
+the archive's bytes as each entry is written, so memory stays at one
+page of items however large the library is:
+
+    with open(path, "wb") as f:
+        for chunk in export.iter_zip(repo, user["id"]):
+            f.write(chunk)
+
+The archive holds one file per item (markdown for solutions, notes,
+plans and debug analyses, source files for code) and ``manifest.json``
+describing every item. ``write_export`` streams it to a private
+``exports/`` folder in the data directory (not ``static/``, which
+Streamlit serves to anyone with the URL); the page hands the file to
+``st.download_button`` from there, and only on the run the user asks
+for it, since the button holds a copy in memory. A user's new export
+replaces their previous one, and a background timer deletes exports
+older than EXPORT_TTL, starting with any left over when the process
+starts.
+"""
+import datetime
+import json
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+
+from nexstudy import library
+from nexstudy.config import STATIC_DIR, data_dir
+
+PAGE_SIZE = 50  # items held in memory at once
+EXPORT_TTL = 3600  # seconds an export file is kept
+PRUNE_INTERVAL = 300  # seconds between sweeps for expired exports
+LEGACY_EXPORT_DIR = os.path.join(STATIC_DIR, "exports")  # publicly served; emptied at startup
+
+FOLDERS = {"paper": "solutions", "code": "code", "audio": "audio-notes", "plan": "plans"}
+CODE_EXTENSIONS = {"Python": "py", "JavaScript": "js", "HTML/CSS": "html", "C++": "cpp", "Java": "java", "SQL": "sql"}
+
+
+class _Sink:
+    """Write-only stream for zipfile; the generator drains it after every entry."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", text or "").strip("-")[:60] or "untitled"
+
+
+def item_path(row: dict) -> str:
+    """Archive path of an item; the id prefix keeps same-titled items apart."""
+    meta = row.get("meta") or {}
+    ext = "md"
+    if row["kind"] == "code" and meta.get("type") != "debug":
+        ext = CODE_EXTENSIONS.get(meta.get("language"), "txt")
+    date = (row.get("created_at") or "")[:10]
+    return f"{FOLDERS[row['kind']]}/{date}-{_slug(row.get('title'))}-{row['id'][:8]}.{ext}"
+
+
+def iter_items(repo, user_id: str, page_size: int = PAGE_SIZE):
+    """Every item with its content, kind by kind, newest first; one page in memory."""
+    for kind in library.KINDS:
+        offset = 0
+        while True:
+            rows = repo.list_items(user_id, kind, limit=page_size, offset=offset)
+            yield from rows
+            if len(rows) < page_size:
+                break
+            offset += page_size
+
+
+def iter_zip(repo, user_id: str, page_size: int = PAGE_SIZE):
+    """Yield the export archive's bytes, entry by entry."""
+    sink = _Sink()
+    # Manifest entries are spooled to disk and copied in last, so the
+    # manifest matches exactly the items written in this one pass.
+    with tempfile.TemporaryFile() as manifest, zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        count = 0
+        for row in iter_items(repo, user_id, page_size):
+            path = item_path(row)
+            archive.writestr(path, row.get("content") or "")
+            manifest.write((",\n" if count else "").encode() + json.dumps({
+                "id": row["id"],
+                "kind": row["kind"],
+                "title": row.get("title", ""),
+                "created_at": row.get("created_at"),
+                "path": path,
+                "meta": row.get("meta") or {},
+            }, ensure_ascii=False).encode("utf-8"))
+            count += 1
+            yield sink.drain()
+
+        header = json.dumps({
+            "exported_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "item_count": count,
+        })[:-1]
+        manifest.seek(0)
+        with archive.open("manifest.json", "w") as out:
+            out.write(f'{header}, "items": [\n'.encode())
+            shutil.copyfileobj(manifest, out)
+            out.write(b"\n]}\n")
+    yield sink.drain()
+
+
+# ---------------- Export files ----------------
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def _export_root() -> str:
+    path = os.path.join(data_dir(), "exports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def export_dir() -> str:
+    """Where exports are written; private to the server."""
+    start_cleanup()
+    return _export_root()
+
+
+def start_cleanup():
+    """Start the expiry timer once per process; its first sweep runs at once."""
+    global _janitor
+    with _janitor_lock:
+        if _janitor is None:
+            _prune(time.time(), LEGACY_EXPORT_DIR, ttl=0)
+            _janitor = threading.Thread(target=_prune_loop, args=(_export_root(),), name="export-janitor", daemon=True)
+            _janitor.start()
+
+
+def _prune_loop(path: str):
+    while True:
+        _prune(time.time(), path)
+        time.sleep(PRUNE_INTERVAL)
+
+
+def _prune(now: float, path: str, ttl: float = EXPORT_TTL, prefix: str = ""):
+    if not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        if not name.startswith(prefix):
+            continue
+        file = os.path.join(path, name)
+        try:
+            if now - os.path.getmtime(file) >= ttl:
+                os.remove(file)
+        except OSError:
+            pass
+
+
+def _owner_prefix(user_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]", "", user_id)[:36] + "-"
+
+
+def write_export(repo, user_id: str) -> str:
+    """Stream a user's export to a new file under export_dir(); returns its name.
+
+    The user's previous export is deleted first; the name is random, so it
+    cannot be guessed from the user id.
+    """
+    directory = export_dir()
+    prefix = _owner_prefix(user_id)
+    _prune(time.time(), directory, ttl=0, prefix=prefix)
+    name = f"{prefix}{secrets.token_urlsafe(16)}.zip"
+    part = os.path.join(directory, name + ".part")
+    try:
+        with open(part, "wb") as f:
+            for chunk in iter_zip(repo, user_id):
+                f.write(chunk)
+        os.replace(part, os.path.join(directory, name))
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+    return name
+
+
+def export_path(name: str) -> str:
+    return os.path.join(export_dir(), os.path.basename(name))
@@ -0,0 +1,54 @@
+"""Deferred imports for heavy dependencies.
+
+pdfplumber, PIL, pandas and gTTS each take 100-500 ms to import, and most
+page runs never touch them: nobody uploaded a file, there is nothing to
+chart. A page declares them with ``lazy.module`` instead of ``import``;
+the real module is imported on first attribute access and every later
+access goes straight to it:
+
+    pdfplumber = lazy.module("pdfplumber")
+    Image = lazy.module("PIL.Image")
+
+    with pdfplumber.open(uploaded_file) as pdf:   # imported here, once per process
+        ...
+
+``available`` checks that an optional dependency is installed without
+importing it. ``python benchmarks/cold_start.py`` measures what each page
+still imports on its first run.
+"""
+import functools
+import importlib
+import importlib.util
+
+
+class _LazyModule:
+    __slots__ = ("_name", "_module")
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            # import_module holds the import lock, so racing sessions get one module
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+@functools.lru_cache(maxsize=None)
+def module(name: str) -> _LazyModule:
+    """A stand-in for module `name` that imports it on first use."""
+    return _LazyModule(name)
+
+
+def available(name: str) -> bool:
+    """Whether `name` can be imported, without importing it (its parent packages aside)."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
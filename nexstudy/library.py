@@ -0,0 +1,127 @@
+"""Saved library items (papers, code, audio notes, plans).
+
+Each item is a row in ``library_items``:
+``{id, kind, title, meta, content, created_at}``. ``meta`` holds the
+kind-specific fields (language, type, tags, plan meta/days). Large
+contents live compressed in ``content_blobs`` and the row carries their
+``blob_hash`` (see nexstudy.blobs); the functions here pack and unpack
+them, so callers always see plain ``content``.
+"""
+import uuid
+
+from nexstudy import blobs
+
+KINDS = ("paper", "code", "audio", "plan")
+COUNTERS = ("audio_generated", "plans_created")
+COLUMNS = "id, kind, title, meta, content, blob_hash, created_at"
+# Listings carry everything but the content, which is loaded when an item is opened.
+LISTING_COLUMNS = "id, kind, title, meta, created_at"
+PAGE_SIZE = 20
+
+
+def new_item(kind: str, title: str, content: str, meta=None) -> dict:
+    """Build an item with a client-side id, so retried saves stay idempotent."""
+    return {"id": str(uuid.uuid4()), "kind": kind, "title": title, "content": content, "meta": meta or {}}
+
+
+def from_entry(kind: str, entry: dict, content_key: str = "content") -> dict:
+    """Build an item from a page's entry dict; the other fields go to meta."""
+    meta = {k: v for k, v in entry.items() if k not in ("id", "title", content_key)}
+    return new_item(kind, entry.get("title", ""), entry.get(content_key, ""), meta)
+
+
+def to_entry(row: dict, content_key: str = "content") -> dict:
+    """The inverse of from_entry: a row back in the shape the page saved."""
+    entry = dict(row.get("meta") or {})
+    entry.setdefault("date", (row.get("created_at") or "")[:10])
+    entry.update({"id": row["id"], "title": row.get("title", "")})
+    if "content" in row:
+        entry[content_key] = row["content"]
+    return entry
+
+
+def add_item(client, user_id: str, item: dict, counter=None):
+    """Insert an item (and bump `counter`) in one RPC call.
+
+    Large contents are sent packed as a blob; the plain text goes along
+    once so the database can index it for search, but is not stored.
+    Works with the Supabase client or the local SQLite stand-in
+    (nexstudy.localdb.LocalDB), which implement the same function.
+    """
+    client.rpc("add_library_item", {
+        "p_id": item["id"],
+        "p_user_id": user_id,
+        "p_kind": item["kind"],
+        "p_title": item["title"],
+        "p_meta": item["meta"],
+        "p_content": item["content"],
+        "p_counter": counter,
+        "p_blob": blobs.pack(item["content"]),
+    }).execute()
+
+
+def list_items(client, user_id: str, kind: str, limit=None, offset: int = 0, columns: str = COLUMNS) -> list:
+    """A user's items of one kind, newest first."""
+    query = (
+        client.table("library_items")
+        .select(columns)
+        .eq("user_id", user_id)
+        .eq("kind", kind)
+        .order("created_at", desc=True)
+    )
+    if limit is not None:
+        query = query.range(offset, offset + limit - 1)
+    rows = query.execute().data or []
+    packed = [row["id"] for row in rows if row.get("blob_hash")]
+    if packed:
+        contents = get_contents(client, user_id, packed)
+        for row in rows:
+            if row.get("blob_hash"):
+                row["content"] = contents.get(row["id"], "")
+    return rows
+
+
+def list_page(client, user_id: str, kind: str, page: int, page_size: int = PAGE_SIZE):
+    """One page of metadata-only rows, newest first, and whether more follow."""
+    rows = list_items(
+        client, user_id, kind, limit=page_size + 1, offset=page * page_size, columns=LISTING_COLUMNS
+    )
+    return rows[:page_size], len(rows) > page_size
+
+
+def get_contents(client, user_id: str, item_ids) -> dict:
+    """Plain contents of several items by id, inline or unpacked from their blobs."""
+    res = client.rpc("library_contents", {"p_user_id": user_id, "p_ids": list(item_ids)}).execute()
+    return {
+        row["id"]: blobs.unpack(row["codec"], row["data"]) if row.get("codec") else row.get("content") or ""
+        for row in res.data or []
+    }
+
+
+def get_content(client, user_id: str, item_id: str) -> str:
+    return get_contents(client, user_id, [item_id]).get(item_id, "")
+
+
+def search(client, user_id: str, query: str, kind=None, since=None, until=None, limit: int = 20) -> list:
+    """Ranked matches across a user's items, best first, each with a highlighted ``snippet``.
+
+    `since`/`until` are ISO timestamps bounding created_at.
+    """
+    if not query or not query.strip():
+        return []
+    res = client.rpc("search_library", {
+        "p_user_id": user_id,
+        "p_query": query,
+        "p_kind": kind,
+        "p_since": since,
+        "p_until": until,
+        "p_limit": limit,
+    }).execute()
+    return res.data or []
+
+
+def storage_stats(client, user_id=None) -> dict:
+    """Stored vs. plain bytes for a user's items (all visible users when None); see blobs.format_report."""
+    res = client.rpc("library_storage_stats", {"p_user_id": user_id}).execute()
+    rows = res.data or []
+    return rows[0] if isinstance(rows, list) else rows
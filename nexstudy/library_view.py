@@ -0,0 +1,148 @@
+"""Paginated listing for the saved-library tabs.
+
+Draws one page of titles (no content) and loads an item's content only
+when it is opened, so a tab's payload and render cost depend on the page
+size, not on how many items the user has saved:
+
+    library_view.render_library(repo, user, "paper", label, show_item, empty="No saved solutions found.")
+
+``render_library`` is what the tabs call: the search box above the
+listing, with one place that reports load errors. ``render_search`` puts
+a full-text search box (with type and date filters) above a listing and
+shows ranked hits with snippets instead of the listing while a query is
+entered.
+
+Pages, search results and opened contents are cached in the session
+snapshot; saving an item calls ``invalidate(user, kind)`` so they reload.
+"""
+import streamlit as st
+
+from nexstudy import library, snapshot, writebehind
+
+
+KIND_LABELS = {"paper": "Solutions", "code": "Code", "audio": "Audio notes", "plan": "Plans", "all": "All types"}
+
+
+def invalidate(user, kind: str):
+    snap = snapshot.get_snapshot(user)
+    snap.invalidate_prefix(f"library:{kind}:")
+    snap.invalidate_prefix("search:")
+
+
+def _toggle(state_key, item_id):
+    st.session_state[state_key] = None if st.session_state.get(state_key) == item_id else item_id
+
+
+def _turn_page(state_key, step):
+    st.session_state[state_key] = max(0, st.session_state.get(state_key, 0) + step)
+
+
+def _render_row(repo, user, kind, row, label, render_item, content_key, open_key, snippet=None):
+    """One title row with an Open/Close toggle; the content is fetched only when open."""
+    own_kind = row.get("kind", kind) == kind
+    entry = library.to_entry(row, content_key if own_kind else "content")
+    is_open = st.session_state.get(open_key) == entry["id"]
+    title = label(entry) if own_kind else f"{entry.get('title')} ({entry.get('date')}) · {KIND_LABELS[row['kind']]}"
+    col_title, col_btn = st.columns([6, 1])
+    col_title.markdown(f"{'▾' if is_open else '▸'} **{title}**")
+    col_btn.button(
+        "Close" if is_open else "Open", key=f"{kind}_toggle_{entry['id']}",
+        on_click=_toggle, args=(open_key, entry["id"]),
+    )
+    if snippet:
+        st.caption(snippet.replace("\n", " "))
+    if is_open:
+        content = snapshot.get_snapshot(user).get(
+            f"item:{entry['id']}", lambda: repo.get_content(user["id"], entry["id"])
+        )
+        with st.container(border=True):
+            if own_kind:
+                entry[content_key] = content
+                render_item(entry)
+            else:
+                st.markdown(content)
+
+
+def render_search(repo, user, kind: str, label, render_item, content_key="content", limit: int = 20) -> bool:
+    """Search box with type/date filters; returns True while showing results.
+
+    Defaults to the tab's own kind; "All types" searches the whole library.
+    """
+    col_query, col_kind, col_since = st.columns([3, 1, 1])
+    query = col_query.text_input(
+        "🔎 Search your library", key=f"{kind}_search", placeholder="Words from a title or the text"
+    )
+    scope = col_kind.selectbox(
+        "Type", [kind, "all"] + [k for k in library.KINDS if k != kind],
+        format_func=KIND_LABELS.get, key=f"{kind}_search_kind",
+    )
+    since = col_since.date_input("Saved since", value=None, key=f"{kind}_search_since")
+    if not query.strip():
+        return False
+
+    since_iso = since.isoformat() if since else None
+    scope_kind = None if scope == "all" else scope
+
+    def load():
+        writebehind.wait_idle(user["id"])  # just-saved items are searchable
+        return repo.search(user["id"], query, kind=scope_kind, since=since_iso, limit=limit)
+
+    hits = snapshot.get_snapshot(user).get(f"search:{scope}:{since_iso}:{query.strip()}", load)
+    if not hits:
+        st.info("No saved items match your search.")
+        return True
+    st.caption(f"{len(hits)} best match{'es' if len(hits) != 1 else ''}")
+    for hit in hits:
+        _render_row(repo, user, kind, hit, label, render_item, content_key,
+                    f"library_{kind}_open", snippet=hit.get("snippet"))
+    return True
+
+
+def render_listing(repo, user, kind: str, label, render_item, content_key="content",
+                   page_size: int = library.PAGE_SIZE) -> bool:
+    """Render one page of `kind` items; returns False when the library is empty.
+
+    `label(entry)` gives a row's title; `render_item(entry)` draws an opened
+    item, whose content is under `content_key`.
+    """
+    user_id = user["id"]
+    snap = snapshot.get_snapshot(user)
+    page_key, open_key = f"library_{kind}_page", f"library_{kind}_open"
+    page = st.session_state.get(page_key, 0)
+
+    def load_page():
+        writebehind.wait_idle(user_id)
+        return repo.list_page(user_id, kind, page, page_size)
+
+    rows, has_more = snap.get(f"library:{kind}:{page}", load_page)
+    if not rows and page == 0:
+        return False
+
+    for row in rows:
+        _render_row(repo, user, kind, row, label, render_item, content_key, open_key)
+
+    if page or has_more:
+        col_prev, col_info, col_next = st.columns([1, 2, 1])
+        col_prev.button("◀ Newer", key=f"{kind}_prev", disabled=page == 0,
+                        on_click=_turn_page, args=(page_key, -1))
+        col_info.caption(f"Page {page + 1}")
+        col_next.button("Older ▶", key=f"{kind}_next", disabled=not has_more,
+                        on_click=_turn_page, args=(page_key, 1))
+    return True
+
+
+def render_library(repo, user, kind: str, label, render_item, empty: str, content_key="content"):
+    """A saved-library tab: search above a listing, `empty` when there is nothing saved.
+
+    Storage errors are shown as errors, never as an empty library.
+    """
+    try:
+        has_items = (
+            render_search(repo, user, kind, label, render_item, content_key=content_key)
+            or render_listing(repo, user, kind, label, render_item, content_key=content_key)
+        )
+    except Exception as e:
+        st.error(f"Couldn't load your library: {e}")
+        return
+    if not has_items:
+        st.info(empty)
@@ -0,0 +1,252 @@
+"""Model access shared by every page.
+
+Pages call ``call_gemini(contents, feature=...)``. The feature name decides
+which backend answers:
+
+- ``gemini``  Google Gemini over the network (default)
+- ``stub``    deterministic offline answers for tests and benchmarks
+- ``local``   a small CPU model (``transformers``) for cheap text rewrites
+
+Routes are "<backend>" or "<backend>:<model>" and can be set in
+``.streamlit/secrets.toml``::
+
+    [LLM_ROUTES]
+    "tutor.simplify" = "local"
+    "audio.script" = "local:google/flan-t5-base"
+
+or with ``NEXSTUDY_LLM_ROUTES="tutor.simplify=local,audio=stub"``.
+``NEXSTUDY_LLM_BACKEND=stub`` sends every feature to the stub.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+
+from nexstudy import budget, metering, tracing
+from nexstudy.config import secret
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+DEFAULT_LOCAL_MODEL = "google/flan-t5-small"
+
+# Feature names are dotted ("tutor.simplify"); a route for "tutor" covers
+# every tutor feature and "*" covers everything else.
+DEFAULT_ROUTES = {
+    "*": "gemini",
+    "quiz": "gemini:gemini-2.5-flash",
+}
+
+
+# ---------------- Config ----------------
+def _routes() -> dict:
+    routes = dict(DEFAULT_ROUTES)
+    configured = secret("LLM_ROUTES")
+    if hasattr(configured, "items"):
+        routes.update({str(k): str(v) for k, v in configured.items()})
+    for pair in os.environ.get("NEXSTUDY_LLM_ROUTES", "").split(","):
+        if "=" in pair:
+            feature, spec = pair.split("=", 1)
+            routes[feature.strip()] = spec.strip()
+    forced = os.environ.get("NEXSTUDY_LLM_BACKEND")
+    if forced:
+        routes = {"*": forced}
+    return routes
+
+
+def resolve_route(feature: str) -> tuple:
+    """Return (backend, model) for a feature, falling back along its dotted prefixes."""
+    routes = _routes()
+    parts = feature.split(".")
+    spec = None
+    for i in range(len(parts), 0, -1):
+        spec = routes.get(".".join(parts[:i]))
+        if spec:
+            break
+    spec = spec or routes.get("*", "gemini")
+    backend, _, model = spec.partition(":")
+    return backend, model or None
+
+
+def _api_key(api_key=None):
+    return api_key or secret("GEMINI_API_KEY")
+
+
+# ---------------- Backends ----------------
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, api_key, model_name=None):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model_name = model_name or DEFAULT_MODEL
+        self.model = genai.GenerativeModel(self.model_name)
+
+    def generate(self, contents, generation_config=None) -> dict:
+        resp = self.model.generate_content(contents, generation_config=generation_config)
+        return {"text": resp.text or "", "usage": metering.usage_from_response(resp)}
+
+
+# Canned answers for features whose pages parse the model output.
+STUB_RESPONSES = {
+    "planner.plan": lambda prompt: json.dumps({
+        "quote": "Small daily wins add up.",
+        "strategy": ["Revise daily", "Practice past papers"],
+        "days": [
+            {"date": "2030-01-01", "topic": "Review", "activity": "Study", "duration_hours": 2}
+        ],
+    }),
+    "quiz.generate": lambda prompt: json.dumps({
+        "questions": [
+            {"question": f"Stub question {i + 1}?", "options": ["A", "B", "C", "D"], "answer": "A"}
+            for i in range(5)
+        ],
+    }),
+}
+
+
+class StubBackend:
+    """Deterministic offline backend; the answer depends only on feature and prompt."""
+    name = "stub"
+    model_name = "stub"
+
+    def __init__(self, feature, latency_ms=None):
+        self.feature = feature
+        if latency_ms is None:
+            latency_ms = float(os.environ.get("NEXSTUDY_STUB_LATENCY_MS", "0"))
+        self.latency = latency_ms / 1000.0
+
+    def generate(self, contents, generation_config=None) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = _prompt_text(contents)
+        canned = STUB_RESPONSES.get(self.feature)
+        if canned:
+            text = canned(prompt)
+        else:
+            digest = hashlib.sha1(f"{self.feature}\n{prompt}".encode()).hexdigest()[:8]
+            text = f"Stub answer {digest} for {self.feature}.\n\n{prompt[:200]}"
+        return {"text": text, "usage": _estimated_usage(contents, text)}
+
+
+class LocalBackend:
+    """Small seq2seq model on CPU for text-only rewrites (needs ``transformers``)."""
+    name = "local"
+
+    def __init__(self, model_name=None):
+        self.model_name = model_name or DEFAULT_LOCAL_MODEL
+        self.pipe = _local_pipeline(self.model_name)
+
+    def generate(self, contents, generation_config=None) -> dict:
+        if any(not isinstance(part, str) for part in contents):
+            raise ValueError("Local model only accepts text prompts.")
+        out = self.pipe(_prompt_text(contents), max_new_tokens=512)
+        text = out[0]["generated_text"]
+        return {"text": text, "usage": _estimated_usage(contents, text)}
+
+
+@lru_cache(maxsize=2)
+def _local_pipeline(model_name):
+    from transformers import pipeline
+    return pipeline("text2text-generation", model=model_name, device=-1)
+
+
+@lru_cache(maxsize=8)
+def _gemini_backend(api_key, model_name):
+    return GeminiBackend(api_key, model_name)
+
+
+def _estimated_usage(contents, text) -> dict:
+    return {
+        "prompt_tokens": budget.count_tokens(contents),
+        "output_tokens": budget.count_tokens(text),
+        "cached_tokens": 0,
+    }
+
+
+def _current_user_id() -> str:
+    try:
+        import streamlit as st
+        user = st.session_state.get("user")
+    except Exception:
+        user = None
+    return user["id"] if user else "guest"
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    return "\n".join(part for part in contents if isinstance(part, str))
+
+
+def get_backend(feature: str, api_key=None):
+    """Backend instance for a feature, or None if it cannot be built."""
+    backend, model = resolve_route(feature)
+    if backend == "stub":
+        return StubBackend(feature)
+    if backend == "local":
+        try:
+            return LocalBackend(model)
+        except Exception as e:
+            log.warning("Local model unavailable for %s (%s); using Gemini.", feature, e)
+            model = None
+    key = _api_key(api_key)
+    if not key:
+        return None
+    return _gemini_backend(key, model)
+
+
+def is_configured(feature: str = "*", api_key=None) -> bool:
+    """True if a call for this feature can be made (stub/local need no key)."""
+    backend, _ = resolve_route(feature)
+    return backend in ("stub", "local") or bool(_api_key(api_key))
+
+
+# ---------------- Public API ----------------
+def call_gemini(contents, feature: str = "default", generation_config=None, api_key=None, user_id=None) -> dict:
+    """Safe wrapper returning {'text': ...} or {'error': ...}
+
+    ``user_id`` is only needed off the script thread (background jobs);
+    otherwise the logged-in user is read from session state.
+    """
+    user_id = user_id or _current_user_id()
+    try:
+        over_quota = metering.quota_exceeded(user_id)
+    except Exception as e:
+        log.warning("Quota check failed: %s", e)
+        over_quota = False
+    if over_quota:
+        return {"error": "Daily AI usage limit reached. Please try again tomorrow."}
+    try:
+        contents = budget.fit_to_budget(
+            contents, feature, summarize=lambda text: _summarize_chunk(text, user_id)
+        )
+    except budget.PromptTooLarge as e:
+        return {"error": str(e)}
+    try:
+        backend = get_backend(feature, api_key)
+    except Exception as e:
+        return {"error": f"Model initialization error: {e}"}
+    if backend is None:
+        return {"error": "Gemini API key not configured."}
+    try:
+        with tracing.span("llm.generate", feature=feature, backend=backend.name, model=backend.model_name) as sp:
+            out = backend.generate(contents, generation_config=generation_config)
+            sp.tag(**out["usage"])
+    except Exception as e:
+        return {"error": str(e)}
+    try:
+        metering.record_usage(user_id, feature, backend.model_name, out["usage"])
+    except Exception as e:
+        log.warning("Could not record usage for %s: %s", feature, e)
+    return {"text": out["text"]}
+
+
+def _summarize_chunk(text: str, user_id: str) -> dict:
+    return call_gemini(
+        ["Summarize this study material. Keep every key fact, term and number.", text],
+        feature="budget.summarize",
+        user_id=user_id,
+    )
@@ -0,0 +1,663 @@
+"""SQLite stand-in for the Supabase database.
+
+Implements the subset of the PostgREST query API the app uses
+(``table().select().eq().order().range().execute()``, insert/upsert/
+update/delete) plus the RPCs and triggers in supabase/migrations, so the
+storage code runs unchanged locally (development, tests, benchmarks)
+without a live project:
+
+    db = LocalDB("/tmp/nexstudy.db")
+    db.create_profile("u1", "alice")
+    library.add_item(db, "u1", item, counter="audio_generated")
+
+Every execute() counts as one round trip. Benchmarks can make each one
+cost what a request to the hosted database would with ``latency_ms`` or
+NEXSTUDY_DB_LATENCY_MS.
+"""
+import base64
+import contextlib
+import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from nexstudy import blobs
+from nexstudy.blobs import EXCERPT_CHARS
+from nexstudy.library import COUNTERS
+
+# Columns stored as JSON text and decoded on read (jsonb in Postgres).
+JSON_COLUMNS = {
+    "profiles": ("chat_history", "saved_papers", "saved_code", "saved_audio", "saved_plans", "todos"),
+    "library_items": ("meta",),
+    "chat_segments": ("messages",),
+}
+# Columns Postgres fills by default that SQLite cannot (uuid / now()).
+GENERATED_ID = ("library_items", "chat_segments")
+TIMESTAMPED = ("library_items", "chat_messages", "chat_segments", "activity_events")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id TEXT PRIMARY KEY,
+    username TEXT,
+    chat_history TEXT,
+    saved_papers TEXT,
+    saved_code TEXT,
+    saved_audio TEXT,
+    saved_plans TEXT,
+    todos TEXT,
+    doubts_solved INTEGER DEFAULT 0,
+    plans_created INTEGER DEFAULT 0,
+    audio_generated INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS library_items (
+    seq INTEGER PRIMARY KEY,  -- stable rowid for the search index; VACUUM keeps it
+    id TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL CHECK (kind IN ('paper', 'code', 'audio', 'plan')),
+    title TEXT NOT NULL DEFAULT '',
+    meta TEXT NOT NULL DEFAULT '{}',
+    content TEXT NOT NULL DEFAULT '',
+    blob_hash TEXT,
+    excerpt TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS content_blobs (
+    user_id TEXT NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    hash TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, hash)
+);
+CREATE INDEX IF NOT EXISTS library_items_user_created ON library_items (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS library_items_user_kind_created ON library_items (user_id, kind, created_at DESC);
+-- External-content index: the text stays in library_items (or its blob) and
+-- the index holds only tokens. The triggers below keep it in step, always
+-- sending what the view returns for the row.
+CREATE VIEW IF NOT EXISTS library_search_text AS
+    SELECT seq, title, {item_text} AS content FROM library_items;
+CREATE VIRTUAL TABLE IF NOT EXISTS library_search USING fts5(
+    title, content, content = 'library_search_text', content_rowid = 'seq',
+    tokenize = 'porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS library_items_search_insert AFTER INSERT ON library_items
+BEGIN
+    INSERT INTO library_search (rowid, title, content) VALUES (NEW.seq, NEW.title, {new_text});
+END;
+CREATE TRIGGER IF NOT EXISTS library_items_search_delete AFTER DELETE ON library_items
+BEGIN
+    INSERT INTO library_search (library_search, rowid, title, content)
+        VALUES ('delete', OLD.seq, OLD.title, {old_text});
+END;
+CREATE TRIGGER IF NOT EXISTS library_items_search_update AFTER UPDATE ON library_items
+BEGIN
+    INSERT INTO library_search (library_search, rowid, title, content)
+        VALUES ('delete', OLD.seq, OLD.title, {old_text});
+    INSERT INTO library_search (rowid, title, content) VALUES (NEW.seq, NEW.title, {new_text});
+END;
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    role TEXT NOT NULL CHECK (role IN ('user', 'assistant')),
+    text TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_messages_user_created ON chat_messages (user_id, created_at);
+CREATE TABLE IF NOT EXISTS chat_segments (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    summary TEXT NOT NULL DEFAULT '',
+    messages TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    started_at TEXT NOT NULL,
+    ended_at TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_segments_user_ended ON chat_segments (user_id, ended_at DESC);
+CREATE TRIGGER IF NOT EXISTS chat_messages_bump_doubts
+    AFTER INSERT ON chat_messages FOR EACH ROW WHEN NEW.role = 'user'
+BEGIN
+    UPDATE profiles SET doubts_solved = COALESCE(doubts_solved, 0) + 1 WHERE id = NEW.user_id;
+END;
+CREATE TABLE IF NOT EXISTS activity_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL CHECK (kind IN ('doubt', 'quiz', 'plan', 'audio', 'todo_done')),
+    created_at TEXT NOT NULL,
+    event_id TEXT  -- client-generated for app-recorded events, so retries insert once
+);
+CREATE INDEX IF NOT EXISTS activity_events_user_created ON activity_events (user_id, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS activity_events_event_id ON activity_events (event_id);
+CREATE TABLE IF NOT EXISTS activity_daily (
+    user_id TEXT NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    doubts INTEGER NOT NULL DEFAULT 0,
+    quizzes INTEGER NOT NULL DEFAULT 0,
+    plans INTEGER NOT NULL DEFAULT 0,
+    audio INTEGER NOT NULL DEFAULT 0,
+    todos_done INTEGER NOT NULL DEFAULT 0,
+    streak INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (user_id, day)
+);
+CREATE TRIGGER IF NOT EXISTS activity_events_rollup AFTER INSERT ON activity_events FOR EACH ROW
+BEGIN
+    INSERT OR IGNORE INTO activity_daily (user_id, day, streak)
+    VALUES (NEW.user_id, substr(NEW.created_at, 1, 10), COALESCE((
+        SELECT streak FROM activity_daily
+        WHERE user_id = NEW.user_id AND day = date(substr(NEW.created_at, 1, 10), '-1 day')
+    ), 0) + 1);
+    UPDATE activity_daily SET
+        doubts = doubts + (NEW.kind = 'doubt'),
+        quizzes = quizzes + (NEW.kind = 'quiz'),
+        plans = plans + (NEW.kind = 'plan'),
+        audio = audio + (NEW.kind = 'audio'),
+        todos_done = todos_done + (NEW.kind = 'todo_done')
+    WHERE user_id = NEW.user_id AND day = substr(NEW.created_at, 1, 10);
+END;
+CREATE TRIGGER IF NOT EXISTS chat_messages_activity
+    AFTER INSERT ON chat_messages FOR EACH ROW WHEN NEW.role = 'user'
+BEGIN
+    INSERT INTO activity_events (user_id, kind, created_at) VALUES (NEW.user_id, 'doubt', NEW.created_at);
+END;
+CREATE TRIGGER IF NOT EXISTS library_items_activity
+    AFTER INSERT ON library_items FOR EACH ROW WHEN NEW.kind IN ('plan', 'audio')
+BEGIN
+    INSERT INTO activity_events (user_id, kind, created_at) VALUES (NEW.user_id, NEW.kind, NEW.created_at);
+END;
+"""
+# An item's searchable text: its content, or its blob unpacked by library_blob_text
+# (registered on every connection, see _connect).
+_SEARCH_TEXT = (
+    "CASE WHEN {row}.blob_hash IS NULL THEN {row}.content ELSE "
+    "(SELECT library_blob_text(b.codec, b.data) FROM content_blobs b "
+    "WHERE b.user_id = {row}.user_id AND b.hash = {row}.blob_hash) END"
+)
+for _placeholder, _row in (("{item_text}", "library_items"), ("{new_text}", "NEW"), ("{old_text}", "OLD")):
+    SCHEMA = SCHEMA.replace(_placeholder, _SEARCH_TEXT.format(row=_row))
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _blob_text(codec, data):
+    return blobs.unpack(codec, base64.b64encode(data).decode("ascii")) if data is not None else None
+
+
+def _connect(path, **kwargs):
+    conn = sqlite3.connect(path, isolation_level=None, **kwargs)
+    conn.create_function("library_blob_text", 2, _blob_text, deterministic=True)
+    return conn
+
+
+_OPERATORS = {"eq": "=", "neq": "!=", "lt": "<", "lte": "<=", "gt": ">", "gte": ">="}
+_LOGIC_TERM = re.compile(r'\s*(?:(and|or)\(|(\w+)\.(\w+)\.("(?:[^"\\]|\\.)*"|[^,()]*))')
+
+
+def _logic_tree(text: str, pos: int = 0, joiner: str = "OR"):
+    """SQL for PostgREST's ``or=(...)`` syntax: ``a.lt.1,and(a.eq.1,b.lt."x")``.
+
+    Returns (sql, args, end position); stops at an unmatched ``)``.
+    """
+    clauses, args = [], []
+    while pos < len(text):
+        m = _LOGIC_TERM.match(text, pos)
+        if not m:
+            raise ValueError(f"Bad logic filter: {text!r}")
+        if m.group(1):
+            sql, sub_args, pos = _logic_tree(text, m.end(), m.group(1).upper())
+            pos += 1  # the closing parenthesis
+        else:
+            column, op, value = m.group(2), m.group(3), m.group(4)
+            if value.startswith('"'):
+                value = re.sub(r"\\(.)", r"\1", value[1:-1])
+            sql, sub_args, pos = f"{column} {_OPERATORS[op]} ?", [value], m.end()
+        clauses.append(sql)
+        args.extend(sub_args)
+        if text.startswith(",", pos):
+            pos += 1
+        elif text.startswith(")", pos) or pos >= len(text):
+            break
+    return "(" + f" {joiner} ".join(clauses) + ")", args, pos
+
+
+class _Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Call:
+    def __init__(self, db, fn, params):
+        self.db = db
+        self.fn = fn
+        self.params = params
+
+    def execute(self):
+        self.db._round_trip()
+        return _Result(self.fn(**self.params))
+
+
+class _Query:
+    """One PostgREST-style request against a table; built fluently, run by execute()."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.count = None
+        self.payload = None
+        self.ignore_duplicates = False
+        self.on_conflict = "id"
+        self.filters = []
+        self.ordering = []
+        self.limit_ = None
+        self.offset = 0
+        self.single_ = False
+
+    # ---------------- Actions ----------------
+    def select(self, *columns, count=None):
+        self.columns = ",".join(columns) or "*"
+        self.count = count
+        return self
+
+    def insert(self, json, **_):
+        self.action, self.payload = "insert", json
+        return self
+
+    def upsert(self, json, *, on_conflict="id", ignore_duplicates=False, **_):
+        self.action, self.payload = "upsert", json
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json, **_):
+        self.action, self.payload = "update", json
+        return self
+
+    def delete(self, **_):
+        self.action = "delete"
+        return self
+
+    # ---------------- Filters and modifiers ----------------
+    def _filter(self, column, op, value):
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "=", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "!=", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "<", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "<=", value)
+
+    def gt(self, column, value):
+        return self._filter(column, ">", value)
+
+    def gte(self, column, value):
+        return self._filter(column, ">=", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "IN", list(values))
+
+    def or_(self, filters, **_):
+        sql, args, _ = _logic_tree(filters)
+        return self._filter(sql, "LOGIC", args)
+
+    def order(self, column, *, desc=False, **_):
+        self.ordering.append(f"{column} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size, **_):
+        self.limit_ = size
+        return self
+
+    def range(self, start, end, **_):
+        self.offset, self.limit_ = start, end - start + 1
+        return self
+
+    def single(self):
+        self.single_ = True
+        return self
+
+    # ---------------- Execution ----------------
+    def _where(self):
+        clauses, args = [], []
+        for column, op, value in self.filters:
+            if op == "IN":
+                clauses.append(f"{column} IN ({', '.join('?' * len(value)) or 'NULL'})")
+                args.extend(value)
+            elif op == "LOGIC":
+                clauses.append(column)
+                args.extend(value)
+            else:
+                clauses.append(f"{column} {op} ?")
+                args.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def execute(self):
+        self.db._round_trip()
+        return getattr(self, "_" + self.action)()
+
+    def _select(self):
+        where, args = self._where()
+        sql = f"SELECT {self.columns} FROM {self.table}{where}"
+        if self.ordering:
+            sql += " ORDER BY " + ", ".join(self.ordering)
+        if self.limit_ is not None or self.offset:
+            sql += f" LIMIT {self.limit_ if self.limit_ is not None else -1} OFFSET {self.offset}"
+        rows = self.db._rows(self.table, sql, args)
+        count = None
+        if self.count:
+            count = self.db._execute(f"SELECT COUNT(*) FROM {self.table}{where}", args).fetchone()[0]
+        if self.single_:
+            return _Result(rows[0] if rows else None, count)
+        return _Result(rows, count)
+
+    def _rows_payload(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        return [self.db._encode(self.table, dict(r), new=True) for r in rows]
+
+    def _insert(self, conflict=None):
+        rows = self._rows_payload()
+        if not rows:
+            return _Result([])
+        with self.db._transaction() as conn:
+            for row in rows:
+                cols = list(row)
+                sql = f"INSERT INTO {self.table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+                if conflict:
+                    sql += conflict(cols)
+                conn.execute(sql, [row[c] for c in cols])
+        return _Result([self.db._decode(self.table, r) for r in rows])
+
+    def _upsert(self):
+        if self.ignore_duplicates:
+            return self._insert(lambda cols: f" ON CONFLICT ({self.on_conflict}) DO NOTHING")
+        return self._insert(lambda cols: f" ON CONFLICT ({self.on_conflict}) DO UPDATE SET " + ", ".join(
+            f"{c} = excluded.{c}" for c in cols if c != self.on_conflict
+        ))
+
+    def _update(self):
+        row = self.db._encode(self.table, dict(self.payload))
+        where, args = self._where()
+        sets = ", ".join(f"{c} = ?" for c in row)
+        with self.db._transaction() as conn:
+            conn.execute(f"UPDATE {self.table} SET {sets}{where}", list(row.values()) + args)
+        return _Result([])
+
+    def _delete(self):
+        where, args = self._where()
+        with self.db._transaction() as conn:
+            conn.execute(f"DELETE FROM {self.table}{where}", args)
+        return _Result([])
+
+
+class LocalDB:
+    def __init__(self, path=":memory:", latency_ms=None):
+        self.path = path
+        if latency_ms is None:
+            latency_ms = float(os.environ.get("NEXSTUDY_DB_LATENCY_MS", "0"))
+        self.latency = latency_ms / 1000.0
+        self._local = threading.local()
+        # In-memory databases are per connection, so they share one behind a lock.
+        self._memory = _connect(path, check_same_thread=False) if path == ":memory:" else None
+        self._memory_lock = threading.RLock()
+        with self._memory_lock:
+            conn = self._conn()
+            self._upgrade(conn)
+            conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _upgrade(conn):
+        """Bring files written by earlier versions up to SCHEMA."""
+        columns = {r[1] for r in conn.execute("PRAGMA table_info(activity_events)")}
+        if columns and "event_id" not in columns:
+            conn.execute("ALTER TABLE activity_events ADD COLUMN event_id TEXT")
+        columns = {r[1] for r in conn.execute("PRAGMA table_info(library_items)")}
+        if not columns or "seq" in columns:
+            return
+        # Files created before content blobs existed.
+        for column in ("blob_hash", "excerpt"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE library_items ADD COLUMN {column} TEXT")
+        # The search index used to copy every item, or key on the implicit rowid,
+        # which VACUUM may renumber: rebuild the table around `seq` and re-index
+        # each item through the insert trigger (the activity trigger is left out
+        # so copied plans and notes are not counted again; SCHEMA restores it).
+        conn.executescript(
+            """
+            BEGIN;
+            DROP TABLE IF EXISTS library_search;
+            DROP VIEW IF EXISTS library_search_text;
+            DROP INDEX IF EXISTS library_items_user_created;
+            DROP INDEX IF EXISTS library_items_user_kind_created;
+            ALTER TABLE library_items RENAME TO library_items_old;
+            """
+            + SCHEMA
+            + """
+            DROP TRIGGER library_items_activity;
+            INSERT INTO library_items (id, user_id, kind, title, meta, content, blob_hash, excerpt, created_at)
+                SELECT id, user_id, kind, title, meta, content, blob_hash, excerpt, created_at
+                FROM library_items_old ORDER BY rowid;
+            DROP TABLE library_items_old;
+            COMMIT;
+            """
+        )
+
+    def _conn(self):
+        """One autocommit connection per thread (or the shared in-memory one)."""
+        if self._memory:
+            return self._memory
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        lock = self._memory_lock if self._memory else contextlib.nullcontext()
+        with lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _execute(self, sql, args=()):
+        lock = self._memory_lock if self._memory else contextlib.nullcontext()
+        with lock:
+            return self._conn().execute(sql, args)
+
+    def _rows(self, table, sql, args=()) -> list:
+        lock = self._memory_lock if self._memory else contextlib.nullcontext()
+        with lock:
+            cur = self._conn().execute(sql, args)
+            names = [d[0] for d in cur.description]
+            rows = cur.fetchall()
+        return [self._decode(table, dict(zip(names, r))) for r in rows]
+
+    def _encode(self, table, row, new=False):
+        if new:
+            if table in GENERATED_ID:
+                row.setdefault("id", str(uuid.uuid4()))
+            if table in TIMESTAMPED:
+                row.setdefault("created_at", _now())
+        for col in JSON_COLUMNS.get(table, ()):
+            if col in row:
+                row[col] = json.dumps(row[col])
+        return row
+
+    def _decode(self, table, row):
+        for col in JSON_COLUMNS.get(table, ()):
+            if isinstance(row.get(col), str):
+                row[col] = json.loads(row[col])
+        return row
+
+    # ---------------- Supabase-style entry points ----------------
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params):
+        return _Call(self, getattr(self, name), params)
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    # ---------------- Database functions ----------------
+    def add_library_item(self, p_id, p_user_id, p_kind, p_title, p_meta, p_content, p_counter=None, p_blob=None):
+        if p_counter is not None and p_counter not in COUNTERS:
+            raise ValueError(f"add_library_item: unsupported counter {p_counter}")
+        now = _now()
+        content, blob_hash, excerpt = p_content or "", None, None
+        if p_blob:
+            content, blob_hash, excerpt = "", p_blob["hash"], (p_content or "")[:EXCERPT_CHARS]
+        # Store the blob, insert (indexed by trigger) and bump in one transaction, like the Postgres function.
+        with self._transaction() as db:
+            if p_blob:
+                db.execute(
+                    """
+                    INSERT INTO content_blobs (user_id, hash, codec, size, data, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (user_id, hash) DO NOTHING
+                    """,
+                    (p_user_id, blob_hash, p_blob["codec"], p_blob["size"], base64.b64decode(p_blob["data"]), now),
+                )
+            cur = db.execute(
+                """
+                INSERT INTO library_items (id, user_id, kind, title, meta, content, blob_hash, excerpt, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO NOTHING
+                """,
+                (p_id, p_user_id, p_kind, p_title or "", json.dumps(p_meta or {}), content, blob_hash, excerpt, now),
+            )
+            if not cur.rowcount:
+                return
+            if p_counter:
+                db.execute(
+                    f"UPDATE profiles SET {p_counter} = COALESCE({p_counter}, 0) + 1 WHERE id = ?",
+                    (p_user_id,),
+                )
+
+    def search_library(self, p_user_id, p_query, p_kind=None, p_since=None, p_until=None, p_limit=20):
+        # Every word must match in the title or text; bm25 weights titles 4x.
+        words = re.findall(r"\w+", p_query or "")
+        if not words:
+            return []
+        match = "{title content}: " + " ".join(f'"{w}"' for w in words)
+        where, args = "library_search MATCH ? AND i.user_id = ?", [match, p_user_id]
+        for clause, value in (("i.kind = ?", p_kind), ("i.created_at >= ?", p_since), ("i.created_at < ?", p_until)):
+            if value is not None:
+                where += f" AND {clause}"
+                args.append(value)
+        top = self._execute(
+            f"""
+            SELECT s.rowid FROM library_search s JOIN library_items i ON i.seq = s.rowid
+            WHERE {where} ORDER BY bm25(library_search, 4.0, 1.0) LIMIT ?
+            """,
+            args + [min(int(p_limit), 100)],
+        ).fetchall()
+        if not top:
+            return []
+        # Snippets re-read the document, so build them for the returned page only.
+        rowids = [r[0] for r in top]
+        return self._rows("library_items", f"""
+            SELECT i.id, i.kind, i.title, i.meta, i.created_at,
+                   -bm25(library_search, 4.0, 1.0) AS rank,
+                   snippet(library_search, 1, '**', '**', '…', 16) AS snippet
+            FROM library_search s JOIN library_items i ON i.seq = s.rowid
+            WHERE library_search MATCH ? AND s.rowid IN ({', '.join('?' * len(rowids))})
+            ORDER BY bm25(library_search, 4.0, 1.0)
+        """, [match] + rowids)
+
+    def library_contents(self, p_user_id, p_ids):
+        # Blob data travels base64-encoded, as encode(data, 'base64') returns it in Postgres.
+        rows = self._execute(f"""
+            SELECT i.id, CASE WHEN b.hash IS NULL THEN i.content END, b.codec, b.data
+            FROM library_items i
+            LEFT JOIN content_blobs b ON b.user_id = i.user_id AND b.hash = i.blob_hash
+            WHERE i.user_id = ? AND i.id IN ({', '.join('?' * len(p_ids)) or 'NULL'})
+        """, [p_user_id] + list(p_ids)).fetchall()
+        return [
+            {"id": id_, "content": content, "codec": codec,
+             "data": base64.b64encode(data).decode("ascii") if data is not None else None}
+            for id_, content, codec, data in rows
+        ]
+
+    def library_storage_stats(self, p_user_id=None):
+        where, args = ("WHERE user_id = ?", [p_user_id]) if p_user_id else ("", [])
+        items, blob_items, inline, referenced = self._execute(f"""
+            SELECT COUNT(*), COUNT(blob_hash),
+                   COALESCE(SUM(CASE WHEN blob_hash IS NULL THEN LENGTH(CAST(content AS BLOB)) END), 0),
+                   COALESCE((SELECT SUM(b.size) FROM library_items i JOIN content_blobs b
+                             ON b.user_id = i.user_id AND b.hash = i.blob_hash
+                             {where.replace('user_id', 'i.user_id')}), 0)
+            FROM library_items {where}
+        """, args + args).fetchone()
+        blobs, distinct, stored = self._execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM content_blobs {where}",
+            args,
+        ).fetchone()
+        return [{
+            "items": items, "blob_items": blob_items, "blobs": blobs, "inline_bytes": inline,
+            "referenced_bytes": referenced, "distinct_bytes": distinct, "stored_bytes": stored,
+        }]
+
+    def dashboard_stats(self, p_user_id):
+        rows = self._execute("""
+            SELECT COALESCE(p.doubts_solved, 0), COALESCE(p.plans_created, 0), COALESCE(p.audio_generated, 0),
+                   (SELECT COUNT(*) FROM library_items i WHERE i.user_id = p.id AND i.kind = 'paper'),
+                   p.todos
+            FROM profiles p WHERE p.id = ?
+        """, (p_user_id,)).fetchall()
+        if not rows:
+            return []
+        doubts, plans, audio, papers, todos = rows[0]
+        todos = json.loads(todos or "[]")
+        pending = [t.get("task") for t in todos if not t.get("done")]
+        today = datetime.date.fromisoformat(_now()[:10])
+        days = self._rows("activity_daily", """
+            SELECT day, doubts, quizzes, plans, audio, todos_done, streak FROM activity_daily
+            WHERE user_id = ? AND day > ? ORDER BY day
+        """, (p_user_id, (today - datetime.timedelta(days=7)).isoformat()))
+        # Active today: today's streak; otherwise the streak is still alive if yesterday was active.
+        yesterday = (today - datetime.timedelta(days=1)).isoformat()
+        recent = [d["streak"] for d in days if d["day"] >= yesterday]
+        return [{
+            "doubts_solved": doubts, "plans_created": plans, "audio_generated": audio,
+            "pending_todos": len(pending), "completed_todos": len(todos) - len(pending), "papers_saved": papers,
+            "next_todos": pending[:3],
+            "activity": [{k: v for k, v in d.items() if k != "streak"} for d in days],
+            "streak": recent[-1] if recent else 0,
+        }]
+
+    # ---------------- Helpers for tests and benchmarks ----------------
+    def create_profile(self, user_id, username="student"):
+        self._execute("INSERT OR IGNORE INTO profiles (id, username) VALUES (?, ?)", (user_id, username))
+
+    def profile(self, user_id) -> dict:
+        return self.table("profiles").select("*").eq("id", user_id).single().execute().data
+
+    def items(self, user_id, kind=None) -> list:
+        query = self.table("library_items").select("id, kind, title, meta, content, blob_hash, created_at")
+        query = query.eq("user_id", user_id)
+        if kind:
+            query = query.eq("kind", kind)
+        return query.order("created_at", desc=True).execute().data
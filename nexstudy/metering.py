@@ -0,0 +1,129 @@
+"""Token and cost metering for model calls.
+
+Every call records prompt, output and cached token counts (from Gemini's
+``usage_metadata``) into a local SQLite store, aggregated per day, user,
+feature and model. ``usage_summary`` feeds dashboards and
+``quota_exceeded`` enforces the optional ``DAILY_TOKEN_QUOTA`` secret.
+"""
+import datetime
+import os
+import sqlite3
+import threading
+
+from nexstudy.config import data_dir, secret
+
+# USD per 1M tokens: (input, output, cached input)
+PRICING = {
+    "gemini-2.5-flash-lite": (0.10, 0.40, 0.025),
+    "gemini-2.5-flash": (0.30, 2.50, 0.075),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_daily (
+    day TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    cached_tokens INTEGER NOT NULL DEFAULT 0,
+    cost_usd REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, user_id, feature, model)
+);
+CREATE INDEX IF NOT EXISTS usage_daily_user ON usage_daily (user_id, day);
+"""
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        path = os.environ.get("NEXSTUDY_METERING_DB") or os.path.join(data_dir(), "metering.db")
+        _conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(SCHEMA)
+    return _conn
+
+
+def usage_from_response(resp) -> dict:
+    """Token counts from a Gemini response's usage_metadata."""
+    meta = getattr(resp, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(meta, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(meta, "candidates_token_count", 0) or 0,
+        "cached_tokens": getattr(meta, "cached_content_token_count", 0) or 0,
+    }
+
+
+def estimate_cost(model: str, usage: dict) -> float:
+    price_in, price_out, price_cached = PRICING.get(model, (0.0, 0.0, 0.0))
+    uncached = max(0, usage["prompt_tokens"] - usage["cached_tokens"])
+    return (uncached * price_in + usage["output_tokens"] * price_out
+            + usage["cached_tokens"] * price_cached) / 1_000_000
+
+
+def record_usage(user_id: str, feature: str, model: str, usage: dict):
+    day = datetime.date.today().isoformat()
+    cost = estimate_cost(model, usage)
+    with _lock:
+        db = _db()
+        db.execute(
+            """
+            INSERT INTO usage_daily (day, user_id, feature, model, calls,
+                                     prompt_tokens, output_tokens, cached_tokens, cost_usd)
+            VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+            ON CONFLICT (day, user_id, feature, model) DO UPDATE SET
+                calls = calls + 1,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                output_tokens = output_tokens + excluded.output_tokens,
+                cached_tokens = cached_tokens + excluded.cached_tokens,
+                cost_usd = cost_usd + excluded.cost_usd
+            """,
+            (day, user_id, feature, model, usage["prompt_tokens"],
+             usage["output_tokens"], usage["cached_tokens"], cost),
+        )
+        db.commit()
+
+
+def usage_summary(group_by=("feature",), since=None, user_id=None) -> list:
+    """Totals grouped by any of day/user_id/feature/model, largest first."""
+    columns = [c for c in group_by if c in ("day", "user_id", "feature", "model")]
+    select = ", ".join(columns + [
+        "SUM(calls) AS calls", "SUM(prompt_tokens) AS prompt_tokens",
+        "SUM(output_tokens) AS output_tokens", "SUM(cached_tokens) AS cached_tokens",
+        "SUM(cost_usd) AS cost_usd",
+    ])
+    where, args = [], []
+    if since:
+        where.append("day >= ?")
+        args.append(str(since))
+    if user_id:
+        where.append("user_id = ?")
+        args.append(user_id)
+    sql = f"SELECT {select} FROM usage_daily"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if columns:
+        sql += " GROUP BY " + ", ".join(columns)
+    sql += " ORDER BY SUM(prompt_tokens + output_tokens) DESC"
+    with _lock:
+        cur = _db().execute(sql, args)
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def tokens_used_today(user_id: str) -> int:
+    with _lock:
+        row = _db().execute(
+            "SELECT COALESCE(SUM(prompt_tokens + output_tokens), 0) FROM usage_daily WHERE user_id = ? AND day = ?",
+            (user_id, datetime.date.today().isoformat()),
+        ).fetchone()
+    return row[0]
+
+
+def quota_exceeded(user_id: str) -> bool:
+    quota = secret("DAILY_TOKEN_QUOTA")
+    return bool(quota) and tokens_used_today(user_id) >= int(quota)
@@ -0,0 +1,115 @@
+"""Operator access and live process statistics for the Operator Metrics page.
+
+A session is an operator when its signed-in email is listed in the
+``OPERATOR_EMAILS`` secret (a list, or a comma-separated string), or when
+it opened any page with ``?operator_token=<OPERATOR_TOKEN>``. The token is
+remembered for the rest of the session. With neither secret set, nobody is
+an operator:
+
+    if not operators.is_operator():
+        st.stop()
+
+``process_stats`` and ``active_sessions`` read what this process already
+holds (RSS, threads, Streamlit's session manager) and do no I/O.
+``session_memory`` sizes one session's state by walking it, which is why
+the page only calls it on request.
+"""
+import hmac
+import os
+import resource
+import threading
+import time
+
+from nexstudy.config import secret
+
+SESSION_KEY = "_operator"
+TOKEN_PARAM = "operator_token"
+
+_started = time.time()
+
+
+# ---------------- Access ----------------
+def _operator_emails() -> set:
+    emails = secret("OPERATOR_EMAILS") or ()
+    if isinstance(emails, str):
+        emails = emails.split(",")
+    return {str(e).strip().lower() for e in emails if str(e).strip()}
+
+
+def is_operator() -> bool:
+    """Whether this page run's session may see operator pages and tools."""
+    import streamlit as st
+
+    if st.session_state.get(SESSION_KEY):
+        return True
+    token = secret("OPERATOR_TOKEN")
+    given = st.query_params.get(TOKEN_PARAM)
+    allowed = bool(token and given and hmac.compare_digest(str(given), str(token)))
+    if not allowed:
+        user = st.session_state.get("user") or {}
+        allowed = (user.get("email") or "").lower() in _operator_emails()
+    if allowed:
+        st.session_state[SESSION_KEY] = True
+    return allowed
+
+
+# ---------------- Process ----------------
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, not current
+
+
+def process_stats() -> dict:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "pid": os.getpid(),
+        "uptime_s": time.time() - _started,
+        "rss_bytes": _rss_bytes(),
+        "threads": threading.active_count(),
+        "cpu_s": usage.ru_utime + usage.ru_stime,
+    }
+
+
+# ---------------- Sessions ----------------
+def _session_manager():
+    from streamlit.runtime import Runtime
+
+    if not Runtime.exists():
+        return None
+    return getattr(Runtime.instance(), "_session_mgr", None)
+
+
+def active_sessions() -> list:
+    """One dict per browser session connected to this process."""
+    mgr = _session_manager()
+    if mgr is None:
+        return []
+    sessions = []
+    for info in mgr.list_active_sessions():
+        state = info.session.session_state
+        try:
+            user = state["user"] if "user" in state else None
+        except Exception:
+            user = None
+        sessions.append({
+            "session_id": info.session.id,
+            "user": (user or {}).get("email") or (user or {}).get("id") or "guest",
+            "script_runs": info.script_run_count,
+            "keys": len(state),
+        })
+    return sessions
+
+
+def session_memory(session_id: str) -> int:
+    """Deep size in bytes of one session's state (Streamlit's own estimate); 0 if gone."""
+    mgr = _session_manager()
+    info = mgr.get_active_session_info(session_id) if mgr else None
+    if info is None:
+        return 0
+    return sum(stat.byte_length for stat in info.session.session_state.get_stats())
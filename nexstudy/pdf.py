@@ -0,0 +1,18 @@
+"""Text extraction for uploaded PDFs, shared by every page that takes one.
+
+    text = pdf.extract_text(uploaded_file)   # pages separated by blank lines
+
+Raises whatever pdfplumber raises for an unreadable file; pages turn that
+into an error message. pdfplumber itself is imported on first use.
+"""
+from nexstudy import lazy, tracing
+
+pdfplumber = lazy.module("pdfplumber")
+
+
+def extract_text(file) -> str:
+    """Text of every page that has any, separated by blank lines."""
+    with tracing.span("pdf.extract") as sp, pdfplumber.open(file) as pdf:
+        sp.tag(pages=len(pdf.pages))
+        pages = (page.extract_text() for page in pdf.pages)
+        return "\n\n".join(text for text in pages if text).strip()
@@ -0,0 +1,209 @@
+"""On-demand sampling profiler for whole page runs.
+
+Every page calls ``profiling.profile_run()`` right after its imports. When
+profiling is on for the run, a background thread samples the script
+thread's stack every PROFILE_INTERVAL_MS until the page script returns
+(or stops, or reruns). It then writes the samples in folded-stack format,
+one ``frame;frame;frame count`` line per distinct stack, which
+``flamegraph.pl``, speedscope and inferno read directly:
+
+    profiles/20261019T101502-1_AI_Tutor-1840ms-3f9a2c1d.folded
+
+Profiling is on for:
+
+- one session, after an operator opens any page with ``?profile=1``,
+  until ``?profile=0``;
+- the whole process with ``NEXSTUDY_PROFILE=1``, or a fraction such as
+  ``0.05`` for one run in twenty.
+
+``NEXSTUDY_PROFILE_MIN_MS`` keeps only runs slower than that. The
+directory (``NEXSTUDY_PROFILE_DIR``, default ``profiles/`` in the data
+directory) keeps the newest PROFILE_MAX_FILES files within
+PROFILE_MAX_BYTES; older ones are deleted as new ones arrive. When
+profiling is off, ``profile_run`` costs two lookups.
+"""
+import collections
+import datetime
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from nexstudy import operators
+from nexstudy.config import data_dir
+
+log = logging.getLogger(__name__)
+
+PROFILE_INTERVAL_MS = 5
+PROFILE_MAX_FILES = 200
+PROFILE_MAX_BYTES = 50 * 2**20
+SESSION_KEY = "_profile_runs"
+QUERY_PARAM = "profile"
+
+_process_rate = None
+_dir_lock = threading.Lock()
+
+
+# ---------------- Config ----------------
+def process_rate() -> float:
+    """Fraction of runs profiled process-wide (NEXSTUDY_PROFILE)."""
+    global _process_rate
+    if _process_rate is None:
+        try:
+            _process_rate = min(1.0, max(0.0, float(os.environ.get("NEXSTUDY_PROFILE") or 0)))
+        except ValueError:
+            _process_rate = 0.0
+    return _process_rate
+
+
+def profile_dir() -> str:
+    path = os.environ.get("NEXSTUDY_PROFILE_DIR") or os.path.join(data_dir(), "profiles")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _min_ms() -> float:
+    try:
+        return float(os.environ.get("NEXSTUDY_PROFILE_MIN_MS") or 0)
+    except ValueError:
+        return 0.0
+
+
+def _session_wants_profile(st) -> bool:
+    """Applies ``?profile=1|0`` for operators; the choice sticks to the session."""
+    requested = st.query_params.get(QUERY_PARAM)
+    if requested is not None and operators.is_operator():
+        st.session_state[SESSION_KEY] = requested not in ("0", "false", "off", "")
+    return bool(st.session_state.get(SESSION_KEY))
+
+
+# ---------------- Sampling ----------------
+def _label(code) -> str:
+    path = code.co_filename
+    for root in sys.path:
+        if root and path.startswith(root + os.sep):
+            path = path[len(root) + 1:]
+            break
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+
+
+class _Sampler(threading.Thread):
+    """Samples one thread's stack until `root` (the page's module frame) leaves it."""
+
+    def __init__(self, thread_id, root, page, session_id):
+        super().__init__(name="profiler", daemon=True)
+        self.thread_id = thread_id
+        self.root = root
+        self.page = page
+        self.session_id = session_id
+
+    def run(self):
+        counts = collections.Counter()
+        labels = {}
+        interval = PROFILE_INTERVAL_MS / 1000
+        started = time.perf_counter()
+        try:
+            while True:
+                time.sleep(interval)
+                frame = sys._current_frames().get(self.thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _label(code)
+                    stack.append(label)
+                    if frame is self.root:
+                        break  # Streamlit's runner frames below the page are the same every run
+                    frame = frame.f_back
+                if frame is None:
+                    break  # the page script has returned
+                counts[";".join(reversed(stack))] += 1
+        finally:
+            self.root = None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if counts and elapsed_ms >= _min_ms():
+            try:
+                _write(self.page, self.session_id, elapsed_ms, counts)
+            except OSError as e:
+                log.warning("Could not write profile for %s: %s", self.page, e)
+
+
+def _write(page: str, session_id: str, elapsed_ms: float, counts: collections.Counter) -> str:
+    stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    session = re.sub(r"[^A-Za-z0-9]", "", session_id)[:8]
+    name = f"{stamp}-{page}-{elapsed_ms:.0f}ms-{session}.folded"
+    with _dir_lock:
+        directory = profile_dir()
+        path = os.path.join(directory, name)
+        with open(path + ".part", "w") as f:
+            for stack, n in counts.most_common():
+                f.write(f"{stack} {n}\n")
+        os.replace(path + ".part", path)
+        _rotate(directory)
+    return path
+
+
+def _rotate(directory: str):
+    """Delete the oldest profiles beyond PROFILE_MAX_FILES or PROFILE_MAX_BYTES."""
+    files = []
+    for name in os.listdir(directory):
+        if name.endswith(".folded"):
+            try:
+                info = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            files.append((info.st_mtime, name, info.st_size))
+    files.sort(reverse=True)
+    kept_bytes = 0
+    for n, (_, name, size) in enumerate(files):
+        kept_bytes += size
+        if n >= PROFILE_MAX_FILES or kept_bytes > PROFILE_MAX_BYTES:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+# ---------------- Public API ----------------
+def profile_run():
+    """Profile the rest of the calling page's run when profiling is on for it."""
+    import streamlit as st
+
+    rate = _process_rate if _process_rate is not None else process_rate()
+    sampled = rate >= 1.0 or (rate > 0 and random.random() < rate)
+    try:
+        if not sampled and not _session_wants_profile(st):
+            return
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return
+    if ctx is None:
+        return  # bare mode: no page run to wrap
+    root = sys._getframe(1)
+    page = os.path.splitext(os.path.basename(root.f_code.co_filename))[0]
+    _Sampler(threading.get_ident(), root, page, ctx.session_id).start()
+
+
+def recent_profiles(limit: int = 20) -> list:
+    """Newest profiles first: name, size and modification time."""
+    directory = profile_dir()
+    files = []
+    for name in os.listdir(directory):
+        if name.endswith(".folded"):
+            try:
+                info = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            files.append({"name": name, "bytes": info.st_size, "modified": info.st_mtime})
+    files.sort(key=lambda f: -f["modified"])
+    return files[:limit]
+
+
+def profile_path(name: str) -> str:
+    return os.path.join(profile_dir(), os.path.basename(name))
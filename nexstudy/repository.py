@@ -0,0 +1,285 @@
+"""Typed storage API used by every page.
+
+Pages talk to a ``Repository`` instead of building Supabase queries:
+
+    repo = repository.get_repository()
+    profile = repo.get_profile(user["id"])              # id, username only
+    todos = repo.get_todos(user["id"])
+
+Each method selects only the columns it needs (see ``PROFILE_VIEWS``).
+The backend is Supabase in production, through a client carrying the
+signed-in user's token (see ``nexstudy.clients``), or the SQLite stand-in
+(``nexstudy.localdb.LocalDB``) when ``NEXSTUDY_DB`` points at a file, so
+pages can be run, tested and benchmarked without a live project.
+
+Writes that change a dashboard number invalidate the user's cached
+``dashboard_stats`` once they have gone through.
+
+Every request is counted in ``transfer_stats()`` (calls, rows and JSON
+bytes per table) to measure what a page run actually pulls, and traced as
+a ``db.<table>`` span (see ``nexstudy.tracing``).
+"""
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import List, Optional, TypedDict
+
+from nexstudy import activity, chat_store, clients, dashboard_stats, library, tracing
+from nexstudy.config import secret
+
+log = logging.getLogger(__name__)
+
+
+class Profile(TypedDict, total=False):
+    id: str
+    username: str
+    doubts_solved: int
+    plans_created: int
+    audio_generated: int
+    todos: list
+
+
+class Message(TypedDict):
+    id: str
+    role: str
+    text: str
+    created_at: str
+
+
+class LibraryItem(TypedDict):
+    id: str
+    kind: str
+    title: str
+    meta: dict
+    content: str
+    created_at: str
+
+
+# Named column projections for profile reads.
+PROFILE_VIEWS = {
+    "header": "id, username",
+    "counters": "doubts_solved, plans_created, audio_generated",
+    "todos": "todos",
+    # Everything a session reads from profiles, loaded once at login.
+    "session": "id, username, doubts_solved, plans_created, audio_generated, todos",
+}
+COUNTER_COLUMNS = ("doubts_solved", "plans_created", "audio_generated")
+
+
+# ---------------- Transfer accounting ----------------
+class TransferStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_table = defaultdict(lambda: {"calls": 0, "rows": 0, "bytes": 0})
+
+    def record(self, table, data):
+        rows = len(data) if isinstance(data, list) else int(data is not None)
+        size = len(json.dumps(data, default=str)) if data is not None else 0
+        with self._lock:
+            entry = self._by_table[table]
+            entry["calls"] += 1
+            entry["rows"] += rows
+            entry["bytes"] += size
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {table: dict(entry) for table, entry in self._by_table.items()}
+
+    def reset(self):
+        with self._lock:
+            self._by_table.clear()
+
+
+_stats = TransferStats()
+
+
+def transfer_stats() -> dict:
+    return _stats.snapshot()
+
+
+class _Tracked:
+    """Wraps a query builder so execute() is recorded against its table and traced."""
+
+    def __init__(self, target, table, op=None):
+        self._target = target
+        self._table = table
+        self._op = op  # first builder method: select, insert, update, upsert, delete
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == "execute":
+            def execute():
+                with tracing.span(f"db.{self._table}", op=self._op):
+                    res = attr()
+                _stats.record(self._table, getattr(res, "data", None))
+                return res
+            return execute
+        if callable(attr):
+            return lambda *args, **kwargs: _Tracked(attr(*args, **kwargs), self._table, self._op or name)
+        return attr
+
+
+class _TrackedClient:
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return _Tracked(self._client.table(name), name)
+
+    def rpc(self, name, params):
+        return _Tracked(self._client.rpc(name, params), f"rpc:{name}", "rpc")
+
+
+# ---------------- Repository ----------------
+class Repository:
+    def __init__(self, client, backend: str):
+        self.client = client
+        self.backend = backend
+        self._db = _TrackedClient(client)
+
+    # Profiles
+    def get_profile(self, user_id: str, view: str = "header") -> Optional[Profile]:
+        return self.get_columns(user_id, PROFILE_VIEWS[view].split(", "))
+
+    def get_columns(self, user_id: str, columns) -> Optional[Profile]:
+        res = self._db.table("profiles").select(", ".join(columns)).eq("id", user_id).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    def create_profile(self, user_id: str, username: str):
+        """Idempotent: an existing profile is left as it is."""
+        self._db.table("profiles").upsert({"id": user_id, "username": username}, ignore_duplicates=True).execute()
+
+    def get_counters(self, user_id: str) -> Profile:
+        return self.get_profile(user_id, "counters") or {}
+
+    def get_todos(self, user_id: str) -> list:
+        profile = self.get_profile(user_id, "todos")
+        return (profile or {}).get("todos") or []
+
+    def save_todos(self, user_id: str, todos: list):
+        self._db.table("profiles").update({"todos": todos}).eq("id", user_id).execute()
+        dashboard_stats.invalidate(user_id)
+
+    def dashboard_stats(self, user_id: str) -> dict:
+        """Counters, todo totals, next pending tasks, last week's activity and the streak
+        in one aggregate call (see nexstudy.dashboard_stats)."""
+        res = self._db.rpc("dashboard_stats", {"p_user_id": user_id}).execute()
+        rows = res.data or []
+        return (rows[0] if rows else {}) if isinstance(rows, list) else rows
+
+    # Activity
+    def record_activity(self, user_id: str, kind: str, event_id: str):
+        activity.record(self._db, user_id, kind, event_id)
+        dashboard_stats.invalidate(user_id)
+
+    # Tutor chat
+    def recent_messages(self, user_id: str) -> List[Message]:
+        return chat_store.load_recent(self._db, user_id)
+
+    def messages_before(self, user_id: str, before: Message) -> List[Message]:
+        return chat_store.load_before(self._db, user_id, before)
+
+    def append_messages(self, user_id: str, messages: List[Message]):
+        chat_store.append_messages(self._db, user_id, messages)
+        dashboard_stats.invalidate(user_id)
+
+    def clear_messages(self, user_id: str):
+        chat_store.clear_messages(self._db, user_id)
+
+    def compact_history(self, user_id: str, summarize, submit=None) -> int:
+        return chat_store.compact_history(self._db, user_id, summarize, submit)
+
+    # Library
+    def list_items(self, user_id: str, kind: str, limit=None, offset: int = 0) -> List[LibraryItem]:
+        return library.list_items(self._db, user_id, kind, limit=limit, offset=offset)
+
+    def list_page(self, user_id: str, kind: str, page: int, page_size: int = library.PAGE_SIZE):
+        """Metadata-only rows (no content) for one page, plus a has-more flag."""
+        return library.list_page(self._db, user_id, kind, page, page_size)
+
+    def get_content(self, user_id: str, item_id: str) -> str:
+        return library.get_content(self._db, user_id, item_id)
+
+    def search(self, user_id: str, query: str, kind=None, since=None, until=None, limit: int = 20) -> list:
+        return library.search(self._db, user_id, query, kind=kind, since=since, until=until, limit=limit)
+
+    def add_item(self, user_id: str, item: dict, counter=None):
+        library.add_item(self._db, user_id, item, counter=counter)
+        dashboard_stats.invalidate(user_id)
+
+    def storage_stats(self, user_id: Optional[str] = None) -> dict:
+        return library.storage_stats(self._db, user_id)
+
+
+# ---------------- Backend selection ----------------
+SESSION_TOKENS = "auth_tokens"  # session-state key for the signed-in user's tokens
+
+_repo = None
+_repo_lock = threading.Lock()
+
+
+def _create_repository() -> Optional[Repository]:
+    path = secret("NEXSTUDY_DB")
+    if path:
+        from nexstudy.localdb import LocalDB
+        return Repository(LocalDB(path), "sqlite")
+    if not clients.is_configured():
+        return None
+    return Repository(clients.user_client(), "supabase")
+
+
+def _shared_repository() -> Optional[Repository]:
+    global _repo
+    with _repo_lock:
+        if _repo is None:
+            try:
+                _repo = _create_repository()
+            except Exception:
+                _repo = None
+        return _repo
+
+
+def get_repository() -> Optional[Repository]:
+    """The repository for this page run, or None when no backend is configured.
+
+    A session signed in to Supabase gets its own client carrying the user's
+    access token (kept in session state and refreshed before it expires);
+    guests and the SQLite backend share the process-wide repository. When
+    the token cannot be refreshed the session is signed out and asked to
+    sign in again, rather than carrying on as anon with writes RLS rejects.
+    """
+    shared = _shared_repository()
+    if shared is None or shared.backend != "supabase":
+        return shared
+    import streamlit as st
+
+    tokens = st.session_state.get(SESSION_TOKENS)
+    if not tokens:
+        return shared
+    try:
+        fresh = clients.fresh_tokens(tokens)
+    except Exception as e:
+        log.warning("Could not refresh the session's token, signing it out: %s", e)
+        end_session()
+        st.warning("Your session has expired. Please log in again from the Home page.")
+        return shared
+    if fresh is not tokens:
+        st.session_state[SESSION_TOKENS] = fresh
+    token, repo = st.session_state.get("_user_repository") or (None, None)
+    if token != fresh["access_token"]:
+        repo = Repository(clients.user_client(fresh["access_token"]), "supabase")
+        st.session_state["_user_repository"] = (fresh["access_token"], repo)
+    return repo
+
+
+def end_session():
+    """Forget this browser session's sign-in: tokens, user, profile and snapshot."""
+    import streamlit as st
+    from nexstudy import snapshot
+
+    for key in (SESSION_TOKENS, "_user_repository"):
+        st.session_state.pop(key, None)
+    st.session_state.user = None
+    st.session_state.profile = None
+    snapshot.clear()
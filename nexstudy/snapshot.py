@@ -0,0 +1,101 @@
+"""Per-session snapshot of the signed-in user's stored data.
+
+``main_app.load_profile`` loads the profile columns once per login and
+seeds the snapshot; pages read through it instead of querying storage on
+every rerun:
+
+    snap = snapshot.get_snapshot(user)
+    todos = snap.get("todos", lambda: repo.get_todos(user["id"]))
+
+Entries are keyed by column: profile columns by name (``username``,
+``todos``, ``doubts_solved`` ...), library listing pages as
+``library:<kind>:<page>`` and opened item contents as ``item:<id>``.
+A page that writes a column either updates its entry in place (it holds
+the new value) or invalidates it, e.g. counters the database bumps; the
+next read then loads it again.
+"""
+import threading
+
+SESSION_KEY = "_profile_snapshot"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def cache_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+class ProfileSnapshot:
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self._values = {}
+
+    def __contains__(self, column):
+        return column in self._values
+
+    def get(self, column, load):
+        """The cached value of `column`, calling `load()` only on a miss."""
+        if column in self._values:
+            _count("hits")
+            return self._values[column]
+        _count("misses")
+        value = load()
+        self._values[column] = value
+        return value
+
+    def columns(self, names, load) -> dict:
+        """Several profile columns at once; `load(missing)` fetches only the missing ones."""
+        missing = [n for n in names if n not in self._values]
+        _count("misses" if missing else "hits")
+        if missing:
+            row = load(missing) or {}
+            for name in missing:
+                self._values[name] = row.get(name)
+        return {n: self._values[n] for n in names}
+
+    def seed(self, row: dict):
+        """Store every column of a freshly loaded row."""
+        self._values.update(row)
+
+    def put(self, column, value):
+        self._values[column] = value
+
+    def update(self, column, fn):
+        """Apply `fn` to a cached value; a column not loaded yet is left to load fresh."""
+        if column in self._values:
+            self._values[column] = fn(self._values[column])
+
+    def invalidate(self, *columns):
+        for column in columns:
+            self._values.pop(column, None)
+
+    def invalidate_prefix(self, prefix: str):
+        """Drop every entry under `prefix`, e.g. all cached pages of one listing."""
+        for column in [c for c in self._values if c.startswith(prefix)]:
+            del self._values[column]
+
+
+def get_snapshot(user):
+    """This session's snapshot for `user` (None for guests); reset when the user changes."""
+    if not user:
+        return None
+    import streamlit as st
+
+    snap = st.session_state.get(SESSION_KEY)
+    if snap is None or snap.user_id != user["id"]:
+        snap = ProfileSnapshot(user["id"])
+        st.session_state[SESSION_KEY] = snap
+    return snap
+
+
+def clear():
+    import streamlit as st
+
+    st.session_state.pop(SESSION_KEY, None)
@@ -0,0 +1,443 @@
+"""Tracing spans for the hot paths: model calls, PDF extraction,
+text-to-speech and database round trips.
+
+    with tracing.span("pdf.extract"):
+        text = ...
+
+    with tracing.span("llm.generate", feature="tutor.chat", model=name) as sp:
+        out = backend.generate(...)
+        sp.tag(output_tokens=out["usage"]["output_tokens"])
+
+A span records its duration, the exception it ended with (if any) and its
+tags: page (the running script), feature and user (from session state)
+plus any keywords given. Spans opened inside a span are its children:
+they share its trace and inherit its page, feature and user.
+
+Sampling is decided once per trace. ``TRACE_SAMPLE_RATE`` (secret or
+environment, 0-1, default 0) is the fraction of top-level spans recorded
+with all their children. At 0, ``span`` returns a shared no-op object
+after one check.
+
+Finished spans go to:
+
+- ``recent_spans()``, an in-memory ring, and ``histograms()``, duration
+  buckets per (span, feature, page), for this process;
+- ``traces.db`` in the data directory, which keeps TRACE_RETENTION hours
+  (``query_spans``);
+- ``metrics.prom`` in the data directory, Prometheus text format for a
+  node-exporter textfile collector.
+
+The two files are written every EXPORT_INTERVAL by a background thread.
+User ids are stored with spans and kept out of Prometheus labels.
+"""
+import atexit
+import bisect
+import contextvars
+import json
+import logging
+import os
+import random
+import secrets
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from nexstudy.config import data_dir, secret
+
+log = logging.getLogger(__name__)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # seconds
+RECENT_SPANS = 2000  # finished spans kept in memory
+TRACE_RETENTION = 24  # hours of spans kept in traces.db
+EXPORT_INTERVAL = 10  # seconds between writes of traces.db and metrics.prom
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spans (
+    trace_id TEXT NOT NULL,
+    span_id TEXT NOT NULL,
+    parent_id TEXT,
+    name TEXT NOT NULL,
+    feature TEXT,
+    page TEXT,
+    user_id TEXT,
+    started_at REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    error TEXT,
+    tags TEXT
+);
+CREATE INDEX IF NOT EXISTS spans_started ON spans (started_at);
+CREATE INDEX IF NOT EXISTS spans_trace ON spans (trace_id);
+"""
+
+_rate = None
+_current = contextvars.ContextVar("nexstudy_span", default=None)
+
+
+# ---------------- Sampling ----------------
+def sample_rate() -> float:
+    global _rate
+    if _rate is None:
+        try:
+            _rate = min(1.0, max(0.0, float(secret("TRACE_SAMPLE_RATE", os.environ.get("NEXSTUDY_TRACE_SAMPLE", 0)))))
+        except (TypeError, ValueError):
+            _rate = 0.0
+    return _rate
+
+
+def set_sample_rate(rate: float):
+    """Change the sampling rate for this process (benchmarks, operators)."""
+    global _rate
+    _rate = min(1.0, max(0.0, float(rate)))
+
+
+# ---------------- Spans ----------------
+class _NoopSpan:
+    """Stands in for every span that is not recorded."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def tag(self, **tags):
+        pass
+
+
+class _DroppedTrace(_NoopSpan):
+    """Top of a trace that was not sampled; keeps its children from sampling themselves."""
+
+    __slots__ = ("_token",)
+
+    def __enter__(self):
+        self._token = _current.set(_DROPPED)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        return False
+
+
+_NOOP = _NoopSpan()
+_DROPPED = object()
+
+
+class Span:
+    __slots__ = ("name", "feature", "page", "user_id", "tags", "trace_id", "span_id", "parent_id",
+                 "started_at", "duration_ms", "error", "_t0", "_token")
+
+    def __init__(self, name, parent, feature, page, user_id, tags):
+        self.name = name
+        self.tags = tags
+        self.span_id = secrets.token_hex(8)
+        if parent is None:
+            self.trace_id = secrets.token_hex(16)
+            self.parent_id = None
+            if page is None or user_id is None:
+                session_page, session_user = _session_tags()
+                page = page if page is not None else session_page
+                user_id = user_id if user_id is not None else session_user
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            feature = feature if feature is not None else parent.feature
+            page = page if page is not None else parent.page
+            user_id = user_id if user_id is not None else parent.user_id
+        self.feature = feature
+        self.page = page
+        self.user_id = user_id
+        self.error = None
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self._t0) * 1000
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _store.add(self)
+        return False
+
+    def tag(self, **tags):
+        """Add tags once they are known (sizes, token counts); ``error=...`` marks a handled failure."""
+        if "error" in tags:
+            self.error = str(tags.pop("error"))
+        self.tags.update(tags)
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "feature": self.feature,
+            "page": self.page,
+            "user_id": self.user_id,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "error": self.error,
+            "tags": self.tags,
+        }
+
+
+def span(name: str, feature: str = None, page: str = None, user: str = None, **tags):
+    """Context manager timing one operation; a no-op unless its trace is sampled."""
+    rate = _rate if _rate is not None else sample_rate()
+    if not rate:
+        return _NOOP
+    parent = _current.get()
+    if parent is _DROPPED:
+        return _NOOP
+    if parent is None and rate < 1.0 and random.random() >= rate:
+        return _DroppedTrace()
+    return Span(name, parent, feature, page, user, tags)
+
+
+def bind(fn, name: str, feature: str = None, user: str = None, **tags):
+    """`fn` run in a span tagged with this page run's page and user.
+
+    For work handed to another thread (write-behind saves), which would
+    otherwise know neither. Returns `fn` itself when tracing is off.
+    """
+    if not sample_rate():
+        return fn
+    parent = _current.get()
+    if isinstance(parent, Span):
+        page, user_id = parent.page, parent.user_id
+        feature = feature if feature is not None else parent.feature
+    else:
+        page, user_id = _session_tags()
+    user_id = user or user_id
+
+    def traced():
+        with span(name, feature=feature, page=page, user=user_id, **tags):
+            return fn()
+
+    return traced
+
+
+def _session_tags() -> tuple:
+    """(page, user id) of the script run on this thread, or (None, None)."""
+    try:
+        import streamlit as st
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is None:
+            return None, None
+        info = ctx.pages_manager.get_pages().get(ctx.active_script_hash) or {}
+        page = os.path.splitext(os.path.basename(info.get("script_path") or ctx.main_script_path))[0]
+        user = st.session_state.get("user")
+        return page, (user or {}).get("id")
+    except Exception:
+        return None, None
+
+
+# ---------------- In-process store ----------------
+class _Store:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=RECENT_SPANS)
+        self._unexported = []
+        self._histograms = {}  # (name, feature, page) -> [per-bucket counts..., +Inf], count, sum, errors
+        self._exporter = None
+
+    def add(self, sp: Span):
+        key = (sp.name, sp.feature or "", sp.page or "")
+        with self._lock:
+            self._recent.append(sp)
+            self._unexported.append(sp)
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [[0] * (len(BUCKETS) + 1), 0, 0.0, 0]
+            entry[0][bisect.bisect_left(BUCKETS, sp.duration_ms / 1000)] += 1
+            entry[1] += 1
+            entry[2] += sp.duration_ms / 1000
+            entry[3] += sp.error is not None
+            if self._exporter is None:
+                self._exporter = threading.Thread(target=self._export_loop, name="tracing-export", daemon=True)
+                self._exporter.start()
+
+    def recent(self) -> list:
+        with self._lock:
+            return list(self._recent)
+
+    def histograms(self) -> list:
+        with self._lock:
+            items = [(key, list(e[0]), e[1], e[2], e[3]) for key, e in self._histograms.items()]
+        out = []
+        for (name, feature, page), counts, count, total, errors in items:
+            cumulative, running = [], 0
+            for le, n in zip(BUCKETS + (float("inf"),), counts):
+                running += n
+                cumulative.append((le, running))
+            out.append({"span": name, "feature": feature, "page": page, "buckets": cumulative,
+                        "count": count, "sum": total, "errors": errors})
+        return out
+
+    def take_unexported(self) -> list:
+        with self._lock:
+            spans, self._unexported = self._unexported, []
+        return spans
+
+    def _export_loop(self):
+        while True:
+            time.sleep(EXPORT_INTERVAL)
+            try:
+                export()
+            except Exception as e:
+                log.warning("Could not export spans: %s", e)
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+            self._unexported.clear()
+            self._histograms.clear()
+
+
+_store = _Store()
+
+
+def recent_spans(name: str = None, limit: int = None) -> list:
+    """Finished spans still in memory, oldest first, as dicts."""
+    spans = [sp for sp in _store.recent() if name is None or sp.name == name]
+    if limit is not None:
+        spans = spans[-limit:]
+    return [sp.as_dict() for sp in spans]
+
+
+def histograms() -> list:
+    """Cumulative duration buckets (seconds), count, sum and errors per (span, feature, page)."""
+    return _store.histograms()
+
+
+def bucket_quantile(buckets: list, q: float) -> float:
+    """Estimated q-quantile (seconds) of a histogram from ``histograms()``, interpolated within its bucket."""
+    total = buckets[-1][1]
+    if not total:
+        return 0.0
+    rank, lower, below = q * total, 0.0, 0
+    for le, n in buckets:
+        if n >= rank:
+            if le == float("inf"):
+                return lower  # beyond the last bound; report the bound
+            return lower + (le - lower) * (rank - below) / max(n - below, 1)
+        lower, below = le, n
+    return lower
+
+
+def reset():
+    """Forget spans and histograms held in memory (not the exported files)."""
+    _store.reset()
+
+
+# ---------------- Exporters ----------------
+_conn = None
+_db_lock = threading.Lock()
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        path = os.environ.get("NEXSTUDY_TRACE_DB") or os.path.join(data_dir(), "traces.db")
+        _conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(SCHEMA)
+    return _conn
+
+
+def metrics_path() -> str:
+    return os.environ.get("NEXSTUDY_METRICS_FILE") or os.path.join(data_dir(), "metrics.prom")
+
+
+def export():
+    """Write spans finished since the last export to traces.db and rewrite metrics.prom."""
+    spans = _store.take_unexported()
+    if spans:
+        rows = [
+            (sp.trace_id, sp.span_id, sp.parent_id, sp.name, sp.feature, sp.page, sp.user_id,
+             sp.started_at, sp.duration_ms, sp.error, json.dumps(sp.tags, default=str) if sp.tags else None)
+            for sp in spans
+        ]
+        with _db_lock:
+            db = _db()
+            db.executemany("INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            db.execute("DELETE FROM spans WHERE started_at < ?", (time.time() - TRACE_RETENTION * 3600,))
+            db.commit()
+    path = metrics_path()
+    part = f"{path}.{os.getpid()}.part"
+    with open(part, "w") as f:
+        f.write(prometheus_text())
+    os.replace(part, path)  # collectors never read a half-written file
+
+
+def query_spans(since: float = None, name: str = None, trace_id: str = None, limit: int = 500) -> list:
+    """Exported spans, newest first."""
+    where, args = [], []
+    if since is not None:
+        where.append("started_at >= ?")
+        args.append(since)
+    if name:
+        where.append("name = ?")
+        args.append(name)
+    if trace_id:
+        where.append("trace_id = ?")
+        args.append(trace_id)
+    sql = "SELECT * FROM spans"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY started_at DESC LIMIT ?"
+    with _db_lock:
+        cur = _db().execute(sql, args + [limit])
+        names = [d[0] for d in cur.description]
+        rows = [dict(zip(names, row)) for row in cur.fetchall()]
+    for row in rows:
+        row["tags"] = json.loads(row["tags"]) if row["tags"] else {}
+    return rows
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def prometheus_text() -> str:
+    """This process's span histograms and error counts in Prometheus text format."""
+    hists = histograms()
+    lines = [
+        "# HELP nexstudy_span_duration_seconds Duration of traced operations (sampled traces only).",
+        "# TYPE nexstudy_span_duration_seconds histogram",
+    ]
+    for h in hists:
+        labels = f'span="{_label(h["span"])}",feature="{_label(h["feature"])}",page="{_label(h["page"])}"'
+        for le, n in h["buckets"]:
+            bound = "+Inf" if le == float("inf") else f"{le:g}"
+            lines.append(f'nexstudy_span_duration_seconds_bucket{{{labels},le="{bound}"}} {n}')
+        lines.append(f"nexstudy_span_duration_seconds_sum{{{labels}}} {h['sum']:.6f}")
+        lines.append(f"nexstudy_span_duration_seconds_count{{{labels}}} {h['count']}")
+    lines += [
+        "# HELP nexstudy_span_errors_total Traced operations that ended in an error (sampled traces only).",
+        "# TYPE nexstudy_span_errors_total counter",
+    ]
+    for h in hists:
+        labels = f'span="{_label(h["span"])}",feature="{_label(h["feature"])}",page="{_label(h["page"])}"'
+        lines.append(f"nexstudy_span_errors_total{{{labels}}} {h['errors']}")
+    lines += [
+        "# HELP nexstudy_trace_sample_rate Fraction of traces recorded.",
+        "# TYPE nexstudy_trace_sample_rate gauge",
+        f"nexstudy_trace_sample_rate {sample_rate():g}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+@atexit.register
+def _export_at_exit():
+    if _store._exporter is not None:
+        try:
+            export()
+        except Exception:
+            pass
@@ -0,0 +1,199 @@
+"""Write-behind queue for Supabase writes.
+
+Pages update session state immediately and hand the network write to this
+queue instead of waiting on it:
+
+    writebehind.submit(user_id, lambda: client.table(...).update(...).execute(),
+                       key=("profiles", user_id, "todos"))
+
+Writes are queued per user and run in order by a small pool of background
+workers. A write submitted with a ``key`` replaces any still-pending write
+with the same key, so ten checkbox toggles inside the coalescing window
+become one update. Failed writes are retried with backoff; writes that
+still fail are kept and shown on the user's next page run by
+``watch_session``, which also flushes the user's queue when their browser
+session ends.
+"""
+import atexit
+import itertools
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict, defaultdict
+
+from nexstudy import tracing
+
+log = logging.getLogger(__name__)
+
+COALESCE_WINDOW = 0.5  # seconds a write waits for newer writes to the same key
+MAX_ATTEMPTS = 4
+BACKOFF = 0.5  # seconds, doubled after every failed attempt
+WORKERS = 4
+
+
+class _Job:
+    __slots__ = ("fn", "label", "ready_at", "attempts")
+
+    def __init__(self, fn, label, ready_at):
+        self.fn = fn
+        self.label = label
+        self.ready_at = ready_at
+        self.attempts = 0
+
+
+class WriteBehindQueue:
+    def __init__(self, window=COALESCE_WINDOW, workers=WORKERS):
+        self.window = window
+        self._cond = threading.Condition()
+        self._pending = defaultdict(OrderedDict)  # user_id -> key -> _Job
+        self._busy = set()  # users with a write in flight
+        self._failures = defaultdict(list)
+        self._seq = itertools.count()
+        self._workers = [
+            threading.Thread(target=self._run, name=f"writebehind-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._workers:
+            t.start()
+
+    # ---------------- Producer side ----------------
+    def submit(self, user_id, fn, key=None, label="save"):
+        """Queue `fn()` for `user_id`; a pending write with the same key is replaced."""
+        fn = tracing.bind(fn, "writebehind.save", user=user_id, label=label)
+        with self._cond:
+            queue = self._pending[user_id]
+            if key is not None and key in queue:
+                queue[key].fn = fn  # coalesce: keep position and deadline
+                queue[key].attempts = 0
+            else:
+                queue[key if key is not None else ("_", next(self._seq))] = _Job(
+                    fn, label, time.monotonic() + self.window
+                )
+            self._cond.notify()
+
+    def flush(self, user_id=None, timeout=10.0) -> bool:
+        """Make pending writes due now and wait for them; True if drained."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            users = [user_id] if user_id is not None else list(self._pending)
+            for u in users:
+                for job in self._pending.get(u, {}).values():
+                    job.ready_at = min(job.ready_at, time.monotonic())
+            self._cond.notify_all()
+            while any(self._pending.get(u) or u in self._busy for u in users):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def pending(self, user_id=None) -> int:
+        with self._cond:
+            if user_id is not None:
+                return len(self._pending.get(user_id, ()))
+            return sum(len(q) for q in self._pending.values())
+
+    def depths(self) -> dict:
+        """Pending writes per user, for users with any."""
+        with self._cond:
+            return {u: len(q) for u, q in self._pending.items() if q}
+
+    def pop_failures(self, user_id) -> list:
+        with self._cond:
+            return self._failures.pop(user_id, [])
+
+    # ---------------- Worker side ----------------
+    def _next_job(self):
+        """Oldest due head-of-queue job for a user with nothing in flight."""
+        now = time.monotonic()
+        wait = None
+        for user_id, queue in self._pending.items():
+            if not queue or user_id in self._busy:
+                continue
+            key, job = next(iter(queue.items()))
+            if job.ready_at <= now:
+                del queue[key]
+                if not queue:
+                    del self._pending[user_id]
+                self._busy.add(user_id)
+                return user_id, key, job, None
+            wait = job.ready_at - now if wait is None else min(wait, job.ready_at - now)
+        return None, None, None, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                user_id, key, job, wait = self._next_job()
+                while job is None:
+                    self._cond.wait(wait)
+                    user_id, key, job, wait = self._next_job()
+            try:
+                job.fn()
+                error = None
+            except Exception as e:
+                error = e
+            with self._cond:
+                self._busy.discard(user_id)
+                if error is not None:
+                    job.attempts += 1
+                    queue = self._pending[user_id]
+                    if job.attempts < MAX_ATTEMPTS and key not in queue:
+                        job.ready_at = time.monotonic() + BACKOFF * 2 ** (job.attempts - 1)
+                        queue[key] = job
+                        queue.move_to_end(key, last=False)  # keep per-user order
+                    elif key not in queue:
+                        log.warning("write-behind %s failed for %s: %s", job.label, user_id, error)
+                        self._failures[user_id].append(f"{job.label}: {error}")
+                    if not queue:
+                        del self._pending[user_id]
+                self._cond.notify_all()
+
+
+# ---------------- Process-wide queue ----------------
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> WriteBehindQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteBehindQueue()
+            atexit.register(_queue.flush, None, 10.0)
+        return _queue
+
+
+def submit(user_id, fn, key=None, label="save"):
+    get_queue().submit(user_id, fn, key=key, label=label)
+
+
+def wait_idle(user_id, timeout=5.0) -> bool:
+    """Read-your-writes: flush this user's pending writes before a read."""
+    queue = get_queue()
+    if not queue.pending(user_id):
+        return True
+    return queue.flush(user_id, timeout)
+
+
+class _SessionSentinel:
+    """Lives in session state; collected when Streamlit drops the session."""
+
+
+def watch_session(user):
+    """Per page run: flush on session end and show any failed background saves."""
+    if not user:
+        return
+    import streamlit as st
+
+    if "_writebehind_sentinel" not in st.session_state:
+        sentinel = _SessionSentinel()
+        st.session_state["_writebehind_sentinel"] = sentinel
+        queue = get_queue()
+        weakref.finalize(
+            sentinel,
+            lambda uid: threading.Thread(target=queue.flush, args=(uid,), daemon=True).start(),
+            user["id"],
+        )
+    for failure in get_queue().pop_failures(user["id"]):
+        st.warning(f"⚠️ A background save failed and was not stored: {failure}")
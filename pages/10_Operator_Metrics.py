@@ -0,0 +1,156 @@
+import streamlit as st
+import datetime
+import time
+from nexstudy import dashboard_stats, metering, operators, profiling, snapshot, tracing, writebehind
+
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
+
+# ---------------- Page Config ----------------
+st.set_page_config(page_title="Operator Metrics", page_icon="🛠️", layout="wide")
+st.title("🛠️ Operator Metrics")
+
+# Operators only: OPERATOR_EMAILS or ?operator_token=<OPERATOR_TOKEN>
+if not operators.is_operator():
+    st.error("This page is only available to operators.")
+    st.stop()
+
+st.caption("Live numbers from this server process only, read from memory. Nothing here queries the database.")
+st.button("🔄 Refresh")
+
+RATE_WINDOW = 300  # seconds of recent spans behind the per-minute rates
+
+
+def ratio(counts):
+    total = counts["hits"] + counts["misses"]
+    return f"{counts['hits'] / total:.0%}" if total else "–"
+
+
+# ---------------- Process ----------------
+proc = operators.process_stats()
+sessions = operators.active_sessions()
+queue = writebehind.get_queue()
+rate = tracing.sample_rate()
+
+c1, c2, c3, c4, c5, c6 = st.columns(6)
+c1.metric("Active sessions", len(sessions))
+c2.metric("RSS", f"{proc['rss_bytes'] / 2**20:.0f} MiB")
+c3.metric("Threads", proc["threads"])
+c4.metric("Pending writes", queue.pending())
+c5.metric("Trace sampling", f"{rate:.0%}")
+c6.metric("Uptime", str(datetime.timedelta(seconds=int(proc["uptime_s"]))))
+
+with st.expander("Tracing settings"):
+    new_rate = st.slider("Fraction of page runs traced (this process, until restart)", 0.0, 1.0, float(rate), 0.05)
+    if new_rate != rate:
+        tracing.set_sample_rate(new_rate)
+        st.rerun()
+    st.caption(f"Spans are exported every {tracing.EXPORT_INTERVAL} s to the data directory's `traces.db` "
+               f"and to `{tracing.metrics_path()}` (Prometheus text format).")
+
+# ---------------- Latency ----------------
+st.subheader("⏱️ Latency by operation")
+hists = sorted(tracing.histograms(), key=lambda h: -h["count"])
+if not hists:
+    st.info("No traced operations yet. Raise the sampling rate above, or set the TRACE_SAMPLE_RATE secret.")
+else:
+    rows = [{
+        "operation": h["span"],
+        "feature": h["feature"] or "–",
+        "page": h["page"] or "–",
+        "calls": h["count"],
+        "errors": h["errors"],
+        "error rate": f"{h['errors'] / h['count']:.1%}",
+        "mean ms": round(h["sum"] / h["count"] * 1000, 1),
+        "p50 ms": round(tracing.bucket_quantile(h["buckets"], 0.50) * 1000, 1),
+        "p95 ms": round(tracing.bucket_quantile(h["buckets"], 0.95) * 1000, 1),
+        "p99 ms": round(tracing.bucket_quantile(h["buckets"], 0.99) * 1000, 1),
+    } for h in hists]
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    if rate < 1:
+        st.caption(f"Counts are of sampled traces only ({rate:.0%} of page runs).")
+
+    labels = [f"{h['span']} · {h['feature'] or '–'} · {h['page'] or '–'}" for h in hists]
+    chosen = st.selectbox("Histogram", range(len(hists)), format_func=lambda i: labels[i])
+    buckets, below = [], 0
+    for le, n in hists[chosen]["buckets"]:
+        buckets.append({"up to": "slower" if le == float("inf") else f"{le * 1000:g} ms", "calls": n - below})
+        below = n
+    st.bar_chart(buckets, x="up to", y="calls")
+
+# ---------------- Model calls ----------------
+st.subheader("🤖 Model calls")
+now = time.time()
+recent = [s for s in tracing.recent_spans(name="llm.generate") if s["started_at"] >= now - RATE_WINDOW]
+m1, m2, m3 = st.columns(3)
+if rate:
+    per_minute = len(recent) / rate / (RATE_WINDOW / 60)
+    errors = sum(1 for s in recent if s["error"])
+    m1.metric("Calls / min (last 5 min)", f"{per_minute:.1f}")
+    m2.metric("Error rate (last 5 min)", f"{errors / len(recent):.1%}" if recent else "–")
+else:
+    m1.metric("Calls / min (last 5 min)", "–")
+    m2.metric("Error rate (last 5 min)", "–")
+
+today = metering.usage_summary(group_by=("feature",), since=datetime.date.today())
+m3.metric("Calls today", sum(r["calls"] for r in today))
+if today:
+    st.dataframe([{
+        "feature": r["feature"],
+        "calls": r["calls"],
+        "prompt tokens": r["prompt_tokens"],
+        "output tokens": r["output_tokens"],
+        "cost (USD)": round(r["cost_usd"], 4),
+    } for r in today], use_container_width=True, hide_index=True)
+
+# ---------------- Caches and queues ----------------
+col_cache, col_queue = st.columns(2)
+with col_cache:
+    st.subheader("🗃️ Caches")
+    snap = snapshot.cache_stats()
+    dash = dashboard_stats.cache_stats()
+    st.dataframe([
+        {"cache": "profile snapshot", "hits": snap["hits"], "misses": snap["misses"], "hit ratio": ratio(snap)},
+        {"cache": "dashboard stats", "hits": dash["hits"], "misses": dash["misses"], "hit ratio": ratio(dash)},
+    ], use_container_width=True, hide_index=True)
+    st.caption(f"Dashboard stats cached for {dash['users']} users.")
+
+with col_queue:
+    st.subheader("📬 Write-behind queue")
+    depths = queue.depths()
+    st.metric("Users with pending writes", len(depths))
+    if depths:
+        deepest = sorted(depths.items(), key=lambda item: -item[1])[:10]
+        st.dataframe([{"user": u, "pending": n} for u, n in deepest], use_container_width=True, hide_index=True)
+
+# ---------------- Sessions ----------------
+st.subheader("👥 Sessions")
+measure = st.toggle("Measure memory per session", help="Walks every session's state; slow with many sessions.")
+if sessions:
+    rows = []
+    for s in sessions:
+        row = {"session": s["session_id"][:8], "user": s["user"], "script runs": s["script_runs"], "state keys": s["keys"]}
+        if measure:
+            row["memory KiB"] = round(operators.session_memory(s["session_id"]) / 1024, 1)
+        rows.append(row)
+    if measure:
+        rows.sort(key=lambda r: -r["memory KiB"])
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+else:
+    st.caption("No sessions are registered with a Streamlit server in this process.")
+
+# ---------------- Profiles ----------------
+st.subheader("🔥 Run profiles")
+st.caption("Add `?profile=1` to any page's URL to profile your session's runs (`?profile=0` stops), "
+           "or start the server with NEXSTUDY_PROFILE=1. Files are folded stacks for flamegraph.pl or speedscope.")
+profiles = profiling.recent_profiles()
+if profiles:
+    st.dataframe([{
+        "profile": p["name"],
+        "KiB": round(p["bytes"] / 1024, 1),
+        "written": datetime.datetime.fromtimestamp(p["modified"]).strftime("%H:%M:%S"),
+    } for p in profiles], use_container_width=True, hide_index=True)
+    picked = st.selectbox("Download", [p["name"] for p in profiles])
+    with open(profiling.profile_path(picked), "rb") as f:
+        st.download_button("⬇️ Download profile", f.read(), file_name=picked, mime="text/plain")
+else:
+    st.caption("No profiles recorded yet.")
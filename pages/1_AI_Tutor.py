@@ -1,65 +1,62 @@
 import streamlit as st
-import google.generativeai as genai
-import pdfplumber
-import os
 import datetime
-import json
-from supabase import create_client, Client
-from PIL import Image
+import threading
+from nexstudy import assets, chat_store, lazy, llm, pdf, profiling, repository, writebehind
+
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
+
+# Heavy dependencies: imported on first use, not on every page load
+Image = lazy.module("PIL.Image")
 
 # ---------------- Page config ----------------
 st.set_page_config(page_title="NexStudy Tutor", page_icon="🧠", layout="wide")
 st.markdown("<style>footer{visibility:hidden;} </style>", unsafe_allow_html=True)
 
 # ---------------- Logo & Header Logic ----------------
-logo_path = None
-if os.path.exists("assets/image.png"):
-    logo_path = "assets/image.png"
-elif os.path.exists("logo.png"):
-    logo_path = "logo.png"
-elif os.path.exists("logo.jpg"):
-    logo_path = "logo.jpg"
-
 col_logo, col_header = st.columns([1, 6])
 
 with col_logo:
-    if logo_path:
-        st.image(logo_path, width=100)
-    else:
+    if not assets.logo(100):
         st.write("🧠")
 
 with col_header:
     st.title("NexStudy AI Tutor")
     st.caption("Your personalized academic guide. Choose your learning style below.")
 
-# ---------------- Supabase Client ----------------
-@st.cache_resource
-def get_supabase() -> Client:
-    try:
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_ANON_KEY"]
-        return create_client(url, key)
-    except Exception as e:
-        return None
+# ---------------- Storage ----------------
+repo = repository.get_repository()
 
-supabase = get_supabase()
+# ---------------- Chat Window ----------------
+# Only the newest CHAT_WINDOW messages are drawn in full (with action
+# buttons); older ones are paged in a collapsed section, so a rerun costs
+# the same for a 20- or a 2,000-message conversation.
+CHAT_WINDOW = 12
+EARLIER_PAGE_SIZE = 20
 
 # ---------------- Session State & Data Loading ----------------
 user = st.session_state.get("user")
+writebehind.watch_session(user)
 
 # Initialize messages
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-# SYNC LOGIC: Load history from Supabase if logged in
-if user and supabase and not st.session_state.get("chat_history_loaded", False):
+# Messages appended this turn but not yet written to Supabase
+if "unsaved_messages" not in st.session_state:
+    st.session_state.unsaved_messages = []
+
+# SYNC LOGIC: Load the recent window from Supabase if logged in;
+# older messages are fetched on demand ("Load earlier messages")
+if user and repo and not st.session_state.get("chat_history_loaded", False):
     try:
-        res = supabase.table("profiles").select("chat_history").eq("id", user["id"]).single().execute()
-        if res.data and res.data.get("chat_history"):
-            st.session_state.messages = res.data["chat_history"]
+        st.session_state.messages = repo.recent_messages(user["id"])
+        st.session_state.chat_has_more = len(st.session_state.messages) >= chat_store.HOT_WINDOW
     except Exception:
         pass # Fallback to empty if no history
     st.session_state.chat_history_loaded = True
+    # A long history gets a compaction check on the first save, then every COMPACT_CHECK_EVERY messages
+    if st.session_state.get("chat_has_more"):
+        st.session_state.chat_saved_since_compaction = chat_store.COMPACT_CHECK_EVERY
 
 if "saved" not in st.session_state:
     st.session_state.saved = []
@@ -71,37 +68,20 @@ if "current_topic_query" not in st.session_state:
 
 # ---------------- Database Helper ----------------
 def save_chat_to_db():
-    """Saves current chat history to Supabase."""
-    if user and supabase:
-        try:
-            supabase.table("profiles").update({"chat_history": st.session_state.messages}).eq("id", user["id"]).execute()
-            
-            # Also update the 'doubts_solved' count for the dashboard
-            current_doubts = len([m for m in st.session_state.messages if m["role"] == "user"])
-            supabase.table("profiles").update({"doubts_solved": current_doubts}).eq("id", user["id"]).execute()
-        except Exception:
-            pass
-
-# ---------------- Gemini Initialization ----------------
-@st.cache_resource
-def init_gemini(api_key_input):
-    key = api_key_input
-    if not key:
-        try:
-            key = st.secrets.get("GEMINI_API_KEY")
-        except Exception:
-            pass
-    
-    if not key:
-        return None
-
-    try:
-        genai.configure(api_key=key)
-        # 🚀 UPGRADE: Using the newer 2.5 Flash model
-        return genai.GenerativeModel("gemini-2.5-flash-lite")
-    except Exception as e:
-        st.error(f"Gemini initialization error: {e}")
-        return None
+    """Queues this turn's new messages for one background insert."""
+    batch = st.session_state.unsaved_messages
+    st.session_state.unsaved_messages = []  # guests keep nothing to save
+    if user and repo and batch:
+        # doubts_solved is incremented by a trigger on chat_messages
+        writebehind.submit(
+            user["id"], lambda: repo.append_messages(user["id"], batch),
+            label="chat message",
+        )
+        saved = st.session_state.get("chat_saved_since_compaction", 0) + len(batch)
+        if saved >= chat_store.COMPACT_CHECK_EVERY:
+            compact_chat_history(user["id"])
+            saved = 0
+        st.session_state.chat_saved_since_compaction = saved
 
 # ---------------- Sidebar ----------------
 with st.sidebar:
@@ -135,40 +115,71 @@ with st.sidebar:
         index=0
     )
 
-gemini_model = init_gemini(api_key_input)
+llm_ready = llm.is_configured("tutor", api_key_input)
 
 # ---------------- Helpers ----------------
 def extract_text_from_pdf(uploaded_file):
     try:
-        text = ""
-        with pdfplumber.open(uploaded_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-        return text.strip()
+        return pdf.extract_text(uploaded_file)
     except Exception as e:
         st.error(f"Error extracting PDF text: {e}")
         return ""
 
-def call_gemini(contents):
-    if gemini_model is None:
-        return {"error": "Gemini API key not configured."}
+def call_gemini(contents, feature="tutor.chat"):
+    return llm.call_gemini(contents, feature=feature, api_key=api_key_input)
+
+def load_earlier_messages():
+    """Prepend the previous page (or archived segment) of history."""
+    if not (user and repo and st.session_state.messages):
+        return
     try:
-        resp = gemini_model.generate_content(contents)
-        text = resp.text or ""
-        return {"text": text}
-    except Exception as e:
-        return {"error": str(e)}
+        older = repo.messages_before(user["id"], st.session_state.messages[0])
+    except Exception:
+        older = []
+    st.session_state.messages = older + st.session_state.messages
+    st.session_state.chat_has_more = bool(older)
+
+def older_chat_page():
+    """Page back through earlier messages, fetching more history once the loaded ones run out."""
+    page = st.session_state.get("chat_earlier_page", 0) + 1
+    earlier = max(0, len(st.session_state.messages) - CHAT_WINDOW)
+    if page * EARLIER_PAGE_SIZE >= earlier:
+        load_earlier_messages()
+    st.session_state.chat_earlier_page = page
+
+def newer_chat_page():
+    st.session_state.chat_earlier_page = max(0, st.session_state.get("chat_earlier_page", 0) - 1)
+
+def compact_chat_history(user_id):
+    """Archive old messages in the background so page load stays fast.
+
+    The summaries are written on a thread of their own; only the archive
+    writes join the user's write queue, so a slow model never holds up saves.
+    """
+    def summarize(transcript):
+        res = llm.call_gemini(
+            ["Summarize this tutoring conversation in 5 bullet points.", transcript],
+            feature="tutor.compact", api_key=api_key_input, user_id=user_id,
+        )
+        return res.get("text", "")
+
+    def archive(write):
+        writebehind.submit(user_id, write, label="chat archive")
+
+    threading.Thread(
+        target=repo.compact_history, args=(user_id, summarize, archive),
+        name="chat-compaction", daemon=True,
+    ).start()
 
 def append_user_message(text):
-    msg = {"role": "user", "text": text}
+    msg = chat_store.new_message("user", text)
     st.session_state.messages.append(msg)
-    save_chat_to_db()
+    st.session_state.unsaved_messages.append(msg)
 
 def append_assistant_message(text):
-    msg = {"role": "assistant", "text": text}
+    msg = chat_store.new_message("assistant", text)
     st.session_state.messages.append(msg)
+    st.session_state.unsaved_messages.append(msg)
     save_chat_to_db()
 
 def get_chat_history_text():
@@ -176,11 +187,49 @@ def get_chat_history_text():
     # Look deeper into history for better context (last 10 turns)
     recent_messages = st.session_state.messages[-10:]
     for msg in recent_messages:
-        role = "Student" if msg["role"] == "user" else "Tutor"
+        role = {"user": "Student", "summary": "Earlier summary"}.get(msg["role"], "Tutor")
         clean_text = msg['text'].replace("\n", " ") 
         history_context += f"{role}: {clean_text}\n"
     return history_context
 
+def render_message_compact(msg):
+    """An earlier message as plain text: no HTML card, no action buttons."""
+    if msg["role"] == "summary":
+        st.info(f"🗂️ **Earlier conversation (archived)**\n\n{msg['text']}")
+    elif msg["role"] == "user":
+        st.markdown(f"**👤 You:** {msg['text']}")
+    else:
+        st.markdown(f"**🤖 NexStudy:**\n\n{msg['text']}")
+    st.divider()
+
+def render_message(msg, msg_key):
+    if msg["role"] == "summary":
+        st.info(f"🗂️ **Earlier conversation (archived)**\n\n{msg['text']}")
+    elif msg["role"] == "user":
+        user_text = msg['text'].replace('\n', '<br>')
+        st.markdown(f"""
+            <div style="background-color: #f0f2f6; padding: 15px; border-radius: 10px; margin-bottom: 20px; color: #000000; border-left: 5px solid #4F46E5;">
+                <h5 style="margin: 0 0 8px 0; color: #444;">👤 You</h5>
+                <div style="font-size: 1rem;">{user_text}</div>
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"### 🤖 NexStudy")
+        st.markdown(msg['text'])
+
+        # Tool Buttons below AI text
+        b1, b2, b3 = st.columns([1,1,1])
+        if b1.button("Simplify 👶", key=f"s_{msg_key}"):
+            res = call_gemini([f"Simplify this specific explanation:\n\n{msg['text']}"], feature="tutor.simplify")
+            if not res.get("error"): append_assistant_message(res["text"]); st.rerun()
+        if b2.button("Show Steps 🪜", key=f"st_{msg_key}"):
+            res = call_gemini([f"Break this down into numbered step-by-step logic:\n\n{msg['text']}"], feature="tutor.steps")
+            if not res.get("error"): append_assistant_message(res["text"]); st.rerun()
+        if b3.button("Save 💾", key=f"sv_{msg_key}"):
+            st.session_state.saved.append({"text": msg["text"], "timestamp": str(datetime.datetime.now())})
+            st.success("Saved!")
+        st.divider()
+
 # ---------------- Layout ----------------
 left, right = st.columns([1, 2])
 
@@ -213,10 +262,12 @@ with left:
         with col_a:
             if st.button("🗑️ Clear Chat"):
                 st.session_state.messages = []
-                if user and supabase:
-                    try:
-                        supabase.table("profiles").update({"chat_history": []}).eq("id", user["id"]).execute()
-                    except: pass
+                st.session_state.unsaved_messages = []
+                if user and repo:
+                    writebehind.submit(
+                        user["id"], lambda: repo.clear_messages(user["id"]),
+                        label="clear chat",
+                    )
                 st.rerun()
         with col_b:
             if st.button("💾 Saved Items"):
@@ -247,9 +298,9 @@ with left:
                 # if include_links: 
                     # prompt += " Recommend 3 YouTube channels or video titles to watch. Do NOT provide direct links (URLs), just the names."
                 
-                if gemini_model:
+                if llm_ready:
                     with st.spinner("Explaining..."):
-                        res = call_gemini([f"You are an expert tutor. {prompt}"])
+                        res = call_gemini([f"You are an expert tutor. {prompt}"], feature="tutor.explain")
                         if not res.get("error"):
                             st.session_state.topic_explanation = res["text"]
                             st.rerun()
@@ -265,31 +316,32 @@ with right:
     if mode == "💬 Doubt Solver & Chat":
         chat_container = st.container()
         with chat_container:
-            for i, msg in enumerate(st.session_state.messages):
-                if msg["role"] == "user":
-                    user_text = msg['text'].replace('\n', '<br>')
-                    st.markdown(f"""
-                        <div style="background-color: #f0f2f6; padding: 15px; border-radius: 10px; margin-bottom: 20px; color: #000000; border-left: 5px solid #4F46E5;">
-                            <h5 style="margin: 0 0 8px 0; color: #444;">👤 You</h5>
-                            <div style="font-size: 1rem;">{user_text}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"### 🤖 NexStudy")
-                    st.markdown(msg['text'])
-                    
-                    # Tool Buttons below AI text
-                    b1, b2, b3 = st.columns([1,1,1])
-                    if b1.button("Simplify 👶", key=f"s_{i}"):
-                        res = call_gemini([f"Simplify this specific explanation:\n\n{msg['text']}"])
-                        if not res.get("error"): append_assistant_message(res["text"]); st.rerun()
-                    if b2.button("Show Steps 🪜", key=f"st_{i}"):
-                        res = call_gemini([f"Break this down into numbered step-by-step logic:\n\n{msg['text']}"])
-                        if not res.get("error"): append_assistant_message(res["text"]); st.rerun()
-                    if b3.button("Save 💾", key=f"sv_{i}"):
-                        st.session_state.saved.append({"text": msg["text"], "timestamp": str(datetime.datetime.now())})
-                        st.success("Saved!")
-                    st.divider()
+            messages = st.session_state.messages
+            split = max(0, len(messages) - CHAT_WINDOW)
+            earlier, recent = messages[:split], messages[split:]
+
+            # Older turns: collapsed, drawn one plain page at a time when opened
+            if earlier or st.session_state.get("chat_has_more"):
+                # Label and help stay fixed: changing them would make a new widget and reset the toggle
+                if st.toggle("📜 Earlier messages", key="chat_show_earlier"):
+                    page = st.session_state.get("chat_earlier_page", 0)
+                    end = max(0, len(earlier) - page * EARLIER_PAGE_SIZE)
+                    at_oldest = end <= EARLIER_PAGE_SIZE
+                    with st.container(border=True):
+                        for msg in earlier[max(0, end - EARLIER_PAGE_SIZE):end]:
+                            render_message_compact(msg)
+                        col_older, col_info, col_newer = st.columns([1, 2, 1])
+                        col_older.button(
+                            "◀ Older", key="chat_earlier_older", on_click=older_chat_page,
+                            disabled=at_oldest and not st.session_state.get("chat_has_more"),
+                        )
+                        more = "+" if st.session_state.get("chat_has_more") else ""
+                        col_info.caption(f"Page {page + 1} · {len(earlier)}{more} earlier messages")
+                        col_newer.button("Newer ▶", key="chat_earlier_newer", on_click=newer_chat_page, disabled=page == 0)
+
+            # Recent turns: fully drawn, with action buttons
+            for i, msg in enumerate(recent, start=split):
+                render_message(msg, msg.get("id", i))
 
         # Input Form
         st.write("")
@@ -360,8 +412,9 @@ with right:
                         except: pass
 
                     if display_text or uploaded_image or uploaded_pdf:
+                        # The question waits for the answer so the turn is one insert
                         append_user_message("\n".join(display_text))
-                        if gemini_model:
+                        if llm_ready:
                             with st.spinner("Thinking..."):
                                 res = call_gemini(content_parts)
                                 if not res.get("error"):
@@ -369,6 +422,7 @@ with right:
                                     st.rerun()
                         else:
                             st.error("Check API Key.")
+                        save_chat_to_db()  # no answer came back; keep the question
                     else:
                         st.warning("Empty message.")
     
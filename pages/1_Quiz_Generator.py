@@ -1,33 +1,22 @@
 import streamlit as st
-import pdfplumber
 import json
-import google.generativeai as genai
+from nexstudy import activity, llm, pdf, profiling, repository, writebehind
 
-# ---------------- GEMINI API SETUP ----------------
-genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
 
 # ---------------- PDF EXTRACTION ----------------
 def extract_text_from_pdf(uploaded_file):
     """Extract text safely from uploaded PDF"""
-    text = ""
-    with pdfplumber.open(uploaded_file) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() or ""
-    return text
+    return pdf.extract_text(uploaded_file)
 
 
 # ---------------- GEMINI QUIZ GENERATION ----------------
 def generate_questions_ai(text, num_questions=5):
     """Generate MCQ questions using Gemini"""
     try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-
         prompt = f"""
 You are an expert MCQ Quiz Generator.
-Generate exactly {num_questions} multiple-choice questions from the text below.
-
-TEXT:
-{text}
+Generate exactly {num_questions} multiple-choice questions from the TEXT part that follows.
 
 INSTRUCTIONS:
 - Output MUST be valid JSON only.
@@ -51,8 +40,10 @@ RETURN ONLY THIS FORMAT:
 }}
 """
 
-        response = model.generate_content(prompt)
-        raw = response.text.strip()
+        res = llm.call_gemini([prompt, f"TEXT:\n{text}"], feature="quiz.generate")
+        if res.get("error"):
+            raise RuntimeError(res["error"])
+        raw = res["text"].strip()
 
         # Clean markdown formatting if present
         raw = raw.replace("```json", "").replace("```", "").strip()
@@ -69,6 +60,11 @@ RETURN ONLY THIS FORMAT:
 st.title("🧠 Smart Quiz Generator")
 st.write("Generate quizzes from your notes or PDFs instantly!")
 
+# --- Storage ---
+repo = repository.get_repository()
+user = st.session_state.get("user")
+writebehind.watch_session(user)
+
 # --- Session State Initialization ---
 if 'quiz' not in st.session_state:
     st.session_state.quiz = []
@@ -138,6 +134,12 @@ if st.session_state.quiz_generated and st.session_state.quiz:
 
     if st.button("Submit Quiz", disabled=st.session_state.quiz_submitted):
         st.session_state.quiz_submitted = True
+        if user and repo:
+            event_id = activity.new_event_id()  # the same id on every retry of this write
+            writebehind.submit(
+                user["id"], lambda: repo.record_activity(user["id"], "quiz", event_id),
+                label="activity",
+            )
 
 
     # ---------------- RESULTS SECTION ----------------
@@ -1,92 +1,48 @@
 import streamlit as st
-import google.generativeai as genai
-import pdfplumber
-import os
 import datetime
-from PIL import Image
-from supabase import create_client, Client
+from nexstudy import assets, lazy, library, library_view, llm, pdf, profiling, repository, writebehind
+
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
+
+# Heavy dependencies: imported on first use, not on every page load
+Image = lazy.module("PIL.Image")
 
 # ---------------- Page config ----------------
 st.set_page_config(page_title="Past Paper Solver", page_icon="📝", layout="wide")
 st.markdown("<style>footer{visibility:hidden;} </style>", unsafe_allow_html=True)
 
 # ---------------- Logo Logic ----------------
-if os.path.exists("assets/image.png"):
-    st.image("assets/image.png", width=150)
-elif os.path.exists("logo.png"):
-    st.image("logo.png", width=150)
-elif os.path.exists("logo.jpg"):
-    st.image("logo.jpg", width=150)
+assets.logo(150)
 
 st.title("📝 Past Paper Solver")
 st.caption("Upload an exam paper (PDF or Images) and get a comprehensive solution key.")
 
-# ---------------- Supabase Client ----------------
-@st.cache_resource
-def get_supabase() -> Client:
-    try:
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_ANON_KEY"]
-        return create_client(url, key)
-    except Exception as e:
-        return None
-
-supabase = get_supabase()
+# ---------------- Storage ----------------
+repo = repository.get_repository()
 
 # ---------------- Session State ----------------
 user = st.session_state.get("user")
+writebehind.watch_session(user)
 if "paper_solution" not in st.session_state:
     st.session_state.paper_solution = ""
 
 # ---------------- Database Functions ----------------
-def fetch_saved_papers():
-    """Fetch saved_papers array from Supabase profiles"""
-    if not user or not supabase: return []
-    try:
-        res = supabase.table("profiles").select("saved_papers").eq("id", user["id"]).single().execute()
-        if res.data and res.data.get("saved_papers"):
-            return res.data["saved_papers"]
-    except: pass
-    return []
-
 def save_paper_to_db(solution_text, source_name):
-    """Append new solution to saved_papers in Supabase"""
-    if not user or not supabase: return False
-    try:
-        current_data = fetch_saved_papers()
-        entry = {
-            "title": f"Solution: {source_name}",
-            "date": datetime.datetime.now().strftime("%Y-%m-%d"),
-            "content": solution_text
-        }
-        current_data.append(entry)
-        
-        # Update DB
-        supabase.table("profiles").update({"saved_papers": current_data}).eq("id", user["id"]).execute()
-        return True
-    except Exception as e:
-        st.error(f"Save failed: {e}")
-        return False
-
-# ---------------- Gemini Initialization ----------------
-@st.cache_resource
-def init_gemini(api_key_input):
-    key = api_key_input
-    if not key:
-        try:
-            key = st.secrets.get("GEMINI_API_KEY")
-        except Exception:
-            pass
-    
-    if not key:
-        return None
-
-    try:
-        genai.configure(api_key=key)
-        return genai.GenerativeModel("gemini-2.5-flash-lite")
-    except Exception as e:
-        st.error(f"Gemini initialization error: {e}")
-        return None
+    """Queue saving a new solution as a library item"""
+    if not user or not repo: return False
+    entry = {
+        "title": f"Solution: {source_name}",
+        "date": datetime.datetime.now().strftime("%Y-%m-%d"),
+        "content": solution_text
+    }
+
+    item = library.from_entry("paper", entry)
+    writebehind.submit(
+        user["id"], lambda: repo.add_item(user["id"], item),
+        label="saved solution",
+    )
+    library_view.invalidate(user, "paper")
+    return True
 
 # ---------------- Sidebar ----------------
 with st.sidebar:
@@ -102,31 +58,18 @@ with st.sidebar:
     else:
         api_key_input = st.text_input("Enter Gemini API Key:", type="password")
 
-gemini_model = init_gemini(api_key_input)
+llm_ready = llm.is_configured("solver", api_key_input)
 
 # ---------------- Helpers ----------------
 def extract_text_from_pdf(uploaded_file):
     try:
-        text = ""
-        with pdfplumber.open(uploaded_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-        return text.strip()
+        return pdf.extract_text(uploaded_file)
     except Exception as e:
         st.error(f"Error extracting PDF text: {e}")
         return ""
 
-def call_gemini(contents):
-    if gemini_model is None:
-        return {"error": "Gemini API key not configured."}
-    try:
-        resp = gemini_model.generate_content(contents)
-        text = resp.text or ""
-        return {"text": text}
-    except Exception as e:
-        return {"error": str(e)}
+def call_gemini(contents, feature="solver.solve"):
+    return llm.call_gemini(contents, feature=feature, api_key=api_key_input)
 
 # ---------------- TABS ----------------
 tab_solve, tab_saved = st.tabs(["🚀 Solve New Paper", "📚 Saved Solutions"])
@@ -156,7 +99,7 @@ with tab_solve:
         if st.button("🚀 Solve Paper", type="primary"):
             if not (uploaded_file or uploaded_images):
                 st.warning("Please upload a file.")
-            elif not gemini_model:
+            elif not llm_ready:
                 st.error("API Key missing.")
             else:
                 with st.spinner("Analyzing questions..."):
@@ -212,14 +155,12 @@ with tab_solve:
 # =======================================================
 with tab_saved:
     st.markdown("### 📚 Library")
-    if user and supabase:
-        saved_papers = fetch_saved_papers()
-        if saved_papers:
-            for i, paper in enumerate(reversed(saved_papers)):
-                with st.expander(f"{paper.get('title')} ({paper.get('date')})"):
-                    st.markdown(paper.get('content'))
-                    st.download_button("Download", paper.get('content'), f"Solution_{i}.md", key=f"dl_{i}")
-        else:
-            st.info("No saved solutions found.")
+    if user and repo:
+        def show_paper(paper):
+            st.markdown(paper.get('content'))
+            st.download_button("Download", paper.get('content'), f"Solution_{paper['id'][:8]}.md", key=f"dl_{paper['id']}")
+
+        label = lambda p: f"{p.get('title')} ({p.get('date')})"
+        library_view.render_library(repo, user, "paper", label, show_paper, empty="No saved solutions found.")
     else:
         st.warning("Log in to view saved solutions.")
@@ -1,84 +1,60 @@
 import streamlit as st
-import pandas as pd
 import datetime
 import os
 import json
-from supabase import create_client, Client
+from nexstudy import activity, assets, dashboard_stats, export, lazy, metering, profiling, repository, writebehind
+
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
+
+# Heavy dependencies: imported on first use, not on every page load
+pd = lazy.module("pandas")
 
 # ---------------- Page Config ----------------
 st.set_page_config(page_title="My Dashboard", page_icon="📊", layout="wide")
 st.markdown("<style>footer{visibility:hidden;} </style>", unsafe_allow_html=True)
 
-# ---------------- Supabase Client ----------------
-@st.cache_resource
-def get_supabase() -> Client:
-    try:
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_ANON_KEY"]
-        return create_client(url, key)
-    except Exception as e:
-        return None
-
-supabase = get_supabase()
+# ---------------- Storage ----------------
+repo = repository.get_repository()
 
 # ---------------- Logo Logic ----------------
-if os.path.exists("logo.png"):
-    st.image("logo.png", width=150)
-elif os.path.exists("logo.jpg"):
-    st.image("logo.jpg", width=150)
+assets.logo(150)
 
 st.title("📊 Personal Performance Dashboard")
 st.caption("Track your learning progress across NexStudy tools.")
 
 # ---------------- Helper: Load Stats ----------------
 def load_user_stats(user):
-    # Default stats (for guests or new users)
-    stats = {
-        "doubts_solved": 0,
-        "plans_created": 0,
-        "audio_generated": 0,
-        "streak": 0,
-        "pending_todos": 0,
-        "completed_todos": 0
-    }
-
-    # 1. Get Session Stats (Always available)
+    # Guests: numbers from this session only
     msgs = st.session_state.get("messages", [])
-    session_doubts = len([m for m in msgs if m["role"] == "user"])
-    
-    has_plan = 1 if st.session_state.get("session_plan_meta") else 0
-    has_audio = 1 if st.session_state.get("podcast_script") else 0
-    
-    # Get To-Do stats from session
     todos = st.session_state.get("todos", [])
-    pending_todos = len([t for t in todos if not t["done"]])
-    completed_todos = len([t for t in todos if t["done"]])
-
-    # 2. Get Persistent Stats from Supabase (if logged in)
-    if user and supabase:
+    pending = [t["task"] for t in todos if not t["done"]]
+    stats = {
+        "doubts_solved": len([m for m in msgs if m["role"] == "user"]),
+        "plans_created": 1 if st.session_state.get("session_plan_meta") else 0,
+        "audio_generated": 1 if st.session_state.get("podcast_script") else 0,
+        "pending_todos": len(pending),
+        "completed_todos": len(todos) - len(pending),
+        "papers_saved": 0,
+        "next_todos": pending[:3],
+    }
+    stats["activity"] = [{
+        "day": activity.today().isoformat(),
+        "doubts": stats["doubts_solved"],
+        "quizzes": st.session_state.get("quiz_attempts", 0),
+        "plans": stats["plans_created"],
+        "audio": stats["audio_generated"],
+        "todos_done": stats["completed_todos"],
+    }]
+    stats["streak"] = 1 if any(stats["activity"][0][col] for col in activity.ROLLUP_COLUMNS) else 0
+
+    # Signed in: the persisted numbers, daily activity and streak, one aggregate query cached for a few seconds
+    if user and repo:
         try:
-            # Fetch profile data
-            res = supabase.table("profiles").select("*").eq("id", user["id"]).single().execute()
-            if res.data:
-                profile = res.data
-                # Assuming you might store these in profile later. 
-                # For now, we'll use session data but you can expand this.
-                # Example: stats["streak"] = profile.get("streak", 0)
-                pass
+            writebehind.wait_idle(user["id"])  # count writes still in flight
+            stats.update(dashboard_stats.get(repo, user["id"]))
         except Exception:
             pass
 
-    # Combine/Update stats
-    stats["doubts_solved"] = session_doubts
-    stats["plans_created"] = has_plan
-    stats["audio_generated"] = has_audio
-    stats["pending_todos"] = pending_todos
-    stats["completed_todos"] = completed_todos
-    
-    # Simple streak logic (Mock calculation)
-    activity_count = session_doubts + has_plan + has_audio + len(todos)
-    stats["streak"] = 1 if activity_count > 0 else 0
-    
     return stats
 
 # ---------------- User State ----------------
@@ -122,46 +98,53 @@ grid_col1, grid_col2 = st.columns([2, 1])
 
 # === LEFT COLUMN: Productivity Chart ===
 with grid_col1:
-    # Activity Chart (REAL-TIME SESSION DATA)
+    # Activity Chart (daily rollups for the last 7 days)
     st.subheader("📈 Productivity Trends")
-    
-    # Initialize empty data for the week
-    days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-    doubts_data = [0] * 7
-    hours_data = [0] * 7
-    
-    # Update "Today's" data point with current session stats
-    today_index = datetime.datetime.today().weekday() # 0 is Monday, 6 is Sunday
-    doubts_data[today_index] = stats['doubts_solved']
-    
-    # Calculate simple activity score
-    # Doubts + Plans + Audio + Completed Tasks
-    activity_score = (stats['plans_created'] * 2) + (stats['audio_generated'] * 2) + (stats['completed_todos'] * 1) + (stats['doubts_solved'] * 0.5)
-    hours_data[today_index] = activity_score
-
-    chart_data = pd.DataFrame({
-        'Day': days,
-        'Doubts Solved': doubts_data,
-        'Activity Score': hours_data
-    })
-    
-    st.line_chart(chart_data.set_index('Day'))
+
+    week = activity.week(stats["activity"])
+
+    if any(d[col] for d in week for col in activity.ROLLUP_COLUMNS):
+        # Calculate simple activity score
+        # Doubts + Quizzes + Plans + Audio + Completed Tasks
+        chart_data = pd.DataFrame({
+            'Day': [pd.Timestamp(d["day"]) for d in week],
+            'Doubts Solved': [d["doubts"] for d in week],
+            'Activity Score': [
+                (d["plans"] * 2) + (d["audio"] * 2) + d["todos_done"] + d["quizzes"] + (d["doubts"] * 0.5)
+                for d in week
+            ],
+        })
+
+        st.line_chart(chart_data.set_index('Day'))
+    else:
+        # A flat line says nothing, and skipping it keeps pandas out of the first visit
+        st.info("No activity in the last 7 days yet. Ask a doubt or take a quiz to start your trend line.")
     
     if not user:
         st.caption("👀 You are viewing **Guest Data** (Current Session Only). Sign in to save history.")
+    else:
+        # AI usage from the local metering store
+        week_ago = datetime.date.today() - datetime.timedelta(days=6)
+        try:
+            usage = metering.usage_summary(group_by=("feature",), since=week_ago, user_id=user["id"])
+        except Exception:
+            usage = []
+        if usage:
+            st.subheader("🤖 AI Usage (7 days)")
+            usage_df = pd.DataFrame(usage).set_index("feature")
+            st.bar_chart(usage_df[["prompt_tokens", "output_tokens"]])
 
 # === RIGHT COLUMN: Quick Actions & History ===
 with grid_col2:
     # 3. Pending Tasks (NEW)
     st.subheader("📝 Pending Tasks")
-    todos = st.session_state.get("todos", [])
-    pending = [t for t in todos if not t["done"]]
-    
-    if pending:
-        for t in pending[:3]: # Show top 3
-            st.markdown(f"- ⬜ {t['task']}")
-        if len(pending) > 3:
-            st.caption(f"...and {len(pending) - 3} more.")
+    pending_count = stats["pending_todos"]
+
+    if pending_count:
+        for task in stats["next_todos"]: # Show top 3
+            st.markdown(f"- ⬜ {task}")
+        if pending_count > 3:
+            st.caption(f"...and {pending_count - 3} more.")
         
         if st.button("Manage Tasks"):
             st.switch_page("pages/6_Study_Planner.py")
@@ -199,8 +182,34 @@ st.subheader("🏆 Your Weekly Goals")
 
 col_g1, col_g2, col_g3 = st.columns(3)
 with col_g1:
-    st.checkbox("Solve 5 Past Papers", value=False)
+    st.checkbox("Solve 5 Past Papers", value=(stats['papers_saved'] >= 5), disabled=True)
 with col_g2:
     st.checkbox("Complete 10 tasks", value=(stats['completed_todos'] >= 10), disabled=True)
 with col_g3:
     st.checkbox("Create 3 Audio Summaries", value=(stats['audio_generated'] >= 3), disabled=True)
+
+# ---------------- Library Export ----------------
+if user and repo:
+    st.markdown("---")
+    st.subheader("📦 Export Your Library")
+    st.caption("Download every saved solution, code snippet, audio note and plan as one zip, with a JSON manifest.")
+    prepared = False
+    if st.button("Prepare Export"):
+        with st.spinner("Packing your library..."):
+            try:
+                writebehind.wait_idle(user["id"])  # include just-saved items
+                st.session_state.library_export = export.write_export(repo, user["id"])
+                prepared = True
+            except Exception as e:
+                st.error(f"Export failed: {e}")
+    name = st.session_state.get("library_export")
+    path = export.export_path(name) if name else None
+    if path and os.path.exists(path):
+        size_mb = os.path.getsize(path) / 1e6
+        # Only this session gets the download; the file itself is not publicly served.
+        # st.download_button copies the file into memory, so it is only offered on the
+        # run that prepared it or when asked for, not on every rerun of the Dashboard.
+        if prepared or st.button(f"⬇️ Get download ({size_mb:.1f} MB)"):
+            with open(path, "rb") as f:
+                st.download_button(f"💾 Save NexStudy_Library.zip ({size_mb:.1f} MB)", f,
+                                   "NexStudy_Library.zip", "application/zip")
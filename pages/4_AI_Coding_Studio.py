@@ -1,95 +1,50 @@
 import streamlit as st
-import google.generativeai as genai
-import os
 import datetime
 import json
-from supabase import create_client, Client
+from nexstudy import assets, library, library_view, llm, profiling, repository, writebehind
+
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
 
 # ---------------- Page config ----------------
 st.set_page_config(page_title="AI Coding Studio", page_icon="💻", layout="wide")
 st.markdown("<style>footer{visibility:hidden;} </style>", unsafe_allow_html=True)
 
 # ---------------- Logo Logic ----------------
-if os.path.exists("assets/image.png"):
-    st.image("assets/image.png", width=150)
-elif os.path.exists("logo.png"):
-    st.image("logo.png", width=150)
-elif os.path.exists("logo.jpg"):
-    st.image("logo.jpg", width=150)
+assets.logo(150)
 
 st.title("💻 AI Coding Studio")
 st.caption("Generate code, debug errors, and build projects with AI assistance.")
 
-# ---------------- Supabase Client ----------------
-@st.cache_resource
-def get_supabase() -> Client:
-    try:
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_ANON_KEY"]
-        return create_client(url, key)
-    except Exception as e:
-        return None
-
-supabase = get_supabase()
+# ---------------- Storage ----------------
+repo = repository.get_repository()
 
 # ---------------- Session State ----------------
 user = st.session_state.get("user")
+writebehind.watch_session(user)
 if "generated_code" not in st.session_state:
     st.session_state.generated_code = ""
 if "debug_analysis" not in st.session_state:
     st.session_state.debug_analysis = ""
 
 # ---------------- Database Functions ----------------
-def fetch_saved_code():
-    """Fetch saved_code array from Supabase profiles"""
-    if not user or not supabase: return []
-    try:
-        res = supabase.table("profiles").select("saved_code").eq("id", user["id"]).single().execute()
-        if res.data and res.data.get("saved_code"):
-            return res.data["saved_code"]
-    except: pass
-    return []
-
 def save_code_to_db(title, language, code, type="snippet"):
-    """Append new code to saved_code in Supabase"""
-    if not user or not supabase: return False
-    try:
-        current_data = fetch_saved_code()
-        entry = {
-            "title": title if title else f"Untitled {language} Snippet",
-            "language": language,
-            "code": code,
-            "type": type,
-            "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-        }
-        current_data.append(entry)
-        
-        # Update DB
-        supabase.table("profiles").update({"saved_code": current_data}).eq("id", user["id"]).execute()
-        return True
-    except Exception as e:
-        st.error(f"Save failed: {e}")
-        return False
-
-# ---------------- Gemini Initialization ----------------
-@st.cache_resource
-def init_gemini(api_key_input):
-    key = api_key_input
-    if not key:
-        try:
-            key = st.secrets.get("GEMINI_API_KEY")
-        except Exception:
-            pass
-    
-    if not key:
-        return None
-
-    try:
-        genai.configure(api_key=key)
-        return genai.GenerativeModel("gemini-2.5-flash-lite")
-    except Exception as e:
-        st.error(f"Gemini initialization error: {e}")
-        return None
+    """Queue saving new code as a library item"""
+    if not user or not repo: return False
+    entry = {
+        "title": title if title else f"Untitled {language} Snippet",
+        "language": language,
+        "code": code,
+        "type": type,
+        "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    }
+
+    item = library.from_entry("code", entry, "code")
+    writebehind.submit(
+        user["id"], lambda: repo.add_item(user["id"], item),
+        label="saved code",
+    )
+    library_view.invalidate(user, "code")
+    return True
 
 # ---------------- Sidebar ----------------
 with st.sidebar:
@@ -105,7 +60,7 @@ with st.sidebar:
     else:
         api_key_input = st.text_input("Enter Gemini API Key:", type="password")
 
-gemini_model = init_gemini(api_key_input)
+llm_ready = llm.is_configured("coding", api_key_input)
 
 # ---------------- TABS ----------------
 tab_gen, tab_debug, tab_lib = st.tabs(["⚙️ Generator", "🐞 Debugger", "📚 Code Library"])
@@ -124,17 +79,17 @@ with tab_gen:
         if st.button("🚀 Generate Code", type="primary"):
             if not details:
                 st.warning("Describe the code first.")
-            elif not gemini_model:
+            elif not llm_ready:
                 st.error("API Key missing.")
             else:
                 with st.spinner("Coding..."):
                     prompt = f"Write {lang} code for: {details}. Provide ONLY code inside markdown block."
-                    try:
-                        res = gemini_model.generate_content(prompt)
-                        st.session_state.generated_code = res.text
+                    res = llm.call_gemini(prompt, feature="coding.generate", api_key=api_key_input)
+                    if res.get("error"):
+                        st.error(f"Error: {res['error']}")
+                    else:
+                        st.session_state.generated_code = res["text"]
                         st.rerun()
-                    except Exception as e:
-                        st.error(f"Error: {e}")
 
     with col2:
         if st.session_state.generated_code:
@@ -165,7 +120,7 @@ with tab_debug:
         if st.button("🔍 Fix Bug", type="primary"):
             if not buggy_code:
                 st.warning("Paste code.")
-            elif not gemini_model:
+            elif not llm_ready:
                 st.error("API Key missing.")
             else:
                 with st.spinner("Analyzing..."):
@@ -180,12 +135,12 @@ with tab_debug:
                     1. What is wrong.
                     2. Corrected Code.
                     """
-                    try:
-                        res = gemini_model.generate_content(prompt)
-                        st.session_state.debug_analysis = res.text
+                    res = llm.call_gemini(prompt, feature="coding.debug", api_key=api_key_input)
+                    if res.get("error"):
+                        st.error(f"Error: {res['error']}")
+                    else:
+                        st.session_state.debug_analysis = res["text"]
                         st.rerun()
-                    except Exception as e:
-                        st.error(f"Error: {e}")
 
     with col_d2:
         if st.session_state.debug_analysis:
@@ -202,14 +157,12 @@ with tab_debug:
 # =======================================================
 with tab_lib:
     st.markdown("### 📚 My Code Snippets")
-    if user and supabase:
-        saved_snippets = fetch_saved_code()
-        if saved_snippets:
-            for i, snippet in enumerate(reversed(saved_snippets)):
-                with st.expander(f"{snippet.get('language')} | {snippet.get('title')} ({snippet.get('date')})"):
-                    st.markdown(snippet.get('code'))
-                    st.download_button("Download", snippet.get('code'), f"Snippet_{i}.txt", key=f"dl_c_{i}")
-        else:
-            st.info("No saved code yet.")
+    if user and repo:
+        def show_snippet(snippet):
+            st.markdown(snippet.get('code'))
+            st.download_button("Download", snippet.get('code'), f"Snippet_{snippet['id'][:8]}.txt", key=f"dl_c_{snippet['id']}")
+
+        label = lambda s: f"{s.get('language')} | {s.get('title')} ({s.get('date')})"
+        library_view.render_library(repo, user, "code", label, show_snippet, empty="No saved code yet.", content_key="code")
     else:
         st.warning("Log in to view your code library.")
@@ -1,48 +1,31 @@
 import streamlit as st
-import google.generativeai as genai
-import pdfplumber
-import os
 import tempfile
 import datetime
 import json
-from supabase import create_client, Client
+from nexstudy import assets, lazy, library, library_view, llm, pdf, profiling, repository, tracing, writebehind
 
-# Try importing gTTS (Google Text-to-Speech)
-try:
-    from gtts import gTTS
-    HAS_GTTS = True
-except ImportError:
-    HAS_GTTS = False
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
+
+# gTTS (Google Text-to-Speech) is optional
+HAS_GTTS = lazy.available("gtts")
+gtts = lazy.module("gtts")
 
 # ---------------- Page config ----------------
 st.set_page_config(page_title="Audio Notes", page_icon="🎧", layout="wide")
 st.markdown("<style>footer{visibility:hidden;} </style>", unsafe_allow_html=True)
 
 # ---------------- Logo Logic ----------------
-if os.path.exists("assets/image.png"):
-    st.image("assets/image.png", width=150)
-elif os.path.exists("logo.png"):
-    st.image("logo.png", width=150)
-elif os.path.exists("logo.jpg"):
-    st.image("logo.jpg", width=150)
+assets.logo(150)
 
 st.title("🎧 Audio Notes Studio")
 st.caption("Convert text to audio podcasts OR transcribe lecture recordings into notes.")
 
-# ---------------- Supabase Client ----------------
-@st.cache_resource
-def get_supabase() -> Client:
-    try:
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_ANON_KEY"]
-        return create_client(url, key)
-    except Exception as e:
-        return None
-
-supabase = get_supabase()
+# ---------------- Storage ----------------
+repo = repository.get_repository()
 
 # ---------------- Session State ----------------
 user = st.session_state.get("user")
+writebehind.watch_session(user)
 
 if "podcast_script" not in st.session_state:
     st.session_state.podcast_script = ""
@@ -52,61 +35,22 @@ if "transcription_result" not in st.session_state:
     st.session_state.transcription_result = ""
 
 # ---------------- Database Functions ----------------
-def fetch_saved_audio():
-    """Fetch saved_audio array from Supabase profiles"""
-    if not user or not supabase: return []
-    try:
-        res = supabase.table("profiles").select("saved_audio").eq("id", user["id"]).single().execute()
-        if res.data and res.data.get("saved_audio"):
-            return res.data["saved_audio"]
-    except: pass
-    return []
-
 def save_audio_entry(entry):
-    """Append new audio/transcript entry to saved_audio in Supabase"""
-    if not user or not supabase: return False
-    try:
-        current_data = fetch_saved_audio()
-        # Add timestamp title if missing
-        if "title" not in entry:
-            entry["title"] = f"Audio Note {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
-        
-        current_data.append(entry)
-        
-        # Update DB
-        supabase.table("profiles").update({"saved_audio": current_data}).eq("id", user["id"]).execute()
-        
-        # Update stats
-        try:
-            res = supabase.table("profiles").select("audio_generated").eq("id", user["id"]).single().execute()
-            count = res.data.get("audio_generated", 0) or 0
-            supabase.table("profiles").update({"audio_generated": count + 1}).eq("id", user["id"]).execute()
-        except: pass
-            
-        return True
-    except Exception as e:
-        st.error(f"Save failed: {e}")
-        return False
-
-# ---------------- Gemini Initialization ----------------
-@st.cache_resource
-def init_gemini(api_key_input):
-    key = api_key_input
-    if not key:
-        try:
-            key = st.secrets.get("GEMINI_API_KEY")
-        except Exception:
-            pass
-    
-    if not key:
-        return None
-
-    try:
-        genai.configure(api_key=key)
-        return genai.GenerativeModel("gemini-2.5-flash-lite")
-    except Exception as e:
-        st.error(f"Gemini initialization error: {e}")
-        return None
+    """Queue saving a new audio/transcript entry as a library item"""
+    if not user or not repo: return False
+    # Add timestamp title if missing
+    if "title" not in entry:
+        entry["title"] = f"Audio Note {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
+
+    # Inserts the item and bumps audio_generated in one atomic call
+    item = library.from_entry("audio", entry)
+    writebehind.submit(
+        user["id"],
+        lambda: repo.add_item(user["id"], item, counter="audio_generated"),
+        label="saved audio note",
+    )
+    library_view.invalidate(user, "audio")
+    return True
 
 # ---------------- Sidebar ----------------
 with st.sidebar:
@@ -127,18 +71,12 @@ with st.sidebar:
     if not HAS_GTTS:
         st.error("⚠️ `gTTS` library missing. Run `pip install gTTS`.")
 
-gemini_model = init_gemini(api_key_input)
+llm_ready = llm.is_configured("audio", api_key_input)
 
 # ---------------- Helpers ----------------
 def extract_text_from_pdf(uploaded_file):
     try:
-        text = ""
-        with pdfplumber.open(uploaded_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-        return text.strip()
+        return pdf.extract_text(uploaded_file)
     except Exception as e:
         st.error(f"Error extracting PDF text: {e}")
         return ""
@@ -146,10 +84,11 @@ def extract_text_from_pdf(uploaded_file):
 def text_to_speech(text, slow=False):
     """Converts text to audio bytes using gTTS"""
     try:
-        tts = gTTS(text=text, lang='en', slow=slow)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as fp:
-            tts.save(fp.name)
-            return fp.name
+        with tracing.span("tts.synthesize", feature="audio.tts", chars=len(text), slow=slow):
+            tts = gtts.gTTS(text=text, lang='en', slow=slow)
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as fp:
+                tts.save(fp.name)
+                return fp.name
     except Exception as e:
         st.error(f"Audio Generation Error: {e}")
         return None
@@ -189,7 +128,7 @@ with tab1:
             elif not HAS_GTTS:
                 st.error("gTTS missing.")
             else:
-                if gemini_model:
+                if llm_ready:
                     with st.spinner("🤖 Writing script..."):
                         prompt = f"""
                         Convert these notes into a spoken audio script.
@@ -197,16 +136,16 @@ with tab1:
                         **Rules:** Conversational, summarize lists, under 500 words. No markdown.
                         **Content:** {source_text[:6000]}
                         """
-                        try:
-                            resp = gemini_model.generate_content(prompt)
-                            st.session_state.podcast_script = resp.text
+                        res = llm.call_gemini(prompt, feature="audio.script", api_key=api_key_input)
+                        if res.get("error"):
+                            st.error(f"Error: {res['error']}")
+                        else:
+                            st.session_state.podcast_script = res["text"]
                             
                             with st.spinner("🎧 Recording..."):
                                 audio_path = text_to_speech(st.session_state.podcast_script, slow=speed_check)
                                 st.session_state.audio_file_path = audio_path
                                 st.rerun()
-                        except Exception as e:
-                            st.error(f"Error: {e}")
                 else:
                     st.error("API Key missing.")
 
@@ -250,7 +189,7 @@ with tab2:
         if st.button("📝 Transcribe", type="primary"):
             if not uploaded_audio:
                 st.warning("Upload audio first.")
-            elif not gemini_model:
+            elif not llm_ready:
                 st.error("API Key missing.")
             else:
                 with st.spinner("🎧 Analyzing..."):
@@ -262,9 +201,12 @@ with tab2:
                         """
                         content = [prompt_text, {"mime_type": uploaded_audio.type, "data": audio_bytes}]
                         
-                        response = gemini_model.generate_content(content)
-                        st.session_state.transcription_result = response.text
-                        st.rerun()
+                        res = llm.call_gemini(content, feature="audio.transcribe", api_key=api_key_input)
+                        if res.get("error"):
+                            st.error(f"Error: {res['error']}")
+                        else:
+                            st.session_state.transcription_result = res["text"]
+                            st.rerun()
                     except Exception as e:
                         st.error(f"Error: {e}")
 
@@ -291,20 +233,18 @@ with tab2:
 # =======================================================
 with tab3:
     st.markdown("### 📚 Your Saved Audio & Notes")
-    if user and supabase:
-        saved_items = fetch_saved_audio()
-        if saved_items:
-            for i, item in enumerate(reversed(saved_items)):
-                with st.expander(f"{item.get('title', 'Untitled')} ({item.get('date')}) - {item.get('type')}"):
-                    st.markdown(item.get('content'))
-                    if item.get('type') == 'podcast_script':
-                        if st.button("🔄 Regenerate Audio", key=f"regen_{i}"):
-                            with st.spinner("Regenerating..."):
-                                path = text_to_speech(item['content'])
-                                st.session_state.audio_file_path = path
-                                st.session_state.podcast_script = item['content']
-                                st.rerun()
-        else:
-            st.info("Library is empty.")
+    if user and repo:
+        def show_audio(item):
+            st.markdown(item.get('content'))
+            if item.get('type') == 'podcast_script':
+                if st.button("🔄 Regenerate Audio", key=f"regen_{item['id']}"):
+                    with st.spinner("Regenerating..."):
+                        path = text_to_speech(item['content'])
+                        st.session_state.audio_file_path = path
+                        st.session_state.podcast_script = item['content']
+                        st.rerun()
+
+        label = lambda i: f"{i.get('title') or 'Untitled'} ({i.get('date')}) - {i.get('type')}"
+        library_view.render_library(repo, user, "audio", label, show_audio, empty="Library is empty.")
     else:
         st.warning("Log in to view your library.")
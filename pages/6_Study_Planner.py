@@ -1,69 +1,28 @@
 import streamlit as st
-import google.generativeai as genai
-import pdfplumber
-import os
 import datetime
 import json
 from datetime import date, timedelta
-from supabase import create_client, Client
+from nexstudy import activity, assets, library, library_view, llm, pdf, profiling, repository, snapshot, writebehind
+
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
 
 # ---------------- Page config ----------------
 st.set_page_config(page_title="NexStudy — Study Planner Pro", page_icon="📅", layout="wide")
 st.markdown("<style>footer{visibility:hidden;} </style>", unsafe_allow_html=True)
 
 # ---------------- Logo Logic ----------------
-if os.path.exists("assets/image.png"):
-    st.image("assets/image.png", width=150)
-elif os.path.exists("logo.png"):
-    st.image("logo.png", width=150)
-elif os.path.exists("logo.jpg"):
-    st.image("logo.jpg", width=150)
+assets.logo(150)
 
 st.title("📅 NexStudy — Study Planner (Pro)")
 st.write("Pro features: save/load plans, intensity control, ICS export, and AI customization.")
 
-# ---------------- Supabase Client ----------------
-@st.cache_resource
-def get_supabase() -> Client:
-    try:
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_ANON_KEY"]
-        return create_client(url, key)
-    except Exception as e:
-        st.error(f"Supabase connection failed: {e}")
-        return None
-
-supabase = get_supabase()
+# ---------------- Storage ----------------
+repo = repository.get_repository()
 
 # ---------------- Session State Init ----------------
 if "todos" not in st.session_state:
     st.session_state.todos = []
 
-# ---------------- Gemini Initialization ----------------
-@st.cache_resource
-def init_gemini(api_key_input: str | None = None):
-    key = api_key_input
-    # 1. Prefer input key
-    if not key:
-        try:
-            key = st.secrets.get("GEMINI_API_KEY")
-        except Exception:
-            pass
-
-    if not key:
-        return None
-
-    try:
-        genai.configure(api_key=key)
-        # Try latest model, fallback to stable
-        try:
-            return genai.GenerativeModel("gemini-2.5-flash-lite")
-        except Exception:
-            return genai.GenerativeModel("gemini-2.5-flash")
-    except Exception as e:
-        st.error(f"Gemini initialization error: {e}")
-        return None
-
 # ---------------- Sidebar: Settings ----------------
 with st.sidebar:
     st.header("⚙️ Settings")
@@ -80,36 +39,23 @@ with st.sidebar:
     
     # User Info from Session State
     user = st.session_state.get("user")
+    writebehind.watch_session(user)
     if user:
         st.info(f"Logged in as: {user.get('email')}")
     else:
         st.warning("You are in Guest Mode. Sign in on the Home page to save plans permanently.")
 
-gemini_model = init_gemini(api_key)
-
 # ---------------- Helper functions ----------------
 def extract_text_from_pdf(uploaded_file) -> str:
     try:
-        text = ""
-        with pdfplumber.open(uploaded_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-        return text.strip()
+        return pdf.extract_text(uploaded_file)
     except Exception as e:
         st.error(f"PDF extraction error: {e}")
         return ""
 
-def call_gemini(prompt: str, generation_config=None) -> dict:
+def call_gemini(prompt, generation_config=None) -> dict:
     """Safe wrapper to call gemini and return dict with keys 'text' or 'error'"""
-    if gemini_model is None:
-        return {"error": "Gemini model not initialized. Provide API key."}
-    try:
-        resp = gemini_model.generate_content(prompt, generation_config=generation_config)
-        return {"text": resp.text or ""}
-    except Exception as e:
-        return {"error": str(e)}
+    return llm.call_gemini(prompt, feature="planner.plan", generation_config=generation_config, api_key=api_key)
 
 def generate_plan_markdown(plan_meta: dict, day_plan: list) -> str:
     """Create full markdown text of the plan"""
@@ -156,53 +102,50 @@ def create_ics(plan_meta: dict, day_plan: list) -> str:
     return "\n".join(lines)
 
 # ---------------- Database Functions ----------------
+SAVED_PLAN_CHOICES = 50  # newest plans offered in the picker
+
 def fetch_saved_plans():
-    """Fetch saved_plans array from Supabase profiles"""
-    if not user or not supabase: return []
+    """Fetch the newest saved plans' titles and meta (no markdown), newest first"""
+    if not user or not repo: return []
+    def load():
+        writebehind.wait_idle(user["id"])
+        return repo.list_page(user["id"], "plan", 0, SAVED_PLAN_CHOICES)
     try:
-        res = supabase.table("profiles").select("saved_plans").eq("id", user["id"]).single().execute()
-        if res.data:
-            return res.data.get("saved_plans") or []
+        rows, _ = snapshot.get_snapshot(user).get("library:plan:choices", load)  # not a page: library_view pages are 20 rows
+        return [library.to_entry(row, "markdown") for row in rows]
     except Exception as e:
         # st.error(f"Error fetching plans: {e}")
         pass
     return []
 
 def save_plan_to_db(plan_package):
-    """Append new plan to saved_plans in Supabase"""
-    if not user or not supabase: return
-    try:
-        current_plans = fetch_saved_plans()
-        # Add timestamp title if missing
-        if "title" not in plan_package:
-            plan_package["title"] = f"Plan {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
-        
-        current_plans.append(plan_package)
-        
-        # Update DB
-        supabase.table("profiles").update({"saved_plans": current_plans}).eq("id", user["id"]).execute()
-        
-        # Optional: Increment plans_created count if column exists
-        try:
-            # We first get current count
-            res = supabase.table("profiles").select("plans_created").eq("id", user["id"]).single().execute()
-            current_count = res.data.get("plans_created", 0) or 0
-            supabase.table("profiles").update({"plans_created": current_count + 1}).eq("id", user["id"]).execute()
-        except: 
-            pass
-            
-        return True
-    except Exception as e:
-        st.error(f"Save failed: {e}")
-        return False
+    """Queue saving a new plan as a library item"""
+    if not user or not repo: return
+    plan_package = dict(plan_package)
+    # Add timestamp title if missing
+    if "title" not in plan_package:
+        plan_package["title"] = f"Plan {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
+
+    # Inserts the plan and bumps plans_created in one atomic call
+    item = library.from_entry("plan", plan_package, "markdown")
+    writebehind.submit(
+        user["id"],
+        lambda: repo.add_item(user["id"], item, counter="plans_created"),
+        label="saved plan",
+    )
+    library_view.invalidate(user, "plan")
+    return True
 
 def sync_todos():
-    """Sync todos to Supabase"""
-    if user and supabase:
-        try:
-            supabase.table("profiles").update({"todos": st.session_state.todos}).eq("id", user["id"]).execute()
-        except Exception as e:
-            st.warning(f"Could not sync todos: {e}")
+    """Queue a todos sync; rapid toggles within the window become one update"""
+    if user and repo:
+        todos = [dict(t) for t in st.session_state.todos]
+        writebehind.submit(
+            user["id"],
+            lambda: repo.save_todos(user["id"], todos),
+            key="todos", label="to-do list",
+        )
+        snapshot.get_snapshot(user).put("todos", todos)
 
 # ---------------- To-Do List Helpers ----------------
 def add_todo():
@@ -213,8 +156,19 @@ def add_todo():
         sync_todos()
 
 def toggle_todo(index):
-    st.session_state.todos[index]["done"] = not st.session_state.todos[index]["done"]
+    todo = st.session_state.todos[index]
+    todo["done"] = not todo["done"]
+    # Only the first completion counts as activity; re-ticking a task doesn't
+    first_completion = todo["done"] and not todo.get("completed_at")
+    if first_completion:
+        todo["completed_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
     sync_todos()
+    if first_completion and user and repo:
+        event_id = activity.new_event_id()  # the same id on every retry of this write
+        writebehind.submit(
+            user["id"], lambda: repo.record_activity(user["id"], "todo_done", event_id),
+            label="activity",
+        )
 
 def delete_todo(index):
     st.session_state.todos.pop(index)
@@ -246,7 +200,7 @@ with col_left:
         generate = st.form_submit_button("🚀 Generate Pro Plan")
 
     # Show Saved Plans if logged in
-    if user and supabase:
+    if user and repo:
         st.markdown("---")
         st.subheader("Saved Plans")
         saved_plans = fetch_saved_plans()
@@ -257,7 +211,11 @@ with col_left:
             
             if sel_name and sel_name != "-- select saved plan --":
                 if st.button("Load selected plan"):
-                    loaded = plan_options[sel_name]
+                    loaded = dict(plan_options[sel_name])
+                    # The plan's markdown is only fetched once it is opened
+                    loaded["markdown"] = snapshot.get_snapshot(user).get(
+                        f"item:{loaded['id']}", lambda: repo.get_content(user["id"], loaded["id"])
+                    )
                     st.session_state["loaded_plan"] = loaded
                     st.success("Loaded plan into view.")
                     st.rerun()
@@ -305,12 +263,13 @@ with col_right:
         st.markdown("### My Study Tasks")
         st.caption("Add your own manual tasks here. Synced to your account.")
         
-        # Load todos from Supabase if logged in and session todos empty
-        if user and not st.session_state.todos:
+        # Load todos from the session snapshot (fetched once) if logged in and session todos empty
+        if user and repo and not st.session_state.todos:
+             def load_todos():
+                 writebehind.wait_idle(user["id"])
+                 return repo.get_todos(user["id"])
              try:
-                 res = supabase.table("profiles").select("todos").eq("id", user["id"]).single().execute()
-                 if res.data and res.data.get("todos"):
-                     st.session_state.todos = res.data["todos"]
+                 st.session_state.todos = [dict(t) for t in snapshot.get_snapshot(user).get("todos", load_todos) or []]
              except: pass
 
         # Add Todo Input
@@ -372,7 +331,7 @@ if 'generate' in locals() and generate:
             prompt = f"""
             You are an expert study planner.
             Context: Exam in {days_left} days. Daily hours: {daily_hours}.
-            Topics: {json.dumps(topics[:300], ensure_ascii=False)}
+            Topics: listed in the next part.
             Focus: {plan_meta['focus_areas']}
             
             Task: Create a daily schedule.
@@ -389,7 +348,8 @@ if 'generate' in locals() and generate:
             # Call Gemini
             with st.spinner("Generating plan (Pro AI)..."):
                 # Enforce JSON mode
-                res = call_gemini(prompt, generation_config={"response_mime_type": "application/json"})
+                topics_part = f"Topics: {json.dumps(topics[:300], ensure_ascii=False)}"
+                res = call_gemini([prompt, topics_part], generation_config={"response_mime_type": "application/json"})
                 
                 if res.get("error"):
                     st.error(f"AI Error: {res['error']}")
@@ -1,5 +1,8 @@
 import streamlit as st
 import random
+from nexstudy import profiling
+
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
 
 
 st.set_page_config(page_title="Study Tips", page_icon="💡", layout="wide")
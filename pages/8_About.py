@@ -1,4 +1,7 @@
 import streamlit as st
+from nexstudy import profiling
+
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
 
 st.set_page_config(page_title="About Us", page_icon="ℹ️", layout="wide")
 
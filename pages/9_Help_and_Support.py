@@ -1,4 +1,8 @@
 import streamlit as st
+from nexstudy import profiling
+
+profiling.profile_run()  # operators: ?profile=1 (see nexstudy.profiling)
+
 st.set_page_config(page_title= "Help & Support" , page_icon="💬" , layout="wide")
 
 st.title("💬 Help & Support")
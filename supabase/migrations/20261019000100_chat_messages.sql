@@ -0,0 +1,51 @@
+-- Append-only chat log replacing profiles.chat_history.
+-- One row per message; a turn is saved with a single batched insert.
+
+create table if not exists public.chat_messages (
+    id uuid primary key,
+    user_id uuid not null references public.profiles (id) on delete cascade,
+    role text not null check (role in ('user', 'assistant')),
+    text text not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists chat_messages_user_created
+    on public.chat_messages (user_id, created_at);
+
+alter table public.chat_messages enable row level security;
+
+create policy "chat_messages_own_rows" on public.chat_messages
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
+
+-- Move existing histories over, keeping their order.
+insert into public.chat_messages (id, user_id, role, text, created_at)
+select
+    gen_random_uuid(),
+    p.id,
+    m.value ->> 'role',
+    coalesce(m.value ->> 'text', ''),
+    now() - (jsonb_array_length(p.chat_history) - m.ordinality) * interval '1 millisecond'
+from public.profiles p
+cross join lateral jsonb_array_elements(p.chat_history) with ordinality as m (value, ordinality)
+where jsonb_typeof(p.chat_history) = 'array'
+  and m.value ->> 'role' in ('user', 'assistant');
+
+update public.profiles set chat_history = '[]'::jsonb where chat_history is not null;
+
+-- doubts_solved is bumped once per stored user message instead of being
+-- recomputed by the app from the whole history.
+create or replace function public.bump_doubts_solved() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+    update public.profiles
+       set doubts_solved = coalesce(doubts_solved, 0) + 1
+     where id = new.user_id;
+    return null;
+end;
+$$;
+
+drop trigger if exists chat_messages_bump_doubts on public.chat_messages;
+create trigger chat_messages_bump_doubts
+    after insert on public.chat_messages
+    for each row when (new.role = 'user')
+    execute function public.bump_doubts_solved();
@@ -0,0 +1,21 @@
+-- Archived chat segments. Old chat_messages rows are summarized and moved
+-- here in blocks so the hot table only holds recent turns per user.
+
+create table if not exists public.chat_segments (
+    id uuid primary key default gen_random_uuid(),
+    user_id uuid not null references public.profiles (id) on delete cascade,
+    summary text not null default '',
+    messages jsonb not null,
+    message_count integer not null,
+    started_at timestamptz not null,
+    ended_at timestamptz not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists chat_segments_user_ended
+    on public.chat_segments (user_id, ended_at desc);
+
+alter table public.chat_segments enable row level security;
+
+create policy "chat_segments_own_rows" on public.chat_segments
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
@@ -0,0 +1,34 @@
+-- One round trip per library save: append an item to one of the profile's
+-- JSON arrays and bump its counter in a single UPDATE, so concurrent saves
+-- neither lose items nor lose increments.
+--
+-- Items carry a client-generated "id"; an item already present is skipped,
+-- which makes retries from the write-behind queue safe.
+
+create or replace function public.append_profile_item(
+    p_user_id uuid,
+    p_column text,
+    p_item jsonb,
+    p_counter text default null
+) returns void
+language plpgsql security invoker set search_path = public as $$
+begin
+    if p_column not in ('saved_papers', 'saved_code', 'saved_audio', 'saved_plans') then
+        raise exception 'append_profile_item: unsupported column %', p_column;
+    end if;
+    if p_counter is not null and p_counter not in ('audio_generated', 'plans_created') then
+        raise exception 'append_profile_item: unsupported counter %', p_counter;
+    end if;
+
+    execute format(
+        'update profiles set %1$I = coalesce(%1$I, ''[]''::jsonb) || jsonb_build_array($1)%2$s
+          where id = $2
+            and not coalesce(%1$I, ''[]''::jsonb) @> jsonb_build_array(jsonb_build_object(''id'', $1 ->> ''id''))',
+        p_column,
+        case when p_counter is null then ''
+             else format(', %1$I = coalesce(%1$I, 0) + 1', p_counter) end
+    ) using p_item, p_user_id;
+end;
+$$;
+
+grant execute on function public.append_profile_item(uuid, text, jsonb, text) to authenticated;
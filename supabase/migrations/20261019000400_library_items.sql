@@ -0,0 +1,100 @@
+-- Saved papers, code, audio notes and plans become one row per item instead
+-- of JSON arrays on profiles, so a save is an O(1) insert and listings can
+-- be paginated by (user_id, created_at).
+
+create table if not exists public.library_items (
+    id uuid primary key default gen_random_uuid(),
+    user_id uuid not null references public.profiles (id) on delete cascade,
+    kind text not null check (kind in ('paper', 'code', 'audio', 'plan')),
+    title text not null default '',
+    meta jsonb not null default '{}'::jsonb,
+    content text not null default '',
+    created_at timestamptz not null default now()
+);
+
+create index if not exists library_items_user_created
+    on public.library_items (user_id, created_at desc);
+create index if not exists library_items_user_kind_created
+    on public.library_items (user_id, kind, created_at desc);
+
+alter table public.library_items enable row level security;
+
+create policy "library_items_own_rows" on public.library_items
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
+
+-- ---------------- Move existing arrays over ----------------
+-- Entries keep their order; created_at comes from the entry's "date" when
+-- it parses, with the array position breaking ties.
+create or replace function pg_temp.entry_time(p_date text, p_pos bigint) returns timestamptz
+language sql stable as $$
+    select case
+        when p_date ~ '^\d{4}-\d{2}-\d{2}( \d{2}:\d{2})?$' then p_date::timestamp at time zone 'UTC'
+        else now()
+    end + p_pos * interval '1 millisecond';
+$$;
+
+insert into public.library_items (user_id, kind, title, meta, content, created_at)
+select p.id, 'paper', coalesce(e ->> 'title', ''), e - 'title' - 'content' - 'id',
+       coalesce(e ->> 'content', ''), pg_temp.entry_time(e ->> 'date', n)
+from public.profiles p
+cross join lateral jsonb_array_elements(p.saved_papers) with ordinality as a (e, n)
+where jsonb_typeof(p.saved_papers) = 'array';
+
+insert into public.library_items (user_id, kind, title, meta, content, created_at)
+select p.id, 'code', coalesce(e ->> 'title', ''), e - 'title' - 'code' - 'id',
+       coalesce(e ->> 'code', ''), pg_temp.entry_time(e ->> 'date', n)
+from public.profiles p
+cross join lateral jsonb_array_elements(p.saved_code) with ordinality as a (e, n)
+where jsonb_typeof(p.saved_code) = 'array';
+
+insert into public.library_items (user_id, kind, title, meta, content, created_at)
+select p.id, 'audio', coalesce(e ->> 'title', ''), e - 'title' - 'content' - 'id',
+       coalesce(e ->> 'content', ''), pg_temp.entry_time(e ->> 'date', n)
+from public.profiles p
+cross join lateral jsonb_array_elements(p.saved_audio) with ordinality as a (e, n)
+where jsonb_typeof(p.saved_audio) = 'array';
+
+insert into public.library_items (user_id, kind, title, meta, content, created_at)
+select p.id, 'plan', coalesce(e ->> 'title', ''), e - 'title' - 'markdown' - 'id',
+       coalesce(e ->> 'markdown', ''),
+       pg_temp.entry_time(substring(e ->> 'title' from '\d{4}-\d{2}-\d{2} \d{2}:\d{2}'), n)
+from public.profiles p
+cross join lateral jsonb_array_elements(p.saved_plans) with ordinality as a (e, n)
+where jsonb_typeof(p.saved_plans) = 'array';
+
+update public.profiles
+   set saved_papers = '[]'::jsonb, saved_code = '[]'::jsonb,
+       saved_audio = '[]'::jsonb, saved_plans = '[]'::jsonb;
+
+-- ---------------- Save RPC ----------------
+-- Insert one item and bump its counter atomically. The id is generated by
+-- the client, so a retried call inserts (and counts) nothing.
+drop function if exists public.append_profile_item(uuid, text, jsonb, text);
+
+create or replace function public.add_library_item(
+    p_id uuid,
+    p_user_id uuid,
+    p_kind text,
+    p_title text,
+    p_meta jsonb,
+    p_content text,
+    p_counter text default null
+) returns void
+language plpgsql security invoker set search_path = public as $$
+begin
+    if p_counter is not null and p_counter not in ('audio_generated', 'plans_created') then
+        raise exception 'add_library_item: unsupported counter %', p_counter;
+    end if;
+
+    insert into library_items (id, user_id, kind, title, meta, content)
+    values (p_id, p_user_id, p_kind, coalesce(p_title, ''), coalesce(p_meta, '{}'::jsonb), coalesce(p_content, ''))
+    on conflict (id) do nothing;
+
+    if found and p_counter is not null then
+        execute format('update profiles set %1$I = coalesce(%1$I, 0) + 1 where id = $1', p_counter)
+        using p_user_id;
+    end if;
+end;
+$$;
+
+grant execute on function public.add_library_item(uuid, uuid, text, text, jsonb, text, text) to authenticated;
@@ -0,0 +1,83 @@
+-- Full-text search over saved library items.
+--
+-- library_items.search holds a weighted tsvector (title A, content B). It is
+-- written by add_library_item in the same statement as the row, so the
+-- index never lags a save, and queried through search_library(), which
+-- ranks matches and returns a highlighted snippet per hit.
+
+alter table public.library_items add column if not exists search tsvector;
+
+update public.library_items
+   set search = setweight(to_tsvector('english', title), 'A')
+             || setweight(to_tsvector('english', content), 'B')
+ where search is null;
+
+create index if not exists library_items_search
+    on public.library_items using gin (search);
+
+-- ---------------- Save RPC: index inline ----------------
+create or replace function public.add_library_item(
+    p_id uuid,
+    p_user_id uuid,
+    p_kind text,
+    p_title text,
+    p_meta jsonb,
+    p_content text,
+    p_counter text default null
+) returns void
+language plpgsql security invoker set search_path = public as $$
+begin
+    if p_counter is not null and p_counter not in ('audio_generated', 'plans_created') then
+        raise exception 'add_library_item: unsupported counter %', p_counter;
+    end if;
+
+    insert into library_items (id, user_id, kind, title, meta, content, search)
+    values (
+        p_id, p_user_id, p_kind, coalesce(p_title, ''), coalesce(p_meta, '{}'::jsonb), coalesce(p_content, ''),
+        setweight(to_tsvector('english', coalesce(p_title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(p_content, '')), 'B')
+    )
+    on conflict (id) do nothing;
+
+    if found and p_counter is not null then
+        execute format('update profiles set %1$I = coalesce(%1$I, 0) + 1 where id = $1', p_counter)
+        using p_user_id;
+    end if;
+end;
+$$;
+
+-- ---------------- Search RPC ----------------
+-- Ranks first and highlights only the returned page; ts_headline re-parses
+-- the whole document, so it must not run for every match.
+create or replace function public.search_library(
+    p_user_id uuid,
+    p_query text,
+    p_kind text default null,
+    p_since timestamptz default null,
+    p_until timestamptz default null,
+    p_limit integer default 20
+) returns table (
+    id uuid, kind text, title text, meta jsonb, created_at timestamptz, rank real, snippet text
+)
+language sql stable security invoker set search_path = public as $$
+    with q as (select websearch_to_tsquery('english', p_query) as query),
+    hits as (
+        select i.id, i.kind, i.title, i.meta, i.created_at, i.content,
+               ts_rank_cd(i.search, q.query) as rank
+        from library_items i, q
+        where i.user_id = p_user_id
+          and i.search @@ q.query
+          and (p_kind is null or i.kind = p_kind)
+          and (p_since is null or i.created_at >= p_since)
+          and (p_until is null or i.created_at < p_until)
+        order by rank desc, i.created_at desc
+        limit least(greatest(p_limit, 1), 100)
+    )
+    select h.id, h.kind, h.title, h.meta, h.created_at, h.rank,
+           ts_headline('english', h.content, q.query,
+                       'StartSel=**, StopSel=**, MaxWords=24, MinWords=8, MaxFragments=1')
+    from hits h, q
+    order by h.rank desc, h.created_at desc;
+$$;
+
+grant execute on function public.search_library(uuid, text, text, timestamptz, timestamptz, integer) to authenticated;
@@ -0,0 +1,154 @@
+-- Compressed, content-addressed storage for large library contents.
+--
+-- Contents of 2 KB or more are compressed client-side (zlib) and stored
+-- once per user in content_blobs, keyed by the SHA-256 of the plain text;
+-- library_items keeps only blob_hash plus a 1000-character excerpt for
+-- search snippets. Saving the same text twice adds a row to library_items
+-- but no new blob. Smaller contents stay inline in library_items.content.
+
+create table if not exists public.content_blobs (
+    user_id uuid not null references public.profiles (id) on delete cascade,
+    hash text not null,  -- sha256 hex of the uncompressed UTF-8 text
+    codec text not null check (codec in ('zlib')),
+    size integer not null,  -- uncompressed bytes
+    data bytea not null,
+    created_at timestamptz not null default now(),
+    primary key (user_id, hash)
+);
+
+-- Already compressed: keep TOAST from trying again.
+alter table public.content_blobs alter column data set storage external;
+
+alter table public.content_blobs enable row level security;
+
+create policy "content_blobs_own_rows" on public.content_blobs
+    for all using (auth.uid() = user_id) with check (auth.uid() = user_id);
+
+alter table public.library_items
+    add column if not exists blob_hash text,
+    add column if not exists excerpt text;
+
+alter table public.library_items
+    add constraint library_items_blob foreign key (user_id, blob_hash)
+    references public.content_blobs (user_id, hash);
+
+-- ---------------- Save RPC: blob-aware ----------------
+-- p_content is still sent in full so the item can be indexed for search;
+-- with p_blob it is indexed but not stored.
+drop function if exists public.add_library_item(uuid, uuid, text, text, jsonb, text, text);
+
+create or replace function public.add_library_item(
+    p_id uuid,
+    p_user_id uuid,
+    p_kind text,
+    p_title text,
+    p_meta jsonb,
+    p_content text,
+    p_counter text default null,
+    p_blob jsonb default null  -- {hash, codec, size, data (base64)}
+) returns void
+language plpgsql security invoker set search_path = public as $$
+begin
+    if p_counter is not null and p_counter not in ('audio_generated', 'plans_created') then
+        raise exception 'add_library_item: unsupported counter %', p_counter;
+    end if;
+
+    if p_blob is not null then
+        insert into content_blobs (user_id, hash, codec, size, data)
+        values (p_user_id, p_blob ->> 'hash', p_blob ->> 'codec', (p_blob ->> 'size')::integer,
+                decode(p_blob ->> 'data', 'base64'))
+        on conflict (user_id, hash) do nothing;
+    end if;
+
+    insert into library_items (id, user_id, kind, title, meta, content, blob_hash, excerpt, search)
+    values (
+        p_id, p_user_id, p_kind, coalesce(p_title, ''), coalesce(p_meta, '{}'::jsonb),
+        case when p_blob is null then coalesce(p_content, '') else '' end,
+        p_blob ->> 'hash',
+        case when p_blob is not null then left(p_content, 1000) end,
+        setweight(to_tsvector('english', coalesce(p_title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(p_content, '')), 'B')
+    )
+    on conflict (id) do nothing;
+
+    if found and p_counter is not null then
+        execute format('update profiles set %1$I = coalesce(%1$I, 0) + 1 where id = $1', p_counter)
+        using p_user_id;
+    end if;
+end;
+$$;
+
+grant execute on function public.add_library_item(uuid, uuid, text, text, jsonb, text, text, jsonb) to authenticated;
+
+-- ---------------- Content reads ----------------
+-- Inline content, or the blob's codec and base64 data for the client to unpack.
+create or replace function public.library_contents(p_user_id uuid, p_ids uuid[])
+returns table (id uuid, content text, codec text, data text)
+language sql stable security invoker set search_path = public as $$
+    select i.id,
+           case when b.hash is null then i.content end,
+           b.codec,
+           encode(b.data, 'base64')
+    from library_items i
+    left join content_blobs b on b.user_id = i.user_id and b.hash = i.blob_hash
+    where i.user_id = p_user_id and i.id = any(p_ids);
+$$;
+
+grant execute on function public.library_contents(uuid, uuid[]) to authenticated;
+
+-- ---------------- Search: snippets from the excerpt ----------------
+create or replace function public.search_library(
+    p_user_id uuid,
+    p_query text,
+    p_kind text default null,
+    p_since timestamptz default null,
+    p_until timestamptz default null,
+    p_limit integer default 20
+) returns table (
+    id uuid, kind text, title text, meta jsonb, created_at timestamptz, rank real, snippet text
+)
+language sql stable security invoker set search_path = public as $$
+    with q as (select websearch_to_tsquery('english', p_query) as query),
+    hits as (
+        select i.id, i.kind, i.title, i.meta, i.created_at,
+               case when i.blob_hash is null then i.content else i.excerpt end as text,
+               ts_rank_cd(i.search, q.query) as rank
+        from library_items i, q
+        where i.user_id = p_user_id
+          and i.search @@ q.query
+          and (p_kind is null or i.kind = p_kind)
+          and (p_since is null or i.created_at >= p_since)
+          and (p_until is null or i.created_at < p_until)
+        order by rank desc, i.created_at desc
+        limit least(greatest(p_limit, 1), 100)
+    )
+    select h.id, h.kind, h.title, h.meta, h.created_at, h.rank,
+           ts_headline('english', coalesce(h.text, ''), q.query,
+                       'StartSel=**, StopSel=**, MaxWords=24, MinWords=8, MaxFragments=1')
+    from hits h, q
+    order by h.rank desc, h.created_at desc;
+$$;
+
+-- ---------------- Compression report ----------------
+-- What blobs actually save. Security invoker: a user sees their own items;
+-- run as the service role with no argument for the whole project.
+create or replace function public.library_storage_stats(p_user_id uuid default null)
+returns table (
+    items bigint, blob_items bigint, blobs bigint, inline_bytes bigint,
+    referenced_bytes bigint, distinct_bytes bigint, stored_bytes bigint
+)
+language sql stable security invoker set search_path = public as $$
+    select
+        (select count(*) from library_items where p_user_id is null or user_id = p_user_id),
+        (select count(blob_hash) from library_items where p_user_id is null or user_id = p_user_id),
+        (select count(*) from content_blobs where p_user_id is null or user_id = p_user_id),
+        (select coalesce(sum(octet_length(content)), 0) from library_items
+          where blob_hash is null and (p_user_id is null or user_id = p_user_id)),
+        (select coalesce(sum(b.size), 0) from library_items i
+           join content_blobs b on b.user_id = i.user_id and b.hash = i.blob_hash
+          where p_user_id is null or i.user_id = p_user_id),
+        (select coalesce(sum(size), 0) from content_blobs where p_user_id is null or user_id = p_user_id),
+        (select coalesce(sum(octet_length(data)), 0) from content_blobs where p_user_id is null or user_id = p_user_id);
+$$;
+
+grant execute on function public.library_storage_stats(uuid) to authenticated;
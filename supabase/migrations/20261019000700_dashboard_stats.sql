@@ -0,0 +1,42 @@
+-- Everything the dashboard shows in one projected row: the persisted
+-- counters, todo totals, the next pending tasks and the number of saved
+-- solutions. Replaces reading whole profile rows and counting in Python.
+
+create or replace function public.dashboard_stats(p_user_id uuid)
+returns table (
+    doubts_solved integer,
+    plans_created integer,
+    audio_generated integer,
+    pending_todos integer,
+    completed_todos integer,
+    papers_saved integer,
+    next_todos jsonb
+)
+language sql stable security invoker set search_path = public as $$
+    select coalesce(p.doubts_solved, 0),
+           coalesce(p.plans_created, 0),
+           coalesce(p.audio_generated, 0),
+           coalesce(t.pending, 0)::integer,
+           coalesce(t.completed, 0)::integer,
+           (select count(*) from library_items i where i.user_id = p.id and i.kind = 'paper')::integer,
+           coalesce(t.next, '[]'::jsonb)
+    from profiles p
+    left join lateral (
+        select count(*) filter (where not e.done) as pending,
+               count(*) filter (where e.done) as completed,
+               (jsonb_agg(e.task order by e.n) filter (where not e.done and e.pending_n <= 3)) as next
+        from (
+            select a.value ->> 'task' as task,
+                   coalesce((a.value ->> 'done')::boolean, false) as done,
+                   a.n,
+                   count(*) filter (where not coalesce((a.value ->> 'done')::boolean, false))
+                       over (order by a.n) as pending_n
+            from jsonb_array_elements(
+                case when jsonb_typeof(p.todos) = 'array' then p.todos else '[]'::jsonb end
+            ) with ordinality as a (value, n)
+        ) e
+    ) t on true
+    where p.id = p_user_id;
+$$;
+
+grant execute on function public.dashboard_stats(uuid) to authenticated;
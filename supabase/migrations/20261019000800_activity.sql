@@ -0,0 +1,190 @@
+-- Append-only activity events with per-user daily rollups.
+--
+-- Every doubt asked, quiz taken, plan created, audio note generated and
+-- todo completed is one row in activity_events. A trigger folds each event
+-- into activity_daily (one row per user per UTC day), which also carries
+-- the streak: a day's streak is the previous day's plus one, set when the
+-- day's first event arrives. Weekly charts and the current streak are then
+-- read from at most eight rollup rows, never from the raw history.
+--
+-- Doubts, plans and audio notes are recorded by triggers on the tables the
+-- app already writes; quizzes and completed todos are inserted by the app.
+
+create table if not exists public.activity_events (
+    id bigint generated always as identity primary key,
+    user_id uuid not null references public.profiles (id) on delete cascade,
+    kind text not null check (kind in ('doubt', 'quiz', 'plan', 'audio', 'todo_done')),
+    created_at timestamptz not null default now()
+);
+
+create index if not exists activity_events_user_created
+    on public.activity_events (user_id, created_at);
+
+create table if not exists public.activity_daily (
+    user_id uuid not null references public.profiles (id) on delete cascade,
+    day date not null,
+    doubts integer not null default 0,
+    quizzes integer not null default 0,
+    plans integer not null default 0,
+    audio integer not null default 0,
+    todos_done integer not null default 0,
+    streak integer not null default 1,  -- consecutive active days ending on this day
+    primary key (user_id, day)
+);
+
+-- Events can be read and added but never changed; rollups are written by
+-- the trigger only.
+alter table public.activity_events enable row level security;
+alter table public.activity_daily enable row level security;
+
+create policy "activity_events_read_own" on public.activity_events
+    for select using (auth.uid() = user_id);
+create policy "activity_events_insert_own" on public.activity_events
+    for insert with check (auth.uid() = user_id);
+create policy "activity_daily_read_own" on public.activity_daily
+    for select using (auth.uid() = user_id);
+
+-- ---------------- Backfill from existing history ----------------
+insert into public.activity_events (user_id, kind, created_at)
+select user_id, 'doubt', created_at from public.chat_messages where role = 'user'
+union all
+select s.user_id, 'doubt', (m ->> 'created_at')::timestamptz
+from public.chat_segments s
+cross join lateral jsonb_array_elements(s.messages) m
+where m ->> 'role' = 'user' and m ->> 'created_at' is not null
+union all
+select user_id, kind, created_at from public.library_items where kind in ('plan', 'audio');
+
+-- Streaks for the backfill: consecutive days share (day - row_number).
+insert into public.activity_daily (user_id, day, doubts, quizzes, plans, audio, todos_done, streak)
+select user_id, day, doubts, quizzes, plans, audio, todos_done,
+       row_number() over (partition by user_id, island order by day)
+from (
+    select d.*, d.day - (row_number() over (partition by d.user_id order by d.day))::integer as island
+    from (
+        select user_id,
+               (created_at at time zone 'UTC')::date as day,
+               count(*) filter (where kind = 'doubt') as doubts,
+               count(*) filter (where kind = 'quiz') as quizzes,
+               count(*) filter (where kind = 'plan') as plans,
+               count(*) filter (where kind = 'audio') as audio,
+               count(*) filter (where kind = 'todo_done') as todos_done
+        from public.activity_events
+        group by 1, 2
+    ) d
+) islands
+on conflict (user_id, day) do nothing;
+
+-- ---------------- Rollup trigger ----------------
+create or replace function public.rollup_activity_event() returns trigger
+language plpgsql security definer set search_path = public as $$
+declare
+    v_day date := (new.created_at at time zone 'UTC')::date;
+begin
+    insert into activity_daily (user_id, day, doubts, quizzes, plans, audio, todos_done, streak)
+    values (
+        new.user_id, v_day,
+        (new.kind = 'doubt')::integer, (new.kind = 'quiz')::integer, (new.kind = 'plan')::integer,
+        (new.kind = 'audio')::integer, (new.kind = 'todo_done')::integer,
+        coalesce((select streak from activity_daily where user_id = new.user_id and day = v_day - 1), 0) + 1
+    )
+    on conflict (user_id, day) do update set
+        doubts = activity_daily.doubts + excluded.doubts,
+        quizzes = activity_daily.quizzes + excluded.quizzes,
+        plans = activity_daily.plans + excluded.plans,
+        audio = activity_daily.audio + excluded.audio,
+        todos_done = activity_daily.todos_done + excluded.todos_done;
+    return null;
+end;
+$$;
+
+drop trigger if exists activity_events_rollup on public.activity_events;
+create trigger activity_events_rollup
+    after insert on public.activity_events
+    for each row execute function public.rollup_activity_event();
+
+-- ---------------- Event sources ----------------
+create or replace function public.record_activity_from_row() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+    insert into activity_events (user_id, kind, created_at)
+    values (new.user_id, tg_argv[0], new.created_at);
+    return null;
+end;
+$$;
+
+drop trigger if exists chat_messages_activity on public.chat_messages;
+create trigger chat_messages_activity
+    after insert on public.chat_messages
+    for each row when (new.role = 'user')
+    execute function public.record_activity_from_row('doubt');
+
+drop trigger if exists library_items_plan_activity on public.library_items;
+create trigger library_items_plan_activity
+    after insert on public.library_items
+    for each row when (new.kind = 'plan')
+    execute function public.record_activity_from_row('plan');
+
+drop trigger if exists library_items_audio_activity on public.library_items;
+create trigger library_items_audio_activity
+    after insert on public.library_items
+    for each row when (new.kind = 'audio')
+    execute function public.record_activity_from_row('audio');
+
+-- ---------------- Dashboard: add the week and the streak ----------------
+drop function if exists public.dashboard_stats(uuid);
+
+create or replace function public.dashboard_stats(p_user_id uuid)
+returns table (
+    doubts_solved integer,
+    plans_created integer,
+    audio_generated integer,
+    pending_todos integer,
+    completed_todos integer,
+    papers_saved integer,
+    next_todos jsonb,
+    activity jsonb,  -- rollup rows for the last 7 UTC days, oldest first (inactive days absent)
+    streak integer
+)
+language sql stable security invoker set search_path = public as $$
+    with today as (select (now() at time zone 'UTC')::date as day)
+    select coalesce(p.doubts_solved, 0),
+           coalesce(p.plans_created, 0),
+           coalesce(p.audio_generated, 0),
+           coalesce(t.pending, 0)::integer,
+           coalesce(t.completed, 0)::integer,
+           (select count(*) from library_items i where i.user_id = p.id and i.kind = 'paper')::integer,
+           coalesce(t.next, '[]'::jsonb),
+           coalesce((
+               select jsonb_agg(jsonb_build_object(
+                          'day', a.day, 'doubts', a.doubts, 'quizzes', a.quizzes, 'plans', a.plans,
+                          'audio', a.audio, 'todos_done', a.todos_done) order by a.day)
+               from activity_daily a, today
+               where a.user_id = p.id and a.day > today.day - 7
+           ), '[]'::jsonb),
+           -- Active today: today's streak; otherwise the streak is still alive if yesterday was active.
+           coalesce((
+               select a.streak from activity_daily a, today
+               where a.user_id = p.id and a.day >= today.day - 1
+               order by a.day desc limit 1
+           ), 0)
+    from profiles p
+    left join lateral (
+        select count(*) filter (where not e.done) as pending,
+               count(*) filter (where e.done) as completed,
+               (jsonb_agg(e.task order by e.n) filter (where not e.done and e.pending_n <= 3)) as next
+        from (
+            select a.value ->> 'task' as task,
+                   coalesce((a.value ->> 'done')::boolean, false) as done,
+                   a.n,
+                   count(*) filter (where not coalesce((a.value ->> 'done')::boolean, false))
+                       over (order by a.n) as pending_n
+            from jsonb_array_elements(
+                case when jsonb_typeof(p.todos) = 'array' then p.todos else '[]'::jsonb end
+            ) with ordinality as a (value, n)
+        ) e
+    ) t on true
+    where p.id = p_user_id;
+$$;
+
+grant execute on function public.dashboard_stats(uuid) to authenticated;
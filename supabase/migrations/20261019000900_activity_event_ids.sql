@@ -0,0 +1,13 @@
+-- Client-generated ids for app-recorded activity events.
+--
+-- Quizzes and completed todos are inserted through the write-behind queue,
+-- which retries after timeouts and 5xx responses. A retry of an insert that
+-- did land would add a second event and count it twice in activity_daily
+-- and the streak. The app now sends a uuid per event and upserts with
+-- on conflict (event_id) do nothing, so the rollup trigger fires once.
+-- Events recorded by triggers and the backfill keep a null event_id.
+
+alter table public.activity_events add column if not exists event_id uuid;
+
+create unique index if not exists activity_events_event_id
+    on public.activity_events (event_id);